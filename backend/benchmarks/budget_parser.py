@@ -0,0 +1,187 @@
+"""
+Microbenchmark of budget parsing over a mixed corpus of prompts: some with a
+budget in a currency name, ISO code or symbol, some with none.
+
+Times parse_budget_from_text() against the parser it replaced (kept below as
+legacy_parse_budget_from_text, which rebuilt its currency dict and scanned it
+per match), and the currency matcher itself built two ways: from the dozen
+codes the parser used to know, and from every ISO 4217 code it knows now, to
+show what the larger alternation costs per prompt.
+
+    python benchmarks/budget_parser.py [--prompts 4000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import travel_chatbot as chatbot
+
+PROMPTS = [
+    "I want to go to mirissa. i would like a villa with a pool and some clubbing. This is for 5 people and the budget is 50000 LKR",
+    "trip to galle for 4 adults from dec 28 to jan 2 with a budget of 800 usd",
+    "Bangkok for a family of 4, budget $2,000",
+    "goa with friends, beaches and food",
+    "two weeks in Tbilisi, budget is 3000 GEL, wine and hiking",
+    "honeymoon in Kyoto, 250000 japanese yen all in",
+    "weekend in Lisbon for 2, about €900",
+    "backpacking Vietnam for a month on 1,500 dollars",
+]
+# The currency codes the parser knew before it took the full ISO 4217 list
+LEGACY_CODES = ["lkr", "inr", "usd", "gbp", "eur", "jpy", "thb", "aud", "cad", "sgd", "chf", "zar"]
+
+
+def legacy_parse_budget_from_text(text: str) -> str:
+    """The parser before the compiled currency matcher, verbatim, as the baseline."""
+
+    # Currency mappings - both full names and codes
+    currency_mappings = {
+        # Full currency names to codes
+        'sri lankan rupees': 'LKR',
+        'sri lankan rupee': 'LKR',
+        'lankan rupees': 'LKR',
+        'rupees': 'LKR',  # Default rupees to LKR unless context suggests otherwise
+        'indian rupees': 'INR',
+        'indian rupee': 'INR',
+        'us dollars': 'USD',
+        'us dollar': 'USD',
+        'american dollars': 'USD',
+        'dollars': 'USD',
+        'british pounds': 'GBP',
+        'pounds sterling': 'GBP',
+        'pounds': 'GBP',
+        'euros': 'EUR',
+        'euro': 'EUR',
+        'japanese yen': 'JPY',
+        'yen': 'JPY',
+        'thai baht': 'THB',
+        'baht': 'THB',
+        'australian dollars': 'AUD',
+        'canadian dollars': 'CAD',
+        'singapore dollars': 'SGD',
+        'swiss francs': 'CHF',
+        'south african rand': 'ZAR',
+        'rand': 'ZAR',
+
+        # Currency codes (already in correct format)
+        'lkr': 'LKR',
+        'inr': 'INR',
+        'usd': 'USD',
+        'gbp': 'GBP',
+        'eur': 'EUR',
+        'jpy': 'JPY',
+        'thb': 'THB',
+        'aud': 'AUD',
+        'cad': 'CAD',
+        'sgd': 'SGD',
+        'chf': 'CHF',
+        'zar': 'ZAR',
+    }
+
+    # Clean and normalize the text
+    text_lower = text.lower().strip()
+
+    # Remove commas and extra spaces from numbers
+    text_normalized = re.sub(r'(\d+)\s*,?\s*(\d+)', r'\1\2', text_lower)
+
+    # Pattern 1: "budget is X currency" or "X currency budget"
+    patterns = [
+        # "budget is 50000 sri lankan rupees"
+        r'budget\s+is\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
+        # "50000 sri lankan rupees budget" or "50000 sri lankan rupees"
+        r'(\d+(?:\s*,?\s*\d+)*)\s+(.+?)\s*(?:budget|$)',
+        # "budget of 50000 indian rupees"
+        r'budget\s+of\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
+        # "my budget is 50000 rupees"
+        r'my\s+budget\s+is\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
+        # "the budget is 50000 LKR"
+        r'the\s+budget\s+is\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
+        # Just "50000 LKR" format
+        r'(\d+(?:\s*,?\s*\d+)*)\s+([a-z]{3})(?:\s|$)',
+    ]
+
+    for pattern in patterns:
+        matches = re.finditer(pattern, text_normalized)
+        for match in matches:
+            amount_str = match.group(1)
+            currency_str = match.group(2).strip()
+
+            # Clean the amount (remove spaces and commas)
+            amount_clean = re.sub(r'[,\s]', '', amount_str)
+
+            # Try to match the currency
+            currency_code = None
+
+            # Direct lookup
+            if currency_str in currency_mappings:
+                currency_code = currency_mappings[currency_str]
+            else:
+                # Partial matches must start right after the amount ("50000 rupees for food"),
+                # otherwise "5 people ... 200 pounds" would read as 5 GBP
+                for currency_name, code in currency_mappings.items():
+                    if re.match(rf'{currency_name}\b', currency_str) or (len(currency_str) >= 3 and currency_name.startswith(currency_str)):
+                        currency_code = code
+                        break
+
+            if currency_code and amount_clean.isdigit():
+                return f"{amount_clean} {currency_code}"
+
+    # Pattern 2: Look for currency symbols
+    symbol_patterns = [
+        (r'\$(\d+(?:,\d+)*)', 'USD'),  # $50000
+        (r'₹(\d+(?:,\d+)*)', 'INR'),   # ₹50000
+        (r'£(\d+(?:,\d+)*)', 'GBP'),   # £50000
+        (r'€(\d+(?:,\d+)*)', 'EUR'),   # €50000
+    ]
+
+    for pattern, currency in symbol_patterns:
+        match = re.search(pattern, text)
+        if match:
+            amount = re.sub(r'[,\s]', '', match.group(1))
+            return f"{amount} {currency}"
+
+    return "null"
+
+
+def currency_matcher(codes) -> re.Pattern:
+    return re.compile(
+        chatbot._BUDGET_WORD + chatbot._AMOUNT + r'\s*(?:(?i:(' + chatbot._trie_pattern(list(chatbot.currency_names) + list(codes))
+        + r'))|(' + chatbot._trie_pattern(chatbot.ISO_CURRENCY_WORD_CODES) + r'))\b'
+    )
+
+
+def best_us_per_prompt(function, prompts, repeat: int) -> float:
+    """Best of `repeat` runs of function(prompts), in microseconds per prompt."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(prompts)
+        best = min(best, time.perf_counter() - start)
+    return best / len(prompts) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    prompts = [PROMPTS[number % len(PROMPTS)] for number in range(args.prompts)]
+    print(f"  {'legacy':<16} {'current':<16} prompt")
+    for prompt in PROMPTS:
+        print(f"  {legacy_parse_budget_from_text(prompt):<16} {chatbot.parse_budget_from_text(prompt):<16} {prompt[:60]}")
+
+    legacy = currency_matcher(LEGACY_CODES)
+    full = currency_matcher(code.lower() for code in chatbot.ISO_CURRENCY_CODES)
+    timings = [
+        ("legacy parser", lambda texts: [legacy_parse_budget_from_text(text) for text in texts]),
+        ("parse_budget_from_text", lambda texts: [chatbot.parse_budget_from_text(text) for text in texts]),
+        (f"matcher, {len(LEGACY_CODES)} codes", lambda texts: [list(legacy.finditer(text)) for text in texts]),
+        (f"matcher, {len(chatbot.ISO_CURRENCY_CODES)} codes", lambda texts: [list(full.finditer(text)) for text in texts]),
+    ]
+    print(f"\n{'':<24} {'us/prompt':>10}")
+    for name, function in timings:
+        print(f"{name:<24} {best_us_per_prompt(function, prompts, args.repeat):>10.1f}")
@@ -0,0 +1,132 @@
+"""
+Endpoint latency (p50/p99) of one uvicorn worker under concurrent load, with
+a database that takes --query-seconds per query.
+
+Clients keep requesting the chat history, which reads MongoDB, while others
+poll /chatbot/status, which does not, every --poll-seconds. The history
+collection is replaced by a slow stand-in in two variants. The "async" one
+waits with asyncio.sleep, like the AsyncMongoClient the endpoints use now. The
+"blocking" one waits with time.sleep on the event loop, like the synchronous
+pymongo calls they used to make.
+
+    python benchmarks/endpoint_latency.py [--query-seconds 0.05] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("SESSION_STORE", "PLAN_CACHE_STORE", "SEARCH_CACHE_STORE"):
+    os.environ.setdefault(name, "memory")
+
+import httpx
+import uvicorn
+
+import main
+
+
+class SlowCursor:
+    def __init__(self, documents, wait):
+        self.documents = documents
+        self.wait = wait
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def skip(self, count):
+        return self
+
+    def limit(self, count):
+        return self
+
+    async def _rows(self):
+        await self.wait()
+        for document in self.documents:
+            yield document
+
+    def __aiter__(self):
+        return self._rows()
+
+
+class SlowCollection:
+    def __init__(self, query_seconds: float, blocking: bool):
+        self.documents = [{"_id": f"session-{n}", "title": "Trip to Ella", "timestamp": datetime(2025, 1, 1)} for n in range(20)]
+
+        async def wait():
+            if blocking:
+                time.sleep(query_seconds)
+            else:
+                await asyncio.sleep(query_seconds)
+        self.wait = wait
+
+    def find(self, *args, **kwargs):
+        return SlowCursor(self.documents, self.wait)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000 if values else 0.0
+
+
+def start_server(port: int):
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def load(base_url: str, seconds: float, history_clients: int, status_clients: int, poll_seconds: float) -> dict:
+    latencies = {"history": [], "status": []}
+    deadline = time.monotonic() + seconds
+
+    async def client_loop(client, kind, url, pause):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = await client.get(url)
+            response.raise_for_status()
+            latencies[kind].append(time.perf_counter() - start)
+            await asyncio.sleep(pause)
+
+    limits = httpx.Limits(max_connections=history_clients + status_clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(
+            *(client_loop(client, "history", "/chats/history/user@example.com", 0) for _ in range(history_clients)),
+            *(client_loop(client, "status", "/chatbot/status/latency-probe", poll_seconds) for _ in range(status_clients)),
+        )
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--query-seconds", type=float, default=0.05)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--history-clients", type=int, default=20)
+    parser.add_argument("--status-clients", type=int, default=5)
+    parser.add_argument("--poll-seconds", type=float, default=0.05, help="pause between a status client's polls")
+    args = parser.parse_args()
+
+    print(f"{'database calls':<16} {'endpoint':<9} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    main.session_store.create("latency-probe", {"status": "completed", "result": "plan"})
+    for blocking in (True, False):
+        main.async_chat_sessions_collection = SlowCollection(args.query_seconds, blocking)
+        port = free_port()
+        server, thread = start_server(port)
+        latencies = asyncio.run(load(f"http://127.0.0.1:{port}", args.seconds, args.history_clients, args.status_clients, args.poll_seconds))
+        server.should_exit = True
+        thread.join()
+        for kind, values in latencies.items():
+            label = "blocking (sync)" if blocking else "async"
+            print(f"{label:<16} {kind:<9} {len(values):>9} {percentile(values, 0.5):>8.1f} {percentile(values, 0.99):>8.1f}")
@@ -0,0 +1,85 @@
+"""
+Hit rate of the forecast cache on a replayed log of forecast requests.
+
+The log is JSON lines of {"timestamp": <unix seconds>, "city": ..., "start_date":
+"YYYY-MM-DD", "end_date": "YYYY-MM-DD"}, as the app writes to FORECAST_REQUEST_LOG.
+By default the log named by FORECAST_REQUEST_LOG is replayed if it exists, and
+otherwise the sample in benchmarks/data/forecast_requests.jsonl: the requests
+logged while planning the trips of the trip_details_accuracy corpus. With
+--generated N, a seeded day of N requests is generated instead: gazetteer
+destinations with a long-tail popularity, trips starting 1-14 days after the
+request and lasting 1-7 days. The Open-Meteo request is stubbed, and the
+cache's clock follows the log's timestamps.
+
+    python benchmarks/forecast_cache_replay.py [--log requests.jsonl | --generated 5000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import travel_chatbot
+from cache import DailyRecordCache
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "forecast_requests.jsonl")
+
+
+def generated_log(requests: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    cities = sorted(travel_chatbot.load_gazetteer())
+    weights = [1 / rank for rank in range(1, len(cities) + 1)]
+    start_of_day = datetime(2025, 9, 1).timestamp()
+    log = []
+    for _ in range(requests):
+        timestamp = start_of_day + rng.uniform(0, 24 * 3600)
+        start = datetime.fromtimestamp(timestamp).date() + timedelta(days=rng.randint(1, 14))
+        end = start + timedelta(days=rng.randint(0, 6))
+        log.append({"timestamp": timestamp, "city": rng.choices(cities, weights)[0], "start_date": str(start), "end_date": str(end)})
+    return sorted(log, key=lambda entry: entry["timestamp"])
+
+
+def replay(log: list[dict], bucket_seconds: float) -> dict:
+    now = [0.0]
+    fetches = []
+
+    def fake_fetch(lat, lon, start_date, end_date):
+        fetches.append((lat, lon, start_date, end_date))
+        return {day: (20, 30, 1) for day in travel_chatbot._date_range(start_date, end_date)}
+
+    travel_chatbot._fetch_daily_forecast = fake_fetch
+    travel_chatbot.forecast_cache = DailyRecordCache(bucket_seconds=bucket_seconds, clock=lambda: now[0])
+    for entry in log:
+        now[0] = entry["timestamp"]
+        lat, lon = travel_chatbot.geocode_city(entry["city"])
+        travel_chatbot.get_daily_forecast(lat, lon, entry["start_date"], entry["end_date"])
+    stats = travel_chatbot.get_forecast_cache_stats()
+    stats["api_requests"] = len(fetches)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--log", help="JSON lines of forecast requests to replay")
+    source.add_argument("--generated", type=int, metavar="REQUESTS", help="replay a generated day of this many requests")
+    parser.add_argument("--bucket-seconds", type=float, default=travel_chatbot.FORECAST_BUCKET_SECONDS)
+    args = parser.parse_args()
+
+    if args.generated:
+        log = generated_log(args.generated)
+        print(f"log:                  generated, {args.generated} requests")
+    else:
+        path = args.log or (travel_chatbot.FORECAST_REQUEST_LOG if os.path.exists(travel_chatbot.FORECAST_REQUEST_LOG) else SAMPLE_LOG)
+        with open(path, encoding="utf-8") as f:
+            log = sorted((json.loads(line) for line in f if line.strip()), key=lambda entry: entry["timestamp"])
+        print(f"log:                  {os.path.relpath(path)}")
+
+    stats = replay(log, args.bucket_seconds)
+    print(f"requests replayed:    {len(log)}")
+    print(f"Open-Meteo requests:  {stats['api_requests']} (without the cache: {len(log)})")
+    print(f"full / partial hits:  {stats['full_hits']} / {stats['partial_hits']}")
+    print(f"day hit rate:         {stats['day_hit_rate']:.1%}")
@@ -0,0 +1,64 @@
+"""
+Startup cost of each backend module: every module is imported in a fresh
+interpreter, which reports the time the import took and whether it pulled in
+crewAI. Exits non-zero if a module is slower than --max-seconds or if
+importing main loads crewAI, so startup regressions show up in CI.
+
+    python benchmarks/import_time.py [--repeat 3] [--max-seconds 2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "cache", "http_client", "scheduler", "session_events", "session_store", "passwords",
+    "database", "chat_writer", "plan_cache", "search_cache", "travel_chatbot", "main",
+]
+# Heavy dependencies that must only be imported on first use
+LAZY_MODULES = ["crewai", "crewai_tools", "IPython"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    env = dict(os.environ, CREWAI_DISABLE_TELEMETRY="true", OTEL_SDK_DISABLED="true",
+               SESSION_STORE="memory", PLAN_CACHE_STORE="memory", SEARCH_CACHE_STORE="memory")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<16} {'median ms':>10} {'max ms':>8}  heavy imports")
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        seconds = [run["seconds"] for run in runs]
+        loaded = runs[-1]["loaded"]
+        print(f"{module:<16} {statistics.median(seconds) * 1000:>10.0f} {max(seconds) * 1000:>8.0f}  {', '.join(loaded) or '-'}")
+        if statistics.median(seconds) > args.max_seconds:
+            failures.append(f"{module} takes {statistics.median(seconds):.2f}s to import")
+        if module == "main" and loaded:
+            failures.append(f"importing main loads {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,93 @@
+"""
+Load test: /chatbot/status latency on one uvicorn worker during a login storm.
+
+Status pollers run alone first, then alongside --login-clients clients that log
+in back to back. The storm runs twice: with bcrypt on the hashing pool, as
+login does now, and with bcrypt called directly on the event loop, as it used
+to be. The users collection is an in-memory stand-in holding one user hashed
+with the configured BCRYPT_ROUNDS.
+
+    python benchmarks/login_storm.py [--login-clients 20] [--seconds 5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+# Also puts backend/ on sys.path and keeps the session store in memory
+from endpoint_latency import free_port, percentile, start_server
+
+import main
+from passwords import bcrypt_version_problem, pwd_context
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+class FakeUsers:
+    def __init__(self):
+        self.user = {"_id": 1, "name": "Storm", "email": EMAIL, "hashed_password": pwd_context.hash(PASSWORD)}
+
+    async def find_one(self, query, *args, **kwargs):
+        return self.user if query.get("email") == EMAIL else None
+
+    async def update_one(self, *args, **kwargs):
+        pass
+
+
+async def verify_on_the_loop(password, hashed_password):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+async def load(base_url: str, seconds: float, login_clients: int, status_clients: int, poll_seconds: float) -> dict:
+    results = {"status": [], "logins": 0}
+    deadline = time.monotonic() + seconds
+
+    async def poll(client):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            (await client.get("/chatbot/status/storm-probe")).raise_for_status()
+            results["status"].append(time.perf_counter() - start)
+            await asyncio.sleep(poll_seconds)
+
+    async def log_in(client):
+        while time.monotonic() < deadline:
+            (await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})).raise_for_status()
+            results["logins"] += 1
+
+    limits = httpx.Limits(max_connections=login_clients + status_clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await asyncio.gather(*(poll(client) for _ in range(status_clients)), *(log_in(client) for _ in range(login_clients)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--login-clients", type=int, default=20)
+    parser.add_argument("--status-clients", type=int, default=5)
+    parser.add_argument("--poll-seconds", type=float, default=0.05)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    problem = bcrypt_version_problem()
+    if problem:
+        sys.exit(problem)
+
+    main.async_users_collection = FakeUsers()
+    main.session_store.create("storm-probe", {"status": "in_progress"})
+    hashing_pool = main.verify_password
+    phases = [("no logins", 0, hashing_pool), ("storm, hashing pool", args.login_clients, hashing_pool),
+              ("storm, on the loop", args.login_clients, verify_on_the_loop)]
+
+    print(f"{'phase':<22} {'logins/s':>9} {'status p50 ms':>14} {'status p99 ms':>14}")
+    for name, login_clients, verify in phases:
+        main.verify_password = verify
+        port = free_port()
+        server, thread = start_server(port)
+        results = asyncio.run(load(f"http://127.0.0.1:{port}", args.seconds, login_clients, args.status_clients, args.poll_seconds))
+        server.should_exit = True
+        thread.join()
+        status = results["status"]
+        print(f"{name:<22} {results['logins'] / args.seconds:>9.1f} {percentile(status, 0.5):>14.1f} {percentile(status, 0.99):>14.1f}")
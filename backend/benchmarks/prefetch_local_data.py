@@ -0,0 +1,109 @@
+"""
+End-to-end wall-clock time of a planning crew with and without prefetching
+the local data (PREFETCH_LOCAL_DATA). The real crewAI crew runs against a
+stub LLM and stub HTTP APIs with fixed latencies. Without prefetch, the Local
+Data agent calls the weather and currency tools one after the other, with an
+LLM round-trip around each call. With prefetch, both lookups run in parallel
+before the crew starts.
+
+    python benchmarks/prefetch_local_data.py [--llm-seconds 0.5] [--http-seconds 0.3] [--rounds 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("SEARCH_CACHE_STORE", "memory")
+
+import travel_chatbot
+from cache import DailyRecordCache, TTLCache
+
+START = date.today() + timedelta(days=3)
+END = START + timedelta(days=2)
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def fake_http_get(http_seconds: float):
+    def http_get(url, params=None, **kwargs):
+        time.sleep(http_seconds)
+        if url.startswith(travel_chatbot.OPEN_METEO_FORECAST_URL):
+            days = [str(START + timedelta(days=i)) for i in range((END - START).days + 1)]
+            return FakeResponse({"daily": {"time": days, "temperature_2m_min": [24] * len(days), "temperature_2m_max": [31] * len(days), "weathercode": [1] * len(days)}})
+        return FakeResponse({"rates": {"USD": 1.0, "LKR": 300.0}})
+    return http_get
+
+
+# What the Local Data agent's first LLM calls of each plan answer
+LOCAL_DATA_ACTIONS = [
+    f'Thought: I need the forecast.\nAction: Weather Tool\nAction Input: {{"city": "Ella", "start_date": "{START}", "end_date": "{END}"}}',
+    'Thought: Now the rate.\nAction: Currency Conversion Tool\nAction Input: {"from_currency": "USD", "to_currency": "LKR"}',
+]
+tool_calls = 0
+
+
+def fake_llm_class(llm_seconds: float):
+    from crewai import LLM
+
+    class FakeLLM(LLM):
+        """Answers after llm_seconds; as the Local Data agent it first calls its two tools."""
+
+        def call(self, messages, *args, **kwargs):
+            global tool_calls
+            time.sleep(llm_seconds)
+            text = json.dumps(messages) if not isinstance(messages, str) else messages
+            if "Local Data Specialist" in text and tool_calls < len(LOCAL_DATA_ACTIONS):
+                tool_calls += 1
+                return LOCAL_DATA_ACTIONS[tool_calls - 1]
+            return "Thought: I now know the final answer\nFinal Answer: Done."
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+    return FakeLLM
+
+
+def plan(prefetch: bool) -> float:
+    global tool_calls
+    tool_calls = 0
+    # Every plan starts with cold caches, as for a new destination
+    travel_chatbot.rate_table_cache = TTLCache(ttl_seconds=3600, max_entries=16)
+    travel_chatbot.forecast_cache = DailyRecordCache(bucket_seconds=3600)
+    start = time.perf_counter()
+    travel_chatbot.invoke_agent("Ella, Sri Lanka", "hiking and tea plantations", "100000 LKR", "2", f"{START} to {END}", "LKR", prefetch=prefetch)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-seconds", type=float, default=0.5)
+    parser.add_argument("--http-seconds", type=float, default=0.3)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    travel_chatbot.http_get = fake_http_get(args.http_seconds)
+    travel_chatbot._rate_limited_llm_class = lambda: fake_llm_class(args.llm_seconds)
+    plan(prefetch=True)  # builds the tools and LLMs outside the measurement
+
+    results = {}
+    for prefetch in (False, True):
+        results[prefetch] = [plan(prefetch) for _ in range(args.rounds)]
+    sequential, prefetched = statistics.median(results[False]), statistics.median(results[True])
+    print(f"Local Data agent (sequential): {sequential:.2f}s median over {args.rounds} plans")
+    print(f"prefetched local data:         {prefetched:.2f}s median over {args.rounds} plans")
+    print(f"saved per plan:                {sequential - prefetched:.2f}s ({(1 - prefetched / sequential) * 100:.0f}%)")
@@ -0,0 +1,122 @@
+"""
+Overload simulation of the planning job scheduler with fake LLM latencies.
+
+Jobs arrive at --arrival-rate per second, well above what the fake providers
+can serve. Each job makes LLM calls to two providers that reject calls beyond
+their concurrency limit, as a rate-limited API would. Two modes are compared:
+starting every job at once (no admission control), and JobScheduler plus
+ConcurrencyLimits set to the providers' limits. The report covers goodput per
+second, failed and rejected (429) jobs, and the latency of finished jobs.
+
+    python benchmarks/scheduler_overload.py [--arrival-rate 15] [--seconds 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import ConcurrencyLimits, JobScheduler, QueueFullError
+
+# provider: (concurrent calls it accepts, seconds per call)
+PROVIDERS = {"openrouter": (4, 0.4), "gemini": (16, 0.2)}
+# The LLM calls of one plan, in order
+JOB_CALLS = ["openrouter/glm", "gemini/flash", "openrouter/glm", "gemini/flash"]
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class FakeProvider:
+    def __init__(self, limit: int, latency: float):
+        self.limit = limit
+        self.latency = latency
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def call(self):
+        with self.lock:
+            if self.in_flight >= self.limit:
+                raise RateLimitError()
+            self.in_flight += 1
+        try:
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def simulate(bounded: bool, arrival_rate: float, seconds: float, max_running: int, max_queued: int) -> dict:
+    providers = {name: FakeProvider(*spec) for name, spec in PROVIDERS.items()}
+    limits = ConcurrencyLimits({name: spec[0] for name, spec in PROVIDERS.items()}, {}) if bounded else None
+    executor = ThreadPoolExecutor(max_workers=1024)
+    results = {"completed": [], "failed": 0, "rejected": 0}
+
+    def run_calls():
+        for model in JOB_CALLS:
+            with limits.slot(model) if limits else nullcontext():
+                providers[model.split("/")[0]].call()
+
+    async def job(arrived: float):
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, run_calls)
+            results["completed"].append((time.monotonic(), time.monotonic() - arrived))
+        except RateLimitError:
+            results["failed"] += 1
+
+    async def main():
+        scheduler = JobScheduler(max_running=max_running, max_queued=max_queued)
+        tasks = []
+        start = time.monotonic()
+        for number in range(int(arrival_rate * seconds)):
+            await asyncio.sleep(max(0.0, start + number / arrival_rate - time.monotonic()))
+            arrived = time.monotonic()
+            if not bounded:
+                tasks.append(asyncio.create_task(job(arrived)))
+                continue
+            try:
+                scheduler.submit(f"job-{number}", lambda arrived=arrived: job(arrived))
+            except QueueFullError:
+                results["rejected"] += 1
+        while not all(task.done() for task in tasks) or scheduler.stats()["running"] or scheduler.stats()["queued"]:
+            await asyncio.sleep(0.05)
+        return start
+
+    start = asyncio.run(main())
+    executor.shutdown()
+
+    finished = sorted(results["completed"])
+    per_second = [sum(1 for at, _ in finished if second <= at - start < second + 1) for second in range(int(seconds))]
+    latencies = sorted(latency for _, latency in finished)
+    return {
+        "completed": len(finished),
+        "failed": results["failed"],
+        "rejected": results["rejected"],
+        "goodput": per_second,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--arrival-rate", type=float, default=15.0)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--max-running", type=int, default=8)
+    parser.add_argument("--max-queued", type=int, default=20)
+    args = parser.parse_args()
+
+    for bounded in (False, True):
+        result = simulate(bounded, args.arrival_rate, args.seconds, args.max_running, args.max_queued)
+        print("scheduler + limits" if bounded else "no admission control")
+        print(f"  completed {result['completed']}, failed {result['failed']}, rejected with 429: {result['rejected']}")
+        print(f"  finished per second: {result['goodput']}")
+        print(f"  latency p50 {result['p50']:.2f}s, p95 {result['p95']:.2f}s")
@@ -0,0 +1,68 @@
+"""
+Lookup time of find_matching_session() with up to 100k live sessions, against
+the linear scan it replaced: every stored prompt checked for a substring match
+of every keyword. Half the queries share a word with some stored prompt and
+half match nothing, which is the scan's worst case.
+
+    python benchmarks/session_matching.py [--sessions 1000 10000 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import InMemorySessionStore, prompt_keywords
+
+WORDS = ["beach", "hiking", "temple", "surfing", "villa", "safari", "museum", "street", "food", "wildlife",
+         "waterfall", "history", "nightlife", "shopping", "diving", "trekking", "family", "budget", "luxury", "culture"]
+PLACES = [f"place{number}" for number in range(5000)]
+
+
+def random_prompt(rng: random.Random) -> str:
+    return f"trip to {rng.choice(PLACES)} with {' and '.join(rng.sample(WORDS, 3))}"
+
+
+def linear_scan(sessions: dict, prompt: str):
+    """The matching done before the keyword index: substring checks over every session."""
+    keywords = prompt_keywords(prompt)
+    for session_id, session in sessions.items():
+        if session.get("status") in ("completed", "setup_complete"):
+            if any(keyword in session.get("initial_prompt", "").lower() for keyword in keywords):
+                return session_id
+    return None
+
+
+def timed(function, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    print(f"{'sessions':>9} {'index us/lookup':>16} {'scan us/lookup':>15} {'create us':>10}")
+    for count in args.sessions:
+        store = InMemorySessionStore(max_entries=count)
+        sessions = {}
+        start = time.perf_counter()
+        for number in range(count):
+            session = {"status": "completed", "initial_prompt": random_prompt(rng)}
+            sessions[f"session-{number}"] = session
+            store.create(f"session-{number}", session)
+        create_us = (time.perf_counter() - start) / count * 1e6
+
+        queries = [random_prompt(rng) if number % 2 else f"something {rng.choice(['unheard', 'novel', 'unknown'])} entirely"
+                   for number in range(args.queries)]
+        index_us = timed(store.find_matching_session, queries)
+        # The scan is slow enough at 100k sessions that a sample of queries is plenty
+        scan_us = timed(lambda query: linear_scan(sessions, query), queries[:max(20, args.queries * 1000 // count)])
+        print(f"{count:>9} {index_us:>16.1f} {scan_us:>15.1f} {create_us:>10.1f}")
@@ -0,0 +1,91 @@
+"""
+Accuracy of the rule-based trip details extractor on a labelled corpus of
+prompts: how many fields it reads correctly, how many it gets wrong (the
+number that must stay at 0) and how many setup crews it saves.
+
+    python benchmarks/trip_details_accuracy.py
+"""
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from travel_chatbot import extract_trip_details, missing_trip_details
+
+N = "null"
+TODAY = date.today()
+
+
+def dates(start_month: int, start_day: int, end_month: int, end_day: int) -> str:
+    """The next such date range, as the extractor reports it."""
+    year = TODAY.year if (start_month, start_day) >= (TODAY.month, TODAY.day) else TODAY.year + 1
+    end_year = year if (end_month, end_day) >= (start_month, start_day) else year + 1
+    return f"{date(year, start_month, start_day)} to {date(end_year, end_month, end_day)}"
+
+
+# (prompt, location, budget, num_people, travel_dates)
+CORPUS = [
+    ("I want to go to mirissa. i would like a villa with a pool. This is for 5 people and the budget is 50000 LKR. august 5th to 6th", "Mirissa, Sri Lanka", "50000 LKR", "5", dates(8, 5, 8, 6)),
+    ("Planning to travel to Ella on september 6th and come back on 7th september, 2 people, budget 30000 rupees", "Ella, Sri Lanka", "30000 LKR", "2", dates(9, 6, 9, 7)),
+    ("trip to galle for 4 adults from dec 28 to jan 2 with a budget of 800 usd", "Galle, Sri Lanka", "800 USD", "4", dates(12, 28, 1, 2)),
+    ("Holiday in Bangkok for a family of 4, 2025-11-10 to 2025-11-15, budget $2,000", "Bangkok, Thailand", "2000 USD", "4", "2025-11-10 to 2025-11-15"),
+    ("we are three friends going to kandy, dates are flexible, 60000 LKR", "Kandy, Sri Lanka", "60000 LKR", "3", "flexible"),
+    ("solo trip to tokyo march 3 to 9, budget is 200000 yen", "Tokyo, Japan", "200000 JPY", "1", dates(3, 3, 3, 9)),
+    ("London for 2 people, 15th of july to 20th of july, £1500", N, "1500 GBP", "2", dates(7, 15, 7, 20)),
+    ("From colombo to sigiriya for 6 people, budget of 90000 lkr, aug 10-12", "Sigiriya, Sri Lanka", "90000 LKR", "6", dates(8, 10, 8, 12)),
+    ("I want a beach holiday somewhere nice", N, N, N, N),
+    ("goa with friends", N, N, N, N),
+    ("We'd love to visit paris, 2 travelers, 1000 euros", "Paris, France", "1000 EUR", "2", N),
+    ("going to phuket and singapore for 2 people in june 1 to 5 with 3000 usd", N, "3000 USD", "2", dates(6, 1, 6, 5)),
+    ("we are 3 friends with 200 pounds heading to dubai on may 4 to 6", "Dubai, United Arab Emirates", "200 GBP", "3", dates(5, 4, 5, 6)),
+    ("unawatuna 2 people, diving and surfing, 40000 LKR, any time", N, "40000 LKR", "2", "flexible"),
+    ("A week in rome for a group of six with a budget of 5000 euro from 10 oct to 14 oct", "Rome, Italy", "5000 EUR", "6", dates(10, 10, 10, 14)),
+    ("Sydney trip, 2 adults, budget 4000 australian dollars", N, "4000 AUD", "2", N),
+    ("nuwara eliya for 4 people, tea plantations, 25000 LKR, november 2nd to 4th", N, "25000 LKR", "4", dates(11, 2, 11, 4)),
+    ("Take me to arugam bay for surfing, 3 people, 45000 rupees, flexible dates", "Arugam Bay, Sri Lanka", "45000 LKR", "3", "flexible"),
+    ("Exploring mumbai, 2 pax, budget is 40000 INR, feb 14 to 16", "Mumbai, India", "40000 INR", "2", dates(2, 14, 2, 16)),
+    ("I'd like to see trincomalee with 5 friends, 2 grand total budget", "Trincomalee, Sri Lanka", N, "5", N),
+    # The user's home and people's names are not destinations
+    ("I live in London and want to visit Barcelona for 2 people in may 4 to 6", N, N, "2", dates(5, 4, 5, 6)),
+    ("I live in london and want to visit kandy with 3 friends, 500 usd", "Kandy, Sri Lanka", "500 USD", "3", N),
+    ("My daughter Ella and I want to visit Kandy, 2 people, 50000 LKR, october 20 to 22", "Kandy, Sri Lanka", "50000 LKR", "2", dates(10, 20, 10, 22)),
+    ("Ella wants a beach holiday for 2 people", N, N, "2", N),
+    ("trip to kandy, ella and galle for 4 people", N, N, "4", N),
+    ("we're based in colombo, planning 3 days in galle, just me, 20000 LKR, january 3 to 5", "Galle, Sri Lanka", "20000 LKR", "1", dates(1, 3, 1, 5)),
+]
+FIELDS = ["location", "budget", "num_people", "travel_dates"]
+
+
+def evaluate(corpus=CORPUS):
+    """Returns (correct, wrong, unknown, skipped) and prints each wrong field."""
+    correct = wrong = unknown = skipped = 0
+    for prompt, *expected in corpus:
+        details = extract_trip_details(prompt)
+        for field, value in zip(FIELDS, expected):
+            if details[field] == value:
+                correct += 1
+            elif details[field] == N:
+                unknown += 1
+            else:
+                wrong += 1
+                print(f"WRONG {field}: {details[field]!r}, expected {value!r} | {prompt[:60]}")
+        if not missing_trip_details(details):
+            skipped += 1
+    return correct, wrong, unknown, skipped
+
+
+if __name__ == "__main__":
+    correct, wrong, unknown, skipped = evaluate()
+    complete = sum(N not in expected for _, *expected in CORPUS)
+    print(f"fields: {correct}/{len(CORPUS) * len(FIELDS)} correct, {wrong} wrong, {unknown} left to the setup crew")
+    print(f"setup crews skipped: {skipped}/{len(CORPUS)} ({complete} prompts in the corpus are complete)")
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for prompt, *_ in CORPUS:
+            extract_trip_details(prompt)
+    print(f"{(time.perf_counter() - start) / (rounds * len(CORPUS)) * 1e6:.0f} us per prompt")
+    sys.exit(1 if wrong else 0)
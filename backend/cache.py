@@ -0,0 +1,306 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, Callable, Dict, Hashable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only writers within one process are serialized
+    fcntl = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    get_or_load() coalesces concurrent misses: while one thread runs the loader
+    for a key, other threads asking for the same key wait for its result
+    instead of starting their own fetch.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, "_Load"] = {}
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    def _lookup(self, key: Hashable) -> tuple[bool, Any]:
+        """Returns (found, value); must be called with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        """Inserts a value and evicts the least recently used entries; lock must be held."""
+        expires_at = self._clock() + (self.ttl_seconds if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            found, value = self._lookup(key)
+            self._stats["hits" if found else "misses"] += 1
+            return value if found else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float | Callable[[Any], float]] = None) -> Any:
+        """
+        Returns the cached value for key, calling loader() on a miss. A result of
+        None is returned to every waiter but not cached, so failures are retried.
+        ttl may be a function of the loaded value, e.g. to keep negative results
+        for a shorter time.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._stats["hits"] += 1
+                return value
+            self._stats["misses"] += 1
+            load = self._inflight.get(key)
+            leader = load is None
+            if leader:
+                load = self._inflight[key] = _Load()
+                self._stats["loads"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            return load.wait()
+
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            load.fail(exc)
+            raise
+
+        with self._lock:
+            if value is not None:
+                self._store(key, value, ttl(value) if callable(ttl) else ttl)
+            self._inflight.pop(key, None)
+        load.resolve(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class _Load:
+    """Result slot shared by the threads waiting on one in-flight load."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._value = None
+        self._error: Optional[BaseException] = None
+
+    def resolve(self, value: Any) -> None:
+        self._value = value
+        self._done.set()
+
+    def fail(self, error: BaseException) -> None:
+        self._error = error
+        self._done.set()
+
+    def wait(self) -> Any:
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class JsonFileCache:
+    """
+    Small persistent key/value cache stored as one JSON file. Entries carry a
+    wall-clock expiry so they survive restarts; the whole file is rewritten
+    atomically on every change, which is fine for a few thousand entries.
+    Several processes may share the file: each write merges in what the
+    others have written since and leaves expired entries out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Reads the file on first use; must be called with the lock held."""
+        if self._entries is None:
+            self._entries = self._read_file()
+        return self._entries
+
+    def _read_file(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or entry["expires_at"] <= time.time():
+            return default
+        return entry["value"]
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"value": value, "expires_at": time.time() + ttl_seconds}
+            self._write(entries)
+
+    def items(self) -> list[tuple[str, Any, float]]:
+        """(key, value, seconds until it expires) of every entry that has not expired yet."""
+        now = time.time()
+        with self._lock:
+            return [(key, entry["value"], entry["expires_at"] - now) for key, entry in self._load().items() if entry["expires_at"] > now]
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes writers in all processes sharing the file, where the platform supports it."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Replaces the file with entries merged into its current contents, the
+        later expiry winning, and without expired entries. entries is updated
+        to the merged view; must be called with the lock held.
+        """
+        directory = os.path.dirname(self.path)
+        tmp_path = None
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._file_lock():
+                now = time.time()
+                merged: Dict[str, Dict[str, Any]] = {}
+                for key, entry in chain(self._read_file().items(), entries.items()):
+                    if entry["expires_at"] > now and (key not in merged or entry["expires_at"] > merged[key]["expires_at"]):
+                        merged[key] = entry
+                entries.clear()
+                entries.update(merged)
+                # A temporary file of our own, so processes sharing the cache file never write into each other's
+                fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{os.path.basename(self.path)}.", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not persist cache file {self.path}: {e}")
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class DailyRecordCache:
+    """
+    Per-day records (e.g. weather forecasts) cached per location.
+
+    A record fetched at time t stays valid until the end of the time bucket
+    containing t, so every location is refreshed at the same fixed boundaries.
+    A request for a date range is answered from whatever days are cached and
+    reports only the missing days, which the caller fetches and put()s back.
+    """
+
+    def __init__(self, bucket_seconds: float, max_locations: int = 1024, clock: Callable[[], float] = time.time):
+        self.bucket_seconds = bucket_seconds
+        self.max_locations = max_locations
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._locations: "OrderedDict[Hashable, Dict[str, tuple[float, Any]]]" = OrderedDict()
+        self._stats = {"requests": 0, "full_hits": 0, "partial_hits": 0, "misses": 0,
+                       "days_from_cache": 0, "days_fetched": 0, "evictions": 0}
+
+    def get_range(self, location: Hashable, days: list[str]) -> tuple[Dict[str, Any], list[str]]:
+        """Returns (records found by day, days that still need fetching)."""
+        now = self._clock()
+        found: Dict[str, Any] = {}
+        missing: list[str] = []
+        with self._lock:
+            records = self._locations.get(location)
+            if records is not None:
+                self._locations.move_to_end(location)
+            for day in days:
+                entry = records.get(day) if records else None
+                if entry is not None and entry[0] > now:
+                    found[day] = entry[1]
+                else:
+                    missing.append(day)
+            self._stats["requests"] += 1
+            self._stats["days_from_cache"] += len(found)
+            if not missing:
+                self._stats["full_hits"] += 1
+            elif found:
+                self._stats["partial_hits"] += 1
+            else:
+                self._stats["misses"] += 1
+        return found, missing
+
+    def put(self, location: Hashable, records: Dict[str, Any]) -> None:
+        now = self._clock()
+        valid_until = (now // self.bucket_seconds + 1) * self.bucket_seconds
+        with self._lock:
+            stored = self._locations.setdefault(location, {})
+            self._locations.move_to_end(location)
+            # Drop stale days so a location's dict cannot grow without bound
+            for day in [day for day, entry in stored.items() if entry[0] <= now]:
+                del stored[day]
+            for day, record in records.items():
+                stored[day] = (valid_until, record)
+            self._stats["days_fetched"] += len(records)
+            while len(self._locations) > self.max_locations:
+                self._locations.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["locations"] = len(self._locations)
+        days = stats["days_from_cache"] + stats["days_fetched"]
+        stats["day_hit_rate"] = round(stats["days_from_cache"] / days, 4) if days else 0.0
+        return stats
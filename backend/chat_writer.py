@@ -0,0 +1,91 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+# Acknowledge chat messages once they are buffered and write them to MongoDB
+# in batches, flushing when the buffer is full or has waited long enough
+CHAT_WRITE_BUFFER = os.getenv("CHAT_WRITE_BUFFER", "false").lower() == "true"
+CHAT_WRITE_BUFFER_SIZE = int(os.getenv("CHAT_WRITE_BUFFER_SIZE", "100"))
+CHAT_WRITE_BUFFER_SECONDS = float(os.getenv("CHAT_WRITE_BUFFER_SECONDS", "0.5"))
+
+
+class ChatWriteBuffer:
+    """
+    Write-behind buffer for chat messages.
+
+    add() only queues messages; they are written with await write(messages)
+    once max_messages are waiting or the oldest has waited max_delay seconds,
+    so a user/assistant pair or an imported history costs one round-trip. A
+    batch that fails is put back and retried on the next flush, up to
+    max_pending buffered messages. Buffered messages are not visible to
+    readers until they are flushed.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        max_messages: int = CHAT_WRITE_BUFFER_SIZE,
+        max_delay: float = CHAT_WRITE_BUFFER_SECONDS,
+        max_pending: Optional[int] = None,
+    ):
+        self.write = write
+        self.max_messages = max_messages
+        self.max_delay = max_delay
+        self.max_pending = max_pending or max_messages * 100
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+        self._stats = {"buffered": 0, "flushes": 0, "written": 0, "failed_flushes": 0, "dropped": 0}
+
+    def add(self, messages: List[Dict[str, Any]]) -> None:
+        """Queues messages for writing; must be called on the event loop."""
+        self._pending.extend(messages)
+        self._stats["buffered"] += len(messages)
+        if len(self._pending) >= self.max_messages:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> None:
+        """Writes everything buffered so far."""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._stats["flushes"] += 1
+            try:
+                await self.write(batch)
+                self._stats["written"] += len(batch)
+            except PyMongoError as e:
+                self._stats["failed_flushes"] += 1
+                retained = (batch + self._pending)[:self.max_pending]
+                self._stats["dropped"] += len(batch) + len(self._pending) - len(retained)
+                self._pending = retained
+                print(f"Could not write {len(batch)} buffered chat messages: {e}")
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+
+    async def close(self) -> None:
+        """Flushes the remaining messages, e.g. at shutdown."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["pending"] = len(self._pending)
+        return stats
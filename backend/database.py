@@ -1,22 +1,164 @@
 import os
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from dotenv import load_dotenv
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 
-# Create a new client and connect to the server
-client = MongoClient(MONGO_URI)
+# Connection pool size of each client (the sync one serves worker threads, the async one the endpoints)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
 
-# Send a ping to confirm a successful connection
-try:
-    client.admin.command('ping')
-    print("Pinged your deployment. You successfully connected to MongoDB!")
-except Exception as e:
-    print(e)
+# Rebuild the chat_sessions summaries from the chats collection at startup
+CHAT_SESSIONS_BACKFILL = os.getenv("CHAT_SESSIONS_BACKFILL", "false").lower() == "true"
+
+# Length of a session's title in the chat sidebar
+CHAT_TITLE_LENGTH = 50
+
+# Server error code of a write that hit an existing _id
+DUPLICATE_KEY_ERROR = 11000
+
+# Create a new client; it connects in the background, so nothing here waits on the server
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
 
 # Get a reference to the database and collections
 db = client.travel_agent_db
 users_collection = db["users"]
-chats_collection = db["chats"]
\ No newline at end of file
+chats_collection = db["chats"]
+# One summary document per chat session (_id = session_id) for the sidebar
+chat_sessions_collection = db["chat_sessions"]
+
+# Async client for code running on the event loop, so a slow query only
+# suspends the request that issued it instead of the whole worker
+async_client = AsyncMongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+async_db = async_client.travel_agent_db
+async_users_collection = async_db["users"]
+async_chats_collection = async_db["chats"]
+async_chat_sessions_collection = async_db["chat_sessions"]
+
+# Indexes matching the query shapes of the chat endpoints:
+# - session messages: match session_id, keyset-paginate on (timestamp, _id)
+# - history: match user_email on the summaries, newest session first
+CHAT_INDEXES = [
+    [("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+]
+CHAT_SESSION_INDEXES = [
+    [("user_email", ASCENDING), ("timestamp", DESCENDING)],
+]
+
+def ping():
+    """Sends a ping to confirm a successful connection; called at startup rather than on import."""
+    try:
+        client.admin.command('ping')
+        print("Pinged your deployment. You successfully connected to MongoDB!")
+    except Exception as e:
+        print(e)
+
+def ensure_indexes():
+    """Creates the collections' indexes if they are missing; called once at startup."""
+    try:
+        for keys in CHAT_INDEXES:
+            chats_collection.create_index(keys)
+        for keys in CHAT_SESSION_INDEXES:
+            chat_sessions_collection.create_index(keys)
+        users_collection.create_index([("email", ASCENDING)], unique=True)
+    except PyMongoError as e:
+        print(f"Could not create MongoDB indexes: {e}")
+
+def chat_summary_updates(messages):
+    """
+    Updates that fold newly saved chat messages into their sessions'
+    summaries: first/last timestamp and message count, plus the title and
+    timestamp shown in the sidebar, taken from the session's first user
+    message. Messages are grouped per session, so a batch costs at most two
+    updates per session. Apply them in order with
+    chat_sessions_collection.bulk_write().
+    """
+    sessions = {}
+    for message in messages:
+        summary = sessions.setdefault(message["session_id"], {
+            "user_email": message["user_email"],
+            "first_timestamp": message["timestamp"],
+            "last_timestamp": message["timestamp"],
+            "message_count": 0,
+            "first_user_message": None,
+        })
+        summary["first_timestamp"] = min(summary["first_timestamp"], message["timestamp"])
+        summary["last_timestamp"] = max(summary["last_timestamp"], message["timestamp"])
+        summary["message_count"] += 1
+        first_user_message = summary["first_user_message"]
+        if message["sender"] == "user" and (first_user_message is None or message["timestamp"] < first_user_message["timestamp"]):
+            summary["first_user_message"] = message
+
+    updates = []
+    for session_id, summary in sessions.items():
+        updates.append(UpdateOne(
+            {"_id": session_id},
+            {
+                "$setOnInsert": {"user_email": summary["user_email"]},
+                "$min": {"first_timestamp": summary["first_timestamp"]},
+                "$max": {"last_timestamp": summary["last_timestamp"]},
+                "$inc": {"message_count": summary["message_count"]},
+            },
+            upsert=True,
+        ))
+        first_user_message = summary["first_user_message"]
+        if first_user_message is not None:
+            updates.append(UpdateOne(
+                {"_id": session_id, "title": {"$exists": False}},
+                {"$set": {
+                    "title": first_user_message["content"][:CHAT_TITLE_LENGTH],
+                    "timestamp": first_user_message["timestamp"],
+                }},
+            ))
+    return updates
+
+async def save_chat_messages(messages):
+    """
+    Stores chat messages with one unordered insert_many and updates their
+    sessions' summaries with one bulk_write. Returns the number of messages
+    stored; messages rejected by the insert are left out of the summaries.
+    A message that is already stored (a retried batch whose summary update
+    failed) counts as stored, so its summary update is retried as well.
+    """
+    if not messages:
+        return 0
+    try:
+        await async_chats_collection.insert_many(messages, ordered=False)
+        inserted = messages
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY_ERROR}
+        inserted = [message for index, message in enumerate(messages) if index not in failed]
+        if failed:
+            print(f"{len(failed)} of {len(messages)} chat messages could not be saved")
+    if inserted:
+        await async_chat_sessions_collection.bulk_write(chat_summary_updates(inserted))
+    return len(inserted)
+
+def backfill_chat_sessions():
+    """Rebuilds chat_sessions from every message in chats, for data saved before the summaries existed."""
+    try:
+        chats_collection.aggregate([
+            {"$group": {
+                "_id": "$session_id",
+                "user_email": {"$first": "$user_email"},
+                "first_timestamp": {"$min": "$timestamp"},
+                "last_timestamp": {"$max": "$timestamp"},
+                "message_count": {"$sum": 1},
+            }},
+            {"$merge": {"into": "chat_sessions", "whenMatched": "merge", "whenNotMatched": "insert"}},
+        ])
+        chats_collection.aggregate([
+            {"$match": {"sender": "user"}},
+            {"$sort": {"timestamp": 1}},
+            {"$group": {
+                "_id": "$session_id",
+                "title": {"$first": {"$substrCP": ["$content", 0, CHAT_TITLE_LENGTH]}},
+                "timestamp": {"$first": "$timestamp"},
+            }},
+            {"$merge": {"into": "chat_sessions", "whenMatched": "merge", "whenNotMatched": "discard"}},
+        ])
+        print("Backfilled chat session summaries.")
+    except PyMongoError as e:
+        print(f"Could not backfill chat session summaries: {e}")
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "8"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_MAX_CONCURRENCY_PER_HOST = int(os.getenv("HTTP_MAX_CONCURRENCY_PER_HOST", "10"))
+
+# Number of recent latency samples kept per host for percentiles
+LATENCY_SAMPLES = 500
+
+
+class HttpClient:
+    """
+    Outbound HTTP layer shared by all tools.
+
+    One requests.Session keeps connections alive per host; every call gets a
+    timeout, idempotent requests are retried with exponential backoff on
+    connection errors and 429/5xx responses, at most max_per_host calls run
+    against one host at a time, and latency is recorded per host.
+    """
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_factor: float = HTTP_BACKOFF_FACTOR,
+        pool_size: int = HTTP_POOL_SIZE,
+        max_per_host: int = HTTP_MAX_CONCURRENCY_PER_HOST,
+    ):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._latency: Dict[str, Dict[str, Any]] = {}
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return limit
+
+    def _record(self, host: str, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._latency.setdefault(
+                host, {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                       "samples": deque(maxlen=LATENCY_SAMPLES)}
+            )
+            stats["requests"] += 1
+            stats["errors"] += int(failed)
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            stats["samples"].append(elapsed)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """Same as requests.get, through the shared pool, limits and retry policy."""
+        host = urlsplit(url).netloc
+        with self._host_limit(host):
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+                failed = response.status_code >= 500
+                return response
+            finally:
+                self._record(host, time.perf_counter() - start, failed)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host request counts and latency in milliseconds."""
+        result = {}
+        with self._lock:
+            snapshot = {host: (dict(stats), sorted(stats["samples"])) for host, stats in self._latency.items()}
+        for host, (stats, samples) in snapshot.items():
+            result[host] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "avg_ms": round(1000 * stats["total_seconds"] / stats["requests"], 1),
+                "p50_ms": round(1000 * samples[len(samples) // 2], 1),
+                "p95_ms": round(1000 * samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+                "max_ms": round(1000 * stats["max_seconds"], 1),
+            }
+        return result
+
+
+http_client = HttpClient()
+http_get = http_client.get
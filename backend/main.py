@@ -1,35 +1,91 @@
 import os
 from dotenv import load_dotenv
-from functools import lru_cache
-from crewai import LLM, Agent, Task, Crew, Process
-from datetime import datetime
-import requests
+from datetime import datetime, timezone
 import json
-from crewai.tools import tool
-from crewai_tools import SerperDevTool
-import re
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
+from contextlib import asynccontextmanager
 import uuid
+import threading
 import time
-from passlib.context import CryptContext
+import asyncio
+from bson import ObjectId
+from bson.errors import InvalidId
 
 # Import your database collections and travel_chatbot functions
-from database import users_collection, chats_collection
+from database import (
+    async_client,
+    async_users_collection,
+    async_chats_collection,
+    async_chat_sessions_collection,
+    save_chat_messages,
+    ping,
+    ensure_indexes,
+    backfill_chat_sessions,
+    CHAT_SESSIONS_BACKFILL,
+)
 from travel_chatbot import (
     create_setup_crew,
-    invoke_agent,
+    invoke_agent_async,
+    kickoff_in_crew_pool,
     extract_json_from_response,
-    human_input_tool,
+    extract_trip_details,
+    missing_trip_details,
+    fill_trip_detail,
+    merge_trip_details,
+    TRIP_DETAIL_QUESTIONS,
+    clean_markdown_output,
+    get_exchange_rate_cache_stats,
+    get_geocode_cache_stats,
+    get_forecast_cache_stats,
+    prewarm_geocode_cache,
+    preload_crew_dependencies,
 )
+from session_events import session_events, format_sse
+from http_client import http_client
+from scheduler import job_scheduler, job_coalescer, llm_limits, QueueFullError
+from session_store import create_session_store
+from chat_writer import ChatWriteBuffer, CHAT_WRITE_BUFFER
+from passwords import hash_password, verify_password, bcrypt_version_problem
+from plan_cache import create_plan_cache, plan_key
+from search_cache import search_cache
 
 # Load environment variables
 load_dotenv()
-os.environ["SERPER_API_KEY"] = os.getenv("SERPER_API_KEY")
 
-app = FastAPI(title="Travel Chatbot API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything below runs in the background so startup never waits on MongoDB,
+    # the network or the crewAI import
+    threading.Thread(target=prepare_database, daemon=True).start()
+    threading.Thread(target=preload_crew_dependencies, daemon=True).start()
+    prewarm_cities = [c.strip() for c in os.getenv("GEOCODE_PREWARM_CITIES", "").split(",") if c.strip()]
+    threading.Thread(target=prewarm_geocode_cache, args=(prewarm_cities,), daemon=True).start()
+    # Signup and login would fail on every request; say why once, up front
+    bcrypt_problem = bcrypt_version_problem()
+    if bcrypt_problem:
+        print(f"Warning: {bcrypt_problem}")
+    yield
+    if chat_write_buffer is not None:
+        await chat_write_buffer.close()
+    await async_client.close()
+
+def prepare_database():
+    """Checks the MongoDB connection and creates indexes."""
+    ping()
+    ensure_indexes()
+    session_store.setup()
+    if plan_cache is not None:
+        plan_cache.setup()
+    search_cache.setup()
+    if CHAT_SESSIONS_BACKFILL:
+        backfill_chat_sessions()
+
+app = FastAPI(title="Travel Chatbot API", lifespan=lifespan)
 
 # CORS Middleware
 origins = ["http://localhost:8080", "http://127.0.0.1:8080"]
@@ -41,9 +97,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # --- Pydantic Models ---
 class UserCreate(BaseModel):
     name: str
@@ -59,10 +112,20 @@ class ChatMessage(BaseModel):
     user_email: str
     content: str
     sender: str
+    # Defaults to the time the server receives the message; set it when importing history
+    timestamp: Optional[datetime] = None
+
+# Largest number of messages accepted by one batch request
+MAX_CHAT_BATCH = 1000
+
+class ChatMessageBatch(BaseModel):
+    messages: List[ChatMessage] = Field(..., min_length=1, max_length=MAX_CHAT_BATCH)
 
 class ChatbotRequest(BaseModel):
     prompt: str
     session_id: Optional[str] = None
+    # Plan from scratch even if a cached plan matches the trip details
+    bypass_cache: bool = False
 
 class ChatbotResponse(BaseModel):
     session_id: str
@@ -82,141 +145,396 @@ class ChatHistoryItem(BaseModel):
     title: str
     timestamp: datetime
 
-# In-memory session storage for active chats
-sessions: Dict[str, Dict[str, Any]] = {}
+# Chat session state, in memory or in MongoDB depending on SESSION_STORE.
+# Streaming replay logs are dropped together with evicted sessions.
+session_store = create_session_store(on_evict=session_events.discard)
+
+# Futures for sessions whose setup crew is waiting on a human answer.
+# /chatbot/input resolves the future so the crew resumes immediately.
+input_futures: Dict[str, asyncio.Future] = {}
+HUMAN_INPUT_TIMEOUT = 300  # 5 minutes
+
+# With a shared session store the answer may arrive on another worker, which
+# can only record it in the store; waiting crews check the store this often
+HUMAN_INPUT_POLL_SECONDS = 1
+
+# Minimum seconds between writes of the streamed report to a shared session
+# store; the in-memory store is updated on every chunk
+PARTIAL_RESULT_FLUSH_SECONDS = 1
+
+# Finished plans of first messages, reused for later trips with the same details
+plan_cache = create_plan_cache()
+
+# How first messages got their trip details: read by the rule-based extractor from
+# the prompt and the answers to its questions, or completed by the setup crew
+setup_stats = {"rule_based": 0, "setup_crew": 0}
+
+async def in_session_store(method, *args, **kwargs):
+    """
+    Calls a session_store method from the event loop. Stores that do network
+    I/O run the call in a worker thread so the loop is never blocked.
+    """
+    if session_store.blocking:
+        return await asyncio.to_thread(method, *args, **kwargs)
+    return method(*args, **kwargs)
+
+async def set_session_status(session_id: str, status: str, fields: Optional[Dict[str, Any]] = None, **data):
+    """
+    Updates a session's status, together with any other session fields, and
+    pushes the change to streaming clients. Sessions coalesced into this one
+    get the same update.
+    """
+    for target_id in job_coalescer.sessions(session_id):
+        await in_session_store(session_store.update, target_id, status=status, **(fields or {}))
+    publish_event(session_id, status, data)
+
+def publish_event(session_id: str, event: str, data: Optional[Dict[str, Any]] = None):
+    """Publishes a job event to the session and to the sessions coalesced into it."""
+    for target_id in job_coalescer.sessions(session_id):
+        session_events.publish(target_id, event, data)
+
+def update_partial_result(session_id: str, text: str):
+    """Stores the streamed report so far; called from crew threads."""
+    for target_id in job_coalescer.sessions(session_id):
+        session_store.update(target_id, partial_result=text)
+
+# Session fields a request coalesced into a running job copies from that job's session.
+# The leader's own answers (conversation_history, pending_input) are never copied.
+COALESCED_FIELDS = ("status", "partial_result", "result", "error")
+
+def coalescing_prompt(prompt: str) -> str:
+    """Prompts that differ only in case and whitespace are the same request."""
+    return " ".join(prompt.lower().split())
+
+async def attach_to_job(session_id: str, leader_id: str):
+    """Makes a session follow the job of leader_id, starting from that job's current state."""
+    leader = await in_session_store(session_store.get, leader_id) or {}
+    fields = {field: leader.get(field) for field in COALESCED_FIELDS if field in leader}
+    await in_session_store(session_store.update, session_id, coalesced_into=leader_id, **fields)
+
+async def release_job(session_id: str, error: Optional[str] = None):
+    """
+    Ends session_id's lead on its coalescing keys. Its followers keep the
+    state the job left them in, or are failed with error if the job never ran.
+    """
+    for follower_id in job_coalescer.release(session_id):
+        fields = {"status": "error", "error": error} if error else {}
+        await in_session_store(session_store.update, follower_id, coalesced_into=None, **fields)
+        if error:
+            session_events.publish(follower_id, "error", {"error": error})
 
 # --- Authentication Endpoints ---
 @app.post("/auth/signup")
 async def signup(user: UserCreate):
-    if users_collection.find_one({"email": user.email}):
+    if await async_users_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
     user_data = user.model_dump()
     user_data["hashed_password"] = hashed_password
     del user_data["password"]
-    users_collection.insert_one(user_data)
+    await async_users_collection.insert_one(user_data)
     return {"message": "User created successfully"}
 
 @app.post("/auth/login")
 async def login(user: UserLogin):
-    db_user = users_collection.find_one({"email": user.email})
-    if not db_user or not pwd_context.verify(user.password, db_user["hashed_password"]):
+    db_user = await async_users_collection.find_one({"email": user.email})
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+    valid, new_hash = await verify_password(user.password, db_user["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
+    if new_hash:
+        # The bcrypt cost has changed since this password was hashed
+        await async_users_collection.update_one({"_id": db_user["_id"]}, {"$set": {"hashed_password": new_hash}})
     return {"message": "Login successful", "user": {"name": db_user["name"], "email": db_user["email"]}}
 
 @app.get("/chats/history/{user_email}", response_model=List[ChatHistoryItem])
-async def get_chat_history(user_email: str):
+async def get_chat_history(
+    user_email: str,
+    limit: int = Query(50, ge=1, le=200),
+    skip: int = Query(0, ge=0),
+):
     """
-    Retrieves the chat history for a user, grouped by session.
-    Each session is represented by its first message.
+    Retrieves the chat history for a user, one item per session, newest
+    first. Each session is represented by its first user message, read from
+    the chat_sessions summaries that save_chat_message keeps up to date.
     """
-    pipeline = [
-        # Find all messages for the given user
-        {"$match": {"user_email": user_email, "sender": "user"}},
-        # Sort messages by timestamp to find the first one in each session
-        {"$sort": {"timestamp": 1}},
-        # Group by session_id and get the first message content as the title
-        {
-            "$group": {
-                "_id": "$session_id",
-                "title": {"$first": "$content"},
-                "timestamp": {"$first": "$timestamp"}
-            }
-        },
-        # Sort the sessions themselves by the most recent
-        {"$sort": {"timestamp": -1}},
-        # Format the output
-        {
-            "$project": {
-                "session_id": "$_id",
-                "title": {"$substr": ["$title", 0, 50]}, # Truncate title for preview
-                "timestamp": 1,
-                "_id": 0
-            }
-        }
+    summaries = async_chat_sessions_collection.find(
+        {"user_email": user_email, "title": {"$exists": True}},
+        {"title": 1, "timestamp": 1},
+    ).sort("timestamp", -1).skip(skip).limit(limit)
+    return [
+        {"session_id": summary["_id"], "title": summary["title"], "timestamp": summary["timestamp"]}
+        async for summary in summaries
     ]
-    history = list(chats_collection.aggregate(pipeline))
-    return history
 
 # --- NEW: Endpoint to get messages for one session ---
+# Message fields a client may select with ?fields=; _id and timestamp are always included
+MESSAGE_FIELDS = {"session_id", "user_email", "content", "sender"}
+
+def encode_message_cursor(message) -> str:
+    return f"{message['timestamp'].isoformat()}|{message['_id']}"
+
+def decode_message_cursor(cursor: str):
+    """Parses a cursor from encode_message_cursor into (timestamp, ObjectId)."""
+    try:
+        timestamp, _, message_id = cursor.partition("|")
+        return datetime.fromisoformat(timestamp), ObjectId(message_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def serialize_message(message) -> Dict[str, Any]:
+    # Convert ObjectId to string for JSON serialization
+    message["_id"] = str(message["_id"])
+    return message
+
 @app.get("/chats/session/{session_id}")
-async def get_session_messages(session_id: str):
-    """Retrieves all messages for a specific session, sorted by time."""
-    messages_cursor = chats_collection.find(
-        {"session_id": session_id}
-    ).sort("timestamp", 1)
-    
-    messages = []
-    for msg in messages_cursor:
-        # Convert ObjectId to string for JSON serialization
-        msg["_id"] = str(msg["_id"])
-        messages.append(msg)
+async def get_session_messages(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Retrieves the messages of a specific session, sorted by time.
+
+    With limit, returns one page: the latest messages older than the
+    `before` cursor (the newest page when omitted) as
+    {"messages": [...], "next_cursor": ...}; pass next_cursor as `before` to
+    load the previous page. Without limit, the whole session is streamed as
+    a JSON array. `fields` is a comma-separated subset of MESSAGE_FIELDS.
+    """
+    projection = None
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - MESSAGE_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        projection = {field: 1 for field in requested | {"timestamp"}}
+
+    if limit is None:
+        if before:
+            raise HTTPException(status_code=400, detail="before requires limit")
+        if not await async_chats_collection.find_one({"session_id": session_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        async def export_messages():
+            messages_cursor = async_chats_collection.find({"session_id": session_id}, projection).sort([("timestamp", 1), ("_id", 1)])
+            yield "["
+            separator = ""
+            async for msg in messages_cursor:
+                yield separator + json.dumps(jsonable_encoder(serialize_message(msg)))
+                separator = ","
+            yield "]"
 
-    if not messages:
+        return StreamingResponse(export_messages(), media_type="application/json")
+
+    query: Dict[str, Any] = {"session_id": session_id}
+    if before:
+        timestamp, message_id = decode_message_cursor(before)
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": message_id}},
+        ]
+    # Read newest first and fetch one extra message to know whether an older page exists
+    page = await async_chats_collection.find(query, projection).sort([("timestamp", -1), ("_id", -1)]).limit(limit + 1).to_list()
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page and not before:
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    return messages
 
-# --- Chat Message Saving Endpoint ---
+    next_cursor = encode_message_cursor(page[-1]) if has_more else None
+    page.reverse()
+    return {"messages": [serialize_message(msg) for msg in page], "next_cursor": next_cursor}
+
+# --- Chat Message Saving Endpoints ---
+# Write-behind buffer for chat messages when CHAT_WRITE_BUFFER is enabled
+chat_write_buffer = ChatWriteBuffer(save_chat_messages) if CHAT_WRITE_BUFFER else None
+
+def chat_message_documents(messages: List[ChatMessage]) -> List[Dict[str, Any]]:
+    """Turns request messages into chats documents with naive UTC timestamps."""
+    received_at = datetime.utcnow()
+    documents = []
+    for message in messages:
+        message_data = message.model_dump()
+        timestamp = message_data["timestamp"]
+        if timestamp is None:
+            timestamp = received_at
+        elif timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        message_data["timestamp"] = timestamp
+        documents.append(message_data)
+    return documents
+
+async def store_chat_messages(documents: List[Dict[str, Any]]) -> Optional[int]:
+    """Writes the documents now and returns how many were saved, or hands them to the write-behind buffer and returns None."""
+    if chat_write_buffer is not None:
+        chat_write_buffer.add(documents)
+        return None
+    return await save_chat_messages(documents)
+
 @app.post("/chats/messages")
 async def save_chat_message(message: ChatMessage):
-    message_data = message.model_dump()
-    message_data["timestamp"] = datetime.utcnow()
-    chats_collection.insert_one(message_data)
+    if await store_chat_messages(chat_message_documents([message])) is None:
+        return {"message": "Message queued for saving"}
     return {"message": "Message saved successfully"}
 
+@app.post("/chats/messages/batch")
+async def save_chat_message_batch(batch: ChatMessageBatch):
+    """Saves many messages at once, e.g. a user/assistant pair or an imported history."""
+    documents = chat_message_documents(batch.messages)
+    saved = await store_chat_messages(documents)
+    if saved is None:
+        return {"message": f"{len(documents)} messages queued for saving", "count": len(documents)}
+    return {"message": f"{saved} messages saved successfully", "count": saved}
+
 # --- Background Crew Task ---
-def run_crew_task(session_id: str, initial_prompt: str):
+async def wait_for_human_response(session_id: str, response_future: asyncio.Future) -> str:
+    """
+    Waits up to HUMAN_INPUT_TIMEOUT for the answer to a pending question.
+    /chatbot/input resolves the future when it is handled by this worker; with
+    a shared session store it may land on another worker, which only records
+    human_response, so the store is polled as well.
+    """
+    if not session_store.shared:
+        return await asyncio.wait_for(response_future, timeout=HUMAN_INPUT_TIMEOUT)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + HUMAN_INPUT_TIMEOUT
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        try:
+            return await asyncio.wait_for(asyncio.shield(response_future), timeout=min(HUMAN_INPUT_POLL_SECONDS, remaining))
+        except asyncio.TimeoutError:
+            session = await in_session_store(session_store.get, session_id) or {}
+            if session.get("human_response") is not None:
+                return session["human_response"]
+
+async def ask_human(session_id: str, question: str, holds_thread: bool = False) -> str:
+    """
+    Publishes a question and waits for /chatbot/input to answer it. The wait
+    is a future on the event loop, so it costs no thread of its own and the
+    answer is handed over the moment it arrives; holds_thread says the caller
+    is a crew thread that stays blocked meanwhile.
+    """
+    # Once a question has timed out the job is finished; don't wait again
+    session = await in_session_store(session_store.get, session_id) or {}
+    if session.get("input_timed_out"):
+        return "Timeout - no response received"
+
+    # Register the future before publishing the question so a fast response
+    # from /chatbot/input can never be missed
+    response_future = asyncio.get_running_loop().create_future()
+    input_futures[session_id] = response_future
+
+    # Store the question and set status to awaiting input
+    await set_session_status(session_id, "awaiting_input", {"pending_input": question, "human_response": None}, question=question)
+
     try:
-        # Create a more robust human input function for this session
-        def get_human_input_for_session(question: str) -> str:
-            # Store the question and set status to awaiting input
-            sessions[session_id]["pending_input"] = question
-            sessions[session_id]["status"] = "awaiting_input"
-            
-            # Wait for the frontend to provide a response
-            timeout = 300  # 5 minutes timeout
-            start_time = time.time()
-            
-            while sessions[session_id].get("human_response") is None:
-                time.sleep(1)
-                # Check for timeout
-                if time.time() - start_time > timeout:
-                    sessions[session_id]["status"] = "error"
-                    sessions[session_id]["error"] = "Input timeout"
-                    return "Timeout - no response received"
-            
-            # Get the response and clean up
-            response = sessions[session_id].pop("human_response")
-            sessions[session_id]["pending_input"] = None
-            sessions[session_id]["status"] = "in_progress"
-            
-            # Store the question and response in session history
-            if "conversation_history" not in sessions[session_id]:
-                sessions[session_id]["conversation_history"] = []
-            
-            sessions[session_id]["conversation_history"].append({
-                "question": question,
-                "response": response,
-                "timestamp": datetime.utcnow()
+        # Give the job's scheduler slot to someone else while the user is thinking
+        async with job_scheduler.parked(session_id, holds_thread=holds_thread):
+            response = await wait_for_human_response(session_id, response_future)
+    except asyncio.TimeoutError:
+        await set_session_status(
+            session_id, "error",
+            {"pending_input": None, "input_timed_out": True, "error": "Input timeout"},
+            error="Input timeout",
+        )
+        return "Timeout - no response received"
+    finally:
+        input_futures.pop(session_id, None)
+
+    # Clean up, store the question and response in session history and return to processing
+    session = await in_session_store(session_store.get, session_id) or {}
+    conversation_history = list(session.get("conversation_history") or [])
+    conversation_history.append({
+        "question": question,
+        "response": response,
+        "timestamp": datetime.utcnow()
+    })
+    await set_session_status(session_id, "in_progress", {
+        "human_response": None,
+        "pending_input": None,
+        "conversation_history": conversation_history,
+    })
+
+    return response
+
+async def ask_for_missing_trip_details(session_id: str, details: dict) -> Optional[dict]:
+    """
+    Asks the user for each required trip detail the prompt left out, from the
+    event loop, so however many sessions wait for their users none of them
+    holds a thread. Answers the rules cannot read stay "null" for the setup
+    crew, which sees them in the conversation history. Returns None if the
+    user did not answer in time.
+    """
+    for field in missing_trip_details(details):
+        answer = await ask_human(session_id, TRIP_DETAIL_QUESTIONS[field])
+        if (await in_session_store(session_store.get, session_id) or {}).get("input_timed_out"):
+            return None
+        details = fill_trip_detail(details, field, answer)
+    return details
+
+def crew_input_callback(session_id: str, loop: asyncio.AbstractEventLoop):
+    """
+    The human_input callback of a session's setup crew, bound to that session.
+    The crew calls it from its crew_executor thread, which stays blocked until
+    the answer arrives; the scheduler's parked limit keeps those threads from
+    running out.
+    """
+    def get_human_input_for_session(question: str) -> str:
+        return asyncio.run_coroutine_threadsafe(ask_human(session_id, question, holds_thread=True), loop).result()
+    return get_human_input_for_session
+
+async def run_crew_task(session_id: str, initial_prompt: str, bypass_cache: bool = False):
+    loop = asyncio.get_running_loop()
+    cache_key = None
+    try:
+        # Report each task of the planning crew as it finishes
+        planning_tasks_done = []
+        def on_planning_task_complete(task_output):
+            planning_tasks_done.append(task_output.name)
+            publish_event(session_id, "task_complete", {
+                "task": task_output.name,
+                "agent": task_output.agent,
+                "completed_tasks": len(planning_tasks_done),
             })
-            
-            return response
-        
-        # Replace the human_input_tool function with our session-specific one
-        human_input_tool.func = get_human_input_for_session
+
+        # Stream the concierge's report to clients while it is being written.
+        # The text is accumulated here and written to a shared store at most
+        # every PARTIAL_RESULT_FLUSH_SECONDS.
+        flush_interval = PARTIAL_RESULT_FLUSH_SECONDS if session_store.shared else 0
+        report = {"text": "", "flushed_at": 0.0}
+        def on_report_chunk(text):
+            report["text"] += text
+            publish_event(session_id, "result_chunk", {"text": text})
+            now = time.monotonic()
+            if now - report["flushed_at"] >= flush_interval:
+                report["flushed_at"] = now
+                update_partial_result(session_id, report["text"])
+
+        def on_report_reset():
+            report["text"] = ""
+            update_partial_result(session_id, "")
+            publish_event(session_id, "result_reset")
         
         # Initialize session state if needed
-        if "conversation_history" not in sessions[session_id]:
-            sessions[session_id]["conversation_history"] = []
+        session = await in_session_store(session_store.get, session_id)
+        await set_session_status(session_id, "in_progress", {
+            "input_timed_out": False,
+            "partial_result": "",
+            "conversation_history": session.get("conversation_history") or [],
+        })
         
         # Check if we are in the middle of a conversation
-        if sessions[session_id].get("trip_details"):
-            trip_details = sessions[session_id]["trip_details"]
+        if session.get("trip_details"):
+            trip_details = session["trip_details"]
             
             # Construct a comprehensive chat history
             history_items = []
-            for item in sessions[session_id].get("conversation_history", []):
+            for item in session.get("conversation_history") or []:
                 history_items.append(f"Question: {item['question']}")
                 history_items.append(f"Answer: {item['response']}")
             
@@ -234,77 +552,128 @@ def run_crew_task(session_id: str, initial_prompt: str):
             Travel dates: {trip_details.get('travel_dates', 'Not specified')}
             Preferred currency: {trip_details.get('preferred_currency', 'Not specified')}
             
-            Previous agent response: {sessions[session_id].get('result', 'No previous response.')}
+            Previous agent response: {session.get('result', 'No previous response.')}
             
             Current user request: {initial_prompt}
             """
             
             # Update the interests with the new prompt to reflect the latest request
             trip_details["interests"] = initial_prompt
+            await in_session_store(session_store.update, session_id, trip_details=trip_details)
             
             # Invoke the agent with history
-            result_object = invoke_agent(chat_history=chat_history, **trip_details)
+            result_object = await invoke_agent_async(
+                session_id=session_id,
+                chat_history=chat_history,
+                task_callback=on_planning_task_complete,
+                on_report_chunk=on_report_chunk,
+                on_report_reset=on_report_reset,
+                **trip_details,
+            )
         else:
-            # This is the first message in the session, so run the setup crew
-            # Pass the conversation history to the setup crew
-            conversation_history = sessions[session_id].get("conversation_history", [])
-            setup_crew = create_setup_crew(initial_prompt, conversation_history)
-            sessions[session_id]["status"] = "in_progress"
+            # This is the first message in the session. Store the full initial prompt for future reference
+            await in_session_store(session_store.update, session_id, full_initial_prompt=initial_prompt)
             
-            # Store the full initial prompt for future reference
-            sessions[session_id]["full_initial_prompt"] = initial_prompt 
+            # Read what we can from the prompt and ask for the rest; the setup crew only
+            # runs if an answer could not be read
+            prefilled = await ask_for_missing_trip_details(session_id, extract_trip_details(initial_prompt))
+            if prefilled is None:
+                return
+            if not missing_trip_details(prefilled):
+                setup_stats["rule_based"] += 1
+                trip_details = prefilled
+            else:
+                setup_stats["setup_crew"] += 1
+                # Pass the conversation history, including the answers so far, to the setup crew
+                session = await in_session_store(session_store.get, session_id) or {}
+                conversation_history = session.get("conversation_history") or []
+                setup_crew = await asyncio.to_thread(
+                    create_setup_crew,
+                    initial_prompt,
+                    conversation_history,
+                    human_input=crew_input_callback(session_id, loop),
+                    prefilled=prefilled,
+                )
+                
+                trip_details_output = await kickoff_in_crew_pool(setup_crew)
+                if (await in_session_store(session_store.get, session_id) or {}).get("input_timed_out"):
+                    return
+                trip_details = merge_trip_details(extract_json_from_response(trip_details_output.raw), prefilled)
+            await set_session_status(session_id, "setup_complete", {"trip_details": trip_details}, trip_details=trip_details)
             
-            trip_details_output = setup_crew.kickoff()
-            trip_details = extract_json_from_response(trip_details_output.raw)
-            sessions[session_id]["trip_details"] = trip_details
-            sessions[session_id]["status"] = "setup_complete"
+            # A first plan depends only on the trip details, so a cached one can be served as is
+            trip_key = await asyncio.to_thread(plan_key, trip_details)
+            if plan_cache is not None:
+                cache_key = trip_key
+                cached_plan = None
+                if bypass_cache:
+                    plan_cache.bypassed()
+                else:
+                    cached_plan = await asyncio.to_thread(plan_cache.get, cache_key)
+                if cached_plan is not None:
+                    publish_event(session_id, "result_chunk", {"text": cached_plan})
+                    await set_session_status(session_id, "completed", {"result": cached_plan, "partial_result": ""}, result=cached_plan, cached=True)
+                    return
+            
+            # If this worker is already planning the same trip for another session, follow that job,
+            # unless the user asked for a fresh plan
+            leader_id = None if bypass_cache else job_coalescer.join(("plan", trip_key), session_id)
+            if leader_id is not None:
+                await attach_to_job(session_id, leader_id)
+                publish_event(session_id, "coalesced", {"coalesced_into": leader_id})
+                return
             
             # Invoke the agent without history for the first time
-            result_object = invoke_agent(**trip_details)
+            result_object = await invoke_agent_async(
+                session_id=session_id,
+                task_callback=on_planning_task_complete,
+                on_report_chunk=on_report_chunk,
+                on_report_reset=on_report_reset,
+                **trip_details,
+            )
         
         raw_result = result_object.raw if hasattr(result_object, 'raw') else str(result_object)
         
         # Clean the raw markdown output to remove code fences
-        cleaned_result = re.sub(r'^```markdown\n', '', raw_result)
-        cleaned_result = re.sub(r'```$', '', cleaned_result)
-        cleaned_result = cleaned_result.strip()
+        cleaned_result = clean_markdown_output(raw_result)
+        # Only real crew output is cached, not the error strings invoke_agent_async can return
+        if cache_key is not None and cleaned_result and hasattr(result_object, 'raw'):
+            await asyncio.to_thread(plan_cache.set, cache_key, cleaned_result)
         
-        sessions[session_id]["result"] = cleaned_result
-        sessions[session_id]["status"] = "completed"
+        await set_session_status(session_id, "completed", {"result": cleaned_result, "partial_result": ""}, result=cleaned_result)
         
     except Exception as e:
         print(f"Error in background task for session {session_id}: {e}")
         import traceback
         traceback.print_exc()
-        sessions[session_id]["status"] = "error"
-        sessions[session_id]["error"] = str(e)
+        await set_session_status(session_id, "error", {"error": str(e)}, error=str(e))
+    finally:
+        await release_job(session_id)
 
 # --- Chatbot Core Endpoints ---
 @app.post("/chatbot/start", response_model=ChatbotResponse)
-async def start_chatbot(request: ChatbotRequest, background_tasks: BackgroundTasks):
+async def start_chatbot(request: ChatbotRequest):
     # Check if we have a session_id in the request
     session_id = request.session_id
     
     # If no session_id is provided, try to find an existing session for this user
     if not session_id:
-        # Try to find a recent session with similar initial prompt
+        # Try to find a recent session whose initial prompt shares a keyword with this one
         # This is a fallback mechanism in case the frontend doesn't send the session_id
-        user_prompt = request.prompt.lower()
-        for sid, session in sessions.items():
-            if session.get("status") in ["completed", "setup_complete"]:
-                initial_prompt = session.get("initial_prompt", "").lower()
-                # If the initial prompt contains similar keywords, consider it the same conversation
-                if any(keyword in initial_prompt for keyword in user_prompt.split() if len(keyword) > 3):
-                    session_id = sid
-                    break
+        session_id = await in_session_store(session_store.find_matching_session, request.prompt)
         
         # If no matching session found, create a new one
         if not session_id:
             session_id = str(uuid.uuid4())
     
+    # A session runs one job at a time, including one it follows
+    if job_scheduler.is_scheduled(session_id) or job_coalescer.leader_of(session_id):
+        raise HTTPException(status_code=409, detail="This session is already being processed.")
+
     # Initialize the session if it doesn't exist
-    if session_id not in sessions:
-        sessions[session_id] = {
+    is_new_session = await in_session_store(session_store.get, session_id) is None
+    if is_new_session:
+        await in_session_store(session_store.create, session_id, {
             "status": "initializing",
             "initial_prompt": request.prompt,
             "conversation_history": [],
@@ -313,38 +682,136 @@ async def start_chatbot(request: ChatbotRequest, background_tasks: BackgroundTas
             "human_response": None,
             "result": None,
             "error": None,
-            "last_activity": datetime.utcnow()
-        }
+        })
     else:
         # Update the last activity timestamp
-        sessions[session_id]["last_activity"] = datetime.utcnow()
+        await in_session_store(session_store.update, session_id)
     
-    background_tasks.add_task(run_crew_task, session_id, request.prompt)
+    # Start a fresh event log so streaming clients only see this run
+    session_events.reset(session_id)
+
+    # Checked again as another request for this session may have started while the store was
+    # awaited. Nothing is awaited from here until the job is submitted, so no request can
+    # follow this session before its job has been admitted.
+    if job_scheduler.is_scheduled(session_id) or job_coalescer.leader_of(session_id):
+        raise HTTPException(status_code=409, detail="This session is already being processed.")
+    # A new session whose prompt is already being planned (e.g. a double submit) follows that job.
+    # Only prompts that answer every setup question are shared, so no session ever sees
+    # or answers another user's questions.
+    leader_id = None
+    if is_new_session and not request.bypass_cache and not missing_trip_details(extract_trip_details(request.prompt)):
+        leader_id = job_coalescer.join(("prompt", coalescing_prompt(request.prompt)), session_id)
+    if leader_id is not None:
+        # Reported as in progress so the client polls for the job's question or result
+        await attach_to_job(session_id, leader_id)
+        return ChatbotResponse(
+            session_id=session_id,
+            status="in_progress",
+            message="An identical request is already being processed; this session will receive its result.",
+            data={"coalesced_into": leader_id},
+        )
+    try:
+        queue_position = job_scheduler.submit(session_id, lambda: run_crew_task(session_id, request.prompt, request.bypass_cache))
+    except ValueError:
+        # Another request for this session was admitted first
+        detail = "This session is already being processed."
+        await release_job(session_id, error=detail)
+        raise HTTPException(status_code=409, detail=detail)
+    except QueueFullError:
+        detail = "The travel planner is at capacity. Please try again shortly."
+        await release_job(session_id, error=detail)
+        if is_new_session:
+            await in_session_store(session_store.delete, session_id)
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": "30"})
+
+    if queue_position is not None:
+        await set_session_status(session_id, "queued", queue_position=queue_position)
+        return ChatbotResponse(
+            session_id=session_id,
+            status="queued",
+            message=f"Chatbot request queued at position {queue_position}.",
+            data={"queue_position": queue_position},
+        )
     return ChatbotResponse(session_id=session_id, status="in_progress", message="Chatbot processing started.")
 
 @app.post("/chatbot/input", response_model=ChatbotResponse)
 async def provide_human_input(request: HumanInputRequest):
     session_id = request.session_id
-    if session_id not in sessions or sessions[session_id].get("status") != "awaiting_input":
+    session = await in_session_store(session_store.get, session_id)
+    if session is None or session.get("status") != "awaiting_input":
         raise HTTPException(status_code=400, detail="Not awaiting input.")
-    sessions[session_id]["human_response"] = request.response
+    # Recorded in the store so the crew finds it even if it runs on another worker
+    await in_session_store(session_store.update, session_id, human_response=request.response)
+    # Hand the answer to the crew waiting for it
+    response_future = input_futures.get(session_id)
+    if response_future is not None and not response_future.done():
+        response_future.set_result(request.response)
     return ChatbotResponse(session_id=session_id, status="in_progress", message="Input received.")
 
 @app.get("/chatbot/status/{session_id}", response_model=ChatbotResponse)
 async def get_session_status(session_id: str):
-    if session_id not in sessions:
+    session = await in_session_store(session_store.get, session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    session = sessions[session_id]
     status = session.get("status", "error")
     response_data = {"session_id": session_id, "status": status, "message": f"Session status: {status}"}
     if status == "awaiting_input":
         response_data.update({"requires_input": True, "input_question": session.get("pending_input")})
+    elif status == "queued":
+        response_data["data"] = {"queue_position": job_scheduler.position(session.get("coalesced_into") or session_id)}
+    elif status == "in_progress" and session.get("partial_result"):
+        response_data["data"] = {"partial_result": session.get("partial_result")}
     elif status == "completed":
         response_data["data"] = {"result": session.get("result")}
     elif status == "error":
         response_data["data"] = {"error": session.get("error")}
     return ChatbotResponse(**response_data)
 
+@app.get("/chatbot/stream/{session_id}")
+async def stream_session_status(session_id: str, request: Request):
+    """
+    Server-Sent Events stream of a session's progress: status changes, each
+    planning task finishing, pending questions, the final report as it is
+    generated (result_chunk / result_reset) and the final result. The
+    stream closes after a completed or error event; /chatbot/status remains
+    available for clients that cannot consume SSE. Events are published by
+    the worker running the session's job, so with several workers the
+    stream needs sticky routing while /chatbot/status works from any worker.
+    """
+    if await in_session_store(session_store.get, session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def event_source():
+        async for message in session_events.stream(session_id):
+            if await request.is_disconnected():
+                break
+            yield format_sse(message)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Metrics ---
+@app.get("/metrics")
+async def get_metrics():
+    """Cache and pipeline counters for monitoring."""
+    return {
+        "exchange_rate_cache": get_exchange_rate_cache_stats(),
+        "geocode_cache": get_geocode_cache_stats(),
+        "forecast_cache": get_forecast_cache_stats(),
+        "outbound_http": http_client.stats(),
+        "job_scheduler": job_scheduler.stats(),
+        "sessions": await in_session_store(session_store.stats),
+        "chat_write_buffer": chat_write_buffer.stats() if chat_write_buffer is not None else None,
+        "llm_concurrency": llm_limits.stats(),
+        "trip_setup": dict(setup_stats),
+        "plan_cache": plan_cache.stats() if plan_cache is not None else None,
+        "job_coalescing": job_coalescer.stats(),
+        "search_cache": search_cache.stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
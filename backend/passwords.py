@@ -0,0 +1,56 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# bcrypt cost factor; changing it rehashes each user's password at their next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads dedicated to hashing; bcrypt releases the GIL, so this caps the CPU a login burst can take
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+# The bcrypt release pinned in requirements.txt; passlib 1.7.4 fails its self-test on 4.1 and later
+SUPPORTED_BCRYPT = "4.0.1"
+
+
+def bcrypt_version_problem() -> Optional[str]:
+    """Why passlib cannot hash with the installed bcrypt, or None if it can."""
+    try:
+        installed = version("bcrypt")
+    except PackageNotFoundError:
+        return f"bcrypt is not installed; run pip install bcrypt=={SUPPORTED_BCRYPT}"
+    major_minor = tuple(int(part) for part in installed.split(".")[:2] if part.isdigit())
+    if major_minor >= (4, 1):
+        return (f"bcrypt {installed} is installed, but passlib only works with bcrypt {SUPPORTED_BCRYPT} "
+                f"as pinned in requirements.txt; run pip install bcrypt=={SUPPORTED_BCRYPT}")
+    return None
+
+
+# Hashes with any other cost count as outdated, so verify_and_update() replaces them
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# Hashing gets its own pool so it never competes with crews for the default executor
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Checks password against hashed_password. Returns (valid, new_hash), where
+    new_hash is set when the stored hash uses outdated settings and should be
+    replaced.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        _hash_pool, pwd_context.verify_and_update, password, hashed_password
+    )
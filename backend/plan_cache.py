@@ -0,0 +1,153 @@
+import hashlib
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo.errors import PyMongoError
+
+from cache import TTLCache
+from session_store import prompt_keywords
+
+# Finished travel plans are reused for requests with the same normalized trip details
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_STORE = os.getenv("PLAN_CACHE_STORE", "mongo").lower()
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", str(6 * 3600)))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1000"))
+# Width of a budget bucket relative to the budget: 0.1 puts budgets within ~10% of each other together
+PLAN_CACHE_BUDGET_STEP = float(os.getenv("PLAN_CACHE_BUDGET_STEP", "0.1"))
+
+
+def _normalize(value: Any) -> str:
+    return " ".join(str(value if value is not None else "null").lower().split())
+
+
+def budget_bucket(budget: str) -> str:
+    """
+    Rounds a budget like "50000 LKR" to a bucket on a logarithmic USD scale,
+    so nearby budgets share a plan whatever currency they were given in.
+    """
+    from travel_chatbot import get_conversion_rate
+
+    try:
+        amount_text, currency = budget.split()
+        amount = float(amount_text)
+    except (AttributeError, ValueError):
+        return _normalize(budget)
+    rate = get_conversion_rate(currency, "USD")
+    if rate is None or amount <= 0:
+        return f"{amount:g} {currency.upper()}"
+    return f"usd~{math.floor(math.log(amount * rate) / math.log1p(PLAN_CACHE_BUDGET_STEP))}"
+
+
+def interests_fingerprint(interests: str) -> str:
+    """
+    Order-independent hash of the interests' keywords. Numbers are left out,
+    as the budget and dates they usually belong to are part of the key already.
+    """
+    keywords = " ".join(sorted(word for word in prompt_keywords(interests or "") if word.isalpha()))
+    return hashlib.sha1(keywords.encode("utf-8")).hexdigest()[:16]
+
+
+def plan_key(trip_details: Dict[str, Any]) -> str:
+    """Cache key for the plan of trip_details, as produced by the setup crew."""
+    return "|".join([
+        _normalize(trip_details.get("location")),
+        budget_bucket(trip_details.get("budget")),
+        _normalize(trip_details.get("num_people")),
+        _normalize(trip_details.get("travel_dates")),
+        _normalize(trip_details.get("preferred_currency")),
+        interests_fingerprint(trip_details.get("interests")),
+    ])
+
+
+class PlanCache:
+    """
+    Finished plans by plan_key(). An in-process TTL/LRU cache answers repeats
+    on the same worker; with a collection, plans are also kept in MongoDB so
+    every worker and restart can reuse them. A TTL index on expires_at lets
+    MongoDB delete expired plans.
+
+    Methods may do network I/O and must be kept off the event loop.
+    """
+
+    def __init__(self, collection=None, ttl_seconds: float = PLAN_CACHE_TTL_SECONDS, max_entries: int = PLAN_CACHE_MAX_ENTRIES):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.memory = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "errors": 0}
+
+    def setup(self) -> None:
+        if self.collection is None:
+            return
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except PyMongoError as e:
+            print(f"Could not create plan cache indexes: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        plan = self.memory.get(key)
+        if plan is not None:
+            self._count("memory_hits")
+            return plan
+        if self.collection is not None:
+            try:
+                # The TTL monitor only runs every minute, so check the expiry here as well
+                document = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except PyMongoError as e:
+                self._count("errors")
+                print(f"Could not read plan cache: {e}")
+                document = None
+            if document is not None:
+                self._count("mongo_hits")
+                remaining = (document["expires_at"] - datetime.utcnow()).total_seconds()
+                self.memory.set(key, document["plan"], ttl=max(remaining, 0))
+                return document["plan"]
+        self._count("misses")
+        return None
+
+    def set(self, key: str, plan: str) -> None:
+        self.memory.set(key, plan)
+        self._count("stores")
+        if self.collection is None:
+            return
+        try:
+            self.collection.replace_one(
+                {"_id": key},
+                {"plan": plan, "created_at": datetime.utcnow(), "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)},
+                upsert=True,
+            )
+        except PyMongoError as e:
+            self._count("errors")
+            print(f"Could not write plan cache: {e}")
+
+    def bypassed(self) -> None:
+        """Records a request that skipped the lookup on purpose."""
+        self._count("bypassed")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["mongo_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["mongo_hits"]) / lookups, 4) if lookups else 0.0
+        stats["memory_size"] = len(self.memory)
+        stats["backend"] = "mongo" if self.collection is not None else "memory"
+        return stats
+
+
+def create_plan_cache() -> Optional[PlanCache]:
+    """Builds the cache selected by PLAN_CACHE_STORE ("memory" or "mongo"), or None if PLAN_CACHE_ENABLED is off."""
+    if not PLAN_CACHE_ENABLED:
+        return None
+    if PLAN_CACHE_STORE == "mongo":
+        from database import db
+        return PlanCache(db["plan_cache"])
+    if PLAN_CACHE_STORE != "memory":
+        raise ValueError(f"Unknown PLAN_CACHE_STORE {PLAN_CACHE_STORE!r}; expected 'memory' or 'mongo'")
+    return PlanCache()
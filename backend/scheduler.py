@@ -0,0 +1,279 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+MAX_RUNNING_JOBS = int(os.getenv("MAX_RUNNING_JOBS", "32"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "200"))
+# Jobs whose crew thread waits on the user that may give up their slot; jobs waiting
+# from the event loop hold no thread and park without limit
+MAX_PARKED_JOBS = int(os.getenv("MAX_PARKED_JOBS", "224"))
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    """Parses "name=limit,name=limit" settings."""
+    limits = {}
+    for item in value.split(","):
+        name, _, limit = item.strip().rpartition("=")
+        if name and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+# Concurrent LLM calls allowed per provider (the model prefix, e.g. "gemini")
+# and per individual model; anything not listed is unlimited
+LLM_PROVIDER_CONCURRENCY = _parse_limits(os.getenv("LLM_PROVIDER_CONCURRENCY", "openrouter=4,gemini=16"))
+LLM_MODEL_CONCURRENCY = _parse_limits(os.getenv("LLM_MODEL_CONCURRENCY", ""))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the scheduler's queue is full."""
+
+
+class JobScheduler:
+    """
+    Bounded admission for planning jobs.
+
+    At most max_running jobs execute at once; up to max_queued more wait in
+    FIFO order and anything beyond that is rejected with QueueFullError. A job
+    that is waiting on the user can park() to hand its slot to the next job and
+    takes a slot back, ahead of the queue, when it resumes. A job that waits
+    on a crew thread parks with holds_thread; once max_parked of those are
+    parked, further ones keep their slot while they wait, so no more than
+    max_running + max_parked crew threads are ever in use. Jobs that wait on
+    the event loop hold nothing but memory and park without limit.
+
+    All methods must be called on the event loop thread.
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING_JOBS, max_queued: int = MAX_QUEUED_JOBS, max_parked: int = MAX_PARKED_JOBS):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_parked = max_parked
+        self._pending: "OrderedDict[str, Callable[[], Awaitable[Any]]]" = OrderedDict()
+        self._running: set = set()
+        self._parked: set = set()  # jobs that gave up their slot until they resume
+        self._parked_threads: set = set()  # the parked jobs that still hold a crew thread
+        self._tasks: set = set()  # strong references so running jobs are not garbage-collected
+        self._resuming: deque = deque()
+        self._stats = {"submitted": 0, "rejected": 0, "completed": 0, "parked": 0, "parked_over_limit": 0}
+
+    def submit(self, job_id: str, job: Callable[[], Awaitable[Any]]) -> Optional[int]:
+        """
+        Queues job() to run under job_id. Returns its 1-based queue position,
+        or None if it started immediately.
+        """
+        if self.is_scheduled(job_id):
+            raise ValueError(f"Job {job_id} is already scheduled")
+        if len(self._pending) >= self.max_queued and not self._has_free_slot():
+            self._stats["rejected"] += 1
+            raise QueueFullError(f"{len(self._pending)} jobs are already queued")
+        self._stats["submitted"] += 1
+        self._pending[job_id] = job
+        self._dispatch()
+        return self.position(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job, or None if it is not queued."""
+        for index, pending_id in enumerate(self._pending, start=1):
+            if pending_id == job_id:
+                return index
+        return None
+
+    def is_scheduled(self, job_id: str) -> bool:
+        return job_id in self._pending or job_id in self._running or job_id in self._parked
+
+    @asynccontextmanager
+    async def parked(self, job_id: str, holds_thread: bool = False):
+        """
+        Releases job_id's slot for the duration of the block, e.g. while
+        waiting for user input. holds_thread marks a wait that keeps a crew
+        thread blocked, which only max_parked jobs may do without a slot.
+        """
+        if job_id not in self._running:
+            yield
+            return
+        if holds_thread and len(self._parked_threads) >= self.max_parked:
+            self._stats["parked_over_limit"] += 1
+            yield
+            return
+        self._running.discard(job_id)
+        self._parked.add(job_id)
+        if holds_thread:
+            self._parked_threads.add(job_id)
+        self._stats["parked"] += 1
+        self._dispatch()
+        try:
+            yield
+        finally:
+            resumed = asyncio.get_running_loop().create_future()
+            self._resuming.append((job_id, resumed))
+            self._dispatch()
+            try:
+                await resumed
+            finally:
+                self._parked.discard(job_id)
+                self._parked_threads.discard(job_id)
+
+    def _has_free_slot(self) -> bool:
+        return len(self._running) < self.max_running
+
+    def _dispatch(self) -> None:
+        # Parked jobs that are ready to continue go before new work
+        while self._resuming and self._has_free_slot():
+            job_id, resumed = self._resuming.popleft()
+            if not resumed.done():
+                self._parked.discard(job_id)
+                self._parked_threads.discard(job_id)
+                self._running.add(job_id)
+                resumed.set_result(None)
+        while self._pending and self._has_free_slot():
+            job_id, job = self._pending.popitem(last=False)
+            self._running.add(job_id)
+            task = asyncio.create_task(job())
+            self._tasks.add(task)
+            task.add_done_callback(lambda task, job_id=job_id: self._finish(job_id, task))
+
+    def _finish(self, job_id: str, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._running.discard(job_id)
+        self._stats["completed"] += 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({
+            "running": len(self._running),
+            "queued": len(self._pending),
+            "parked_now": len(self._parked),
+            "parked_with_thread": len(self._parked_threads),
+            "resuming": len(self._resuming),
+            "max_running": self.max_running,
+            "max_queued": self.max_queued,
+            "max_parked": self.max_parked,
+        })
+        return stats
+
+
+class JobCoalescer:
+    """
+    Single-flight registry for planning jobs.
+
+    The first session to join() a key leads: it runs the job. Sessions that
+    join the same key while the leader is still registered become its
+    followers; they run nothing and are given the leader's progress and
+    result instead. Keys are (kind, value) tuples, e.g. ("prompt", text) or
+    ("plan", plan key), and the duplicates avoided are counted per kind.
+
+    All methods must be called on the event loop thread. The registry is
+    per process, so only jobs on the same worker are coalesced.
+    """
+
+    def __init__(self):
+        self._leaders: Dict[tuple, str] = {}
+        self._keys: Dict[str, set] = {}
+        self._followers: Dict[str, list] = {}
+        self._leader_of: Dict[str, str] = {}
+        self._stats: Dict[str, int] = {"leaders": 0}
+
+    def join(self, key: tuple, session_id: str) -> Optional[str]:
+        """
+        Makes session_id the leader for key, or attaches it to the current
+        leader and returns the leader's id. A session that is attached hands
+        its own keys and followers over to the leader.
+        """
+        leader_id = self._leaders.get(key)
+        if leader_id is None or leader_id == session_id:
+            if leader_id is None:
+                self._stats["leaders"] += int(session_id not in self._keys)
+            self._leaders[key] = session_id
+            self._keys.setdefault(session_id, set()).add(key)
+            return None
+
+        for own_key in self._keys.pop(session_id, ()):
+            self._leaders[own_key] = leader_id
+            self._keys[leader_id].add(own_key)
+        moved = [session_id] + self._followers.pop(session_id, [])
+        self._followers.setdefault(leader_id, []).extend(moved)
+        for follower_id in moved:
+            self._leader_of[follower_id] = leader_id
+        counter = f"coalesced_{key[0]}s"
+        self._stats[counter] = self._stats.get(counter, 0) + 1
+        return leader_id
+
+    def sessions(self, session_id: str) -> list:
+        """session_id followed by the sessions attached to it."""
+        return [session_id] + self._followers.get(session_id, [])
+
+    def leader_of(self, session_id: str) -> Optional[str]:
+        return self._leader_of.get(session_id)
+
+    def release(self, session_id: str) -> list:
+        """Ends session_id's lead once its job is done; returns the followers it had."""
+        for key in self._keys.pop(session_id, ()):
+            if self._leaders.get(key) == session_id:
+                del self._leaders[key]
+        followers = self._followers.pop(session_id, [])
+        for follower_id in followers:
+            self._leader_of.pop(follower_id, None)
+        return followers
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({"in_flight": len(self._keys), "followers": len(self._leader_of)})
+        return stats
+
+
+class ConcurrencyLimits:
+    """
+    Thread-safe caps on concurrent LLM calls per provider and per model.
+    Calls that exceed a cap wait for a slot instead of hitting the provider's
+    rate limit.
+    """
+
+    def __init__(self, provider_limits: Dict[str, int], model_limits: Dict[str, int]):
+        self._semaphores = {}
+        for name, limit in provider_limits.items():
+            self._semaphores[("provider", name)] = threading.BoundedSemaphore(limit)
+        for name, limit in model_limits.items():
+            self._semaphores[("model", name)] = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+
+    @contextmanager
+    def slot(self, model: str):
+        """Holds one provider slot and one model slot for model (e.g. "gemini/gemini-2.0-flash")."""
+        provider = model.split("/", 1)[0]
+        semaphores = [sem for sem in (self._semaphores.get(("provider", provider)),
+                                      self._semaphores.get(("model", model))) if sem]
+        self._count(self._waiting, model, 1)
+        acquired = []
+        try:
+            for sem in semaphores:
+                sem.acquire()
+                acquired.append(sem)
+        finally:
+            self._count(self._waiting, model, -1)
+        self._count(self._in_flight, model, 1)
+        try:
+            yield
+        finally:
+            self._count(self._in_flight, model, -1)
+            for sem in reversed(acquired):
+                sem.release()
+
+    def _count(self, counter: Dict[str, int], model: str, delta: int) -> None:
+        with self._lock:
+            counter[model] = counter.get(model, 0) + delta
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": dict(self._in_flight), "waiting": dict(self._waiting)}
+
+
+job_scheduler = JobScheduler()
+job_coalescer = JobCoalescer()
+llm_limits = ConcurrencyLimits(LLM_PROVIDER_CONCURRENCY, LLM_MODEL_CONCURRENCY)
@@ -0,0 +1,241 @@
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from pymongo.errors import PyMongoError
+
+from cache import TTLCache
+
+# Web search results are shared by every session until they expire
+SEARCH_CACHE_STORE = os.getenv("SEARCH_CACHE_STORE", "mongo").lower()
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+# Searches that actually reach the search API per chat session, across all of its
+# planning crews; 0 means unlimited
+SEARCH_BUDGET_PER_SESSION = int(os.getenv("SEARCH_BUDGET_PER_SESSION", "10"))
+# Point this at a local fake Serper server to run without the real API
+SERPER_BASE_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+
+SEARCH_TOOL_NAME = "Search the internet with Serper"
+SEARCH_TOOL_DESCRIPTION = (
+    "A tool that can be used to search the internet with a search_query. "
+    "Supports different search types: 'search' (default), 'news'"
+)
+
+# Words that do not change what a search engine returns
+_QUERY_STOPWORDS = {"a", "an", "the", "in", "at", "on", "of", "for", "with", "and", "near", "to"}
+_QUERY_WORD_PATTERN = re.compile(r"[^\W_]+(?:['’][^\W_]+)?")
+
+
+def normalize_query(query: str) -> str:
+    """
+    "Best villas with a pool in Mirissa!" -> "best villas pool mirissa".
+    Case, punctuation and filler words are dropped; word order is kept.
+    """
+    words = _QUERY_WORD_PATTERN.findall(query.lower())
+    return " ".join(word for word in words if word not in _QUERY_STOPWORDS) or " ".join(words)
+
+
+@lru_cache(maxsize=1)
+def _serper_tool():
+    from crewai_tools import SerperDevTool
+
+    return SerperDevTool(base_url=SERPER_BASE_URL)
+
+
+def serper_search(query: str, search_type: str = "search") -> Dict[str, Any]:
+    """Default search backend: one Serper API request."""
+    return _serper_tool()._run(search_query=query, search_type=search_type)
+
+
+class SearchCache:
+    """
+    Search results by normalized query. An in-process TTL/LRU cache serves
+    repeats and coalesces concurrent identical searches; with a collection,
+    results are also kept in MongoDB for every worker, with a TTL index on
+    expires_at.
+
+    Methods may do network I/O and must be kept off the event loop.
+    """
+
+    def __init__(self, collection=None, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.memory = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "mongo_hits": 0, "searches": 0, "over_budget": 0, "errors": 0}
+
+    def setup(self) -> None:
+        if self.collection is None:
+            return
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except PyMongoError as e:
+            print(f"Could not create search cache indexes: {e}")
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached results for key, without searching."""
+        results = self.memory.get(key)
+        if results is not None:
+            self.count("memory_hits")
+            return results
+        results = self._lookup_stored(key)
+        if results is not None:
+            self.memory.set(key, results)
+        return results
+
+    def fetch(self, key: str, search: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Results for key, calling search() at most once however many threads ask at the same time."""
+        return self.memory.get_or_load(key, lambda: self._search(key, search))
+
+    def _lookup_stored(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.collection is None:
+            return None
+        try:
+            document = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except PyMongoError as e:
+            self.count("errors")
+            print(f"Could not read search cache: {e}")
+            return None
+        if document is None:
+            return None
+        self.count("mongo_hits")
+        return document["results"]
+
+    def _search(self, key: str, search: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        self.count("searches")
+        results = search()
+        if self.collection is not None:
+            try:
+                self.collection.replace_one(
+                    {"_id": key},
+                    {"results": results, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)},
+                    upsert=True,
+                )
+            except PyMongoError as e:
+                self.count("errors")
+                print(f"Could not write search cache: {e}")
+        return results
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["coalesced"] = self.memory.stats()["coalesced"]
+        stats["memory_size"] = len(self.memory)
+        stats["backend"] = "mongo" if self.collection is not None else "memory"
+        return stats
+
+
+def create_search_cache() -> SearchCache:
+    """Builds the cache selected by SEARCH_CACHE_STORE ("memory" or "mongo")."""
+    if SEARCH_CACHE_STORE == "mongo":
+        from database import db
+        return SearchCache(db["search_cache"])
+    if SEARCH_CACHE_STORE != "memory":
+        raise ValueError(f"Unknown SEARCH_CACHE_STORE {SEARCH_CACHE_STORE!r}; expected 'memory' or 'mongo'")
+    return SearchCache()
+
+
+search_cache = create_search_cache()
+
+
+class SearchBudgets:
+    """
+    Uncached searches made per session, so every crew and tool instance of a
+    session draws on the same budget. Counts are kept per process and are
+    forgotten ttl_seconds after a session's last search.
+    """
+
+    def __init__(self, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS, max_entries: int = 10000):
+        self.used = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._lock = threading.Lock()
+
+    def take(self, session_id: str, limit: int) -> bool:
+        """Counts one search for session_id, or returns False if it has made limit already (0 = unlimited)."""
+        if not limit:
+            return True
+        with self._lock:
+            used = self.used.get(session_id, 0)
+            if used >= limit:
+                return False
+            self.used.set(session_id, used + 1)
+            return True
+
+    def used_by(self, session_id: str) -> int:
+        return self.used.get(session_id, 0)
+
+
+search_budgets = SearchBudgets()
+
+
+@lru_cache(maxsize=1)
+def _cached_search_tool_class():
+    from typing import Type
+
+    from crewai.tools import BaseTool
+    from pydantic import BaseModel, Field
+
+    class SearchToolSchema(BaseModel):
+        search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+    class CachedSearchTool(BaseTool):
+        """
+        Drop-in replacement for SerperDevTool that answers from search_cache
+        and stops calling the search API once session_id has made max_searches.
+        """
+
+        name: str = SEARCH_TOOL_NAME
+        description: str = SEARCH_TOOL_DESCRIPTION
+        args_schema: Type[BaseModel] = SearchToolSchema
+        backend: Callable[[str, str], Dict[str, Any]] = serper_search
+        cache: Any = None
+        budgets: Any = None
+        session_id: str = ""
+        max_searches: int = 0
+
+        def _run(self, search_query: str = "", search_type: str = "search", **kwargs) -> Any:
+            search_query = search_query or kwargs.get("query", "")
+            cache = self.cache or search_cache
+            key = f"{search_type}:{normalize_query(search_query)}"
+            results = cache.lookup(key)
+            if results is not None:
+                return results
+            if not (self.budgets or search_budgets).take(self.session_id, self.max_searches):
+                cache.count("over_budget")
+                return (f"The search budget of {self.max_searches} searches for this trip is used up. "
+                        "Answer with the results you already have.")
+            return cache.fetch(key, lambda: self.backend(search_query, search_type))
+
+    return CachedSearchTool
+
+
+def create_search_tool(
+    session_id: Optional[str] = None,
+    max_searches: int = SEARCH_BUDGET_PER_SESSION,
+    backend: Optional[Callable[[str, str], Dict[str, Any]]] = None,
+    cache: Optional[SearchCache] = None,
+    budgets: Optional[SearchBudgets] = None,
+):
+    """
+    A cached search tool for a crew of session_id, which may make max_searches
+    uncached searches in all. A tool without a session has a budget of its own.
+    backend(query, search_type) defaults to the Serper API, e.g. a fake can
+    be passed in to run crews offline.
+    """
+    fields = {
+        "session_id": session_id or f"tool-{uuid.uuid4().hex}",
+        "max_searches": max_searches,
+        "cache": cache,
+        "budgets": budgets,
+    }
+    if backend is not None:
+        fields["backend"] = backend
+    return _cached_search_tool_class()(**fields)
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Events after which a session's stream is closed
+TERMINAL_EVENTS = {"completed", "error"}
+
+# Streamed text events; consecutive ones are merged in the replay log so a late
+# subscriber receives the text generated so far as a single event
+TEXT_EVENTS = {"result_chunk"}
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+
+class SessionEventBus:
+    """
+    Fan-out of chatbot progress events to streaming clients.
+
+    run_crew_task publishes from worker threads while subscribers live on the
+    event loop, so delivery goes through loop.call_soon_threadsafe. Every
+    session keeps a short replay log so a client that connects late still
+    receives everything published since the current run started. Replay logs
+    are kept for at most max_sessions sessions, least recently published first
+    to go.
+    """
+
+    def __init__(self, max_history: int = 200, max_sessions: int = 10000):
+        self._lock = threading.Lock()
+        self._max_history = max_history
+        self._max_sessions = max_sessions
+        self._history: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._next_id = 0
+
+    def publish(self, session_id: str, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Records an event for the session and pushes it to every live subscriber."""
+        with self._lock:
+            self._next_id += 1
+            message = {"id": self._next_id, "event": event, "data": data or {}}
+            history = self._history.setdefault(session_id, [])
+            self._history.move_to_end(session_id)
+            while len(self._history) > self._max_sessions:
+                self._history.popitem(last=False)
+            if event in TEXT_EVENTS and history and history[-1]["event"] == event:
+                # Replace rather than mutate: the old message may still sit in subscriber queues
+                merged_text = history[-1]["data"].get("text", "") + message["data"].get("text", "")
+                history[-1] = {"id": message["id"], "event": event, "data": {"text": merged_text}}
+            else:
+                history.append(message)
+                if len(history) > self._max_history:
+                    del history[0]
+            subscribers = list(self._subscribers.get(session_id, []))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # The subscriber's loop has been closed; it will be dropped on unsubscribe
+                pass
+
+    def reset(self, session_id: str) -> None:
+        """Clears the replay log, e.g. when a new run starts for the session."""
+        with self._lock:
+            self._history.pop(session_id, None)
+
+    def discard(self, session_id: str) -> None:
+        """Forgets everything about a session that no longer exists."""
+        with self._lock:
+            self._history.pop(session_id, None)
+            self._subscribers.pop(session_id, None)
+
+    def _subscribe(self, session_id: str) -> Tuple[List[Dict[str, Any]], asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            backlog = list(self._history.get(session_id, []))
+            self._subscribers.setdefault(session_id, []).append((loop, queue))
+        return backlog, queue
+
+    def _unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(session_id, [])
+            subscribers[:] = [entry for entry in subscribers if entry[1] is not queue]
+            if not subscribers:
+                self._subscribers.pop(session_id, None)
+
+    async def stream(self, session_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the session's replay log followed by live events until a
+        terminal event arrives. Yields None when the stream has been idle for
+        HEARTBEAT_INTERVAL seconds so the caller can send a keep-alive.
+        """
+        backlog, queue = self._subscribe(session_id)
+        try:
+            for message in backlog:
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            self._unsubscribe(session_id, queue)
+
+
+def format_sse(message: Optional[Dict[str, Any]]) -> str:
+    """Serializes a bus message (or a keep-alive when None) as a Server-Sent Event."""
+    if message is None:
+        return ": keep-alive\n\n"
+    payload = json.dumps(message["data"], default=str)
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {payload}\n\n"
+
+
+session_events = SessionEventBus()
@@ -0,0 +1,293 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+# Sessions in these states have a job attached and are never evicted from memory
+ACTIVE_STATUSES = {"initializing", "queued", "in_progress", "awaiting_input", "setup_complete"}
+
+# Sessions in these states can be picked up by a prompt that arrives without a session_id
+MATCHABLE_STATUSES = {"completed", "setup_complete"}
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def prompt_keywords(prompt: str) -> List[str]:
+    """Distinct lowercase words longer than three characters, punctuation stripped."""
+    return list(dict.fromkeys(word for word in _WORD_PATTERN.findall(prompt.lower()) if len(word) > 3))
+
+
+class SessionStore:
+    """
+    Storage for chatbot session state.
+
+    Sessions are plain dicts. get() returns a snapshot, so changes must be
+    written back with update(); every write refreshes last_activity, which
+    drives expiry. Stores with shared=True are visible to every worker
+    process, so callers cannot rely on in-process signalling alone.
+    """
+
+    shared = False
+    # Whether calls do network I/O and must be kept off the event loop
+    blocking = False
+
+    def setup(self) -> None:
+        """Prepares the backing storage (indexes etc.); called once at startup."""
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def create(self, session_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def update(self, session_id: str, **fields) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def find_matching_session(self, prompt: str) -> Optional[str]:
+        """
+        A session in one of MATCHABLE_STATUSES whose initial prompt shares a
+        keyword with prompt, preferring the most recently active one.
+        """
+        raise NotImplementedError
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store bounded by both size and idle time. Idle sessions
+    expire after ttl_seconds and the least recently used ones are evicted
+    beyond max_entries, but sessions with a job attached are kept.
+
+    Matchable sessions are kept in an inverted index from prompt keyword to
+    session ids, so find_matching_session() does not depend on the number
+    of sessions.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        on_evict: Optional[Callable[[str], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._clock = clock
+        self._lock = threading.Lock()
+        # session_id -> (last touched, session)
+        self._sessions: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # keyword -> session ids in the order they became matchable (dicts as ordered sets)
+        self._keyword_index: Dict[str, Dict[str, None]] = {}
+        self._indexed_keywords: Dict[str, List[str]] = {}
+        self._stats = {"evictions": 0, "expirations": 0}
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if not self._expired(entry):
+                return dict(entry[1])
+            self._remove(session_id)
+            self._stats["expirations"] += 1
+        self._notify([session_id])
+        return None
+
+    def create(self, session_id: str, data: Dict[str, Any]) -> None:
+        session = dict(data)
+        session["last_activity"] = datetime.utcnow()
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = (self._clock(), session)
+            self._reindex(session_id, session)
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def update(self, session_id: str, **fields) -> None:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            session = dict(entry[1])
+            session.update(fields)
+            session["last_activity"] = datetime.utcnow()
+            self._sessions[session_id] = (self._clock(), session)
+            self._sessions.move_to_end(session_id)
+            if "status" in fields or "initial_prompt" in fields:
+                self._reindex(session_id, session)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._remove(session_id)
+
+    def find_matching_session(self, prompt: str) -> Optional[str]:
+        expired = []
+        match = None
+        with self._lock:
+            for keyword in prompt_keywords(prompt):
+                for session_id in reversed(self._keyword_index.get(keyword, {})):
+                    if not self._expired(self._sessions[session_id]):
+                        match = session_id
+                        break
+                    expired.append(session_id)
+                if match:
+                    break
+            for session_id in expired:
+                self._remove(session_id)
+                self._stats["expirations"] += 1
+        self._notify(expired)
+        return match
+
+    def _reindex(self, session_id: str, session: Dict[str, Any]) -> None:
+        """Adds or removes the session's keywords to match its status; lock must be held."""
+        self._unindex(session_id)
+        if session.get("status") not in MATCHABLE_STATUSES:
+            return
+        keywords = prompt_keywords(session.get("initial_prompt") or "")
+        for keyword in keywords:
+            self._keyword_index.setdefault(keyword, {})[session_id] = None
+        self._indexed_keywords[session_id] = keywords
+
+    def _unindex(self, session_id: str) -> None:
+        for keyword in self._indexed_keywords.pop(session_id, ()):
+            posting = self._keyword_index[keyword]
+            del posting[session_id]
+            if not posting:
+                del self._keyword_index[keyword]
+
+    def _remove(self, session_id: str) -> None:
+        """Drops a session and its index entries; lock must be held."""
+        self._sessions.pop(session_id, None)
+        self._unindex(session_id)
+
+    def _expired(self, entry: tuple[float, Dict[str, Any]]) -> bool:
+        touched, session = entry
+        return session.get("status") not in ACTIVE_STATUSES and touched + self.ttl_seconds <= self._clock()
+
+    def _evict(self) -> List[str]:
+        """Drops expired sessions, then idle ones beyond max_entries; lock must be held."""
+        # Sessions are ordered by last touch, so expired ones sit at the front
+        now = self._clock()
+        expired = []
+        for session_id, entry in self._sessions.items():
+            if entry[0] + self.ttl_seconds > now:
+                break
+            if self._expired(entry):
+                expired.append(session_id)
+        for session_id in expired:
+            self._remove(session_id)
+        self._stats["expirations"] += len(expired)
+
+        excess = len(self._sessions) - self.max_entries
+        overflow = []
+        if excess > 0:
+            for session_id, (_, session) in self._sessions.items():
+                if len(overflow) >= excess:
+                    break
+                if session.get("status") not in ACTIVE_STATUSES:
+                    overflow.append(session_id)
+        for session_id in overflow:
+            self._remove(session_id)
+        self._stats["evictions"] += len(overflow)
+        return expired + overflow
+
+    def _notify(self, session_ids: List[str]) -> None:
+        if self.on_evict:
+            for session_id in session_ids:
+                self.on_evict(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+            stats["indexed_keywords"] = len(self._keyword_index)
+            stats["active"] = sum(1 for _, session in self._sessions.values() if session.get("status") in ACTIVE_STATUSES)
+        stats["backend"] = "memory"
+        return stats
+
+
+class MongoSessionStore(SessionStore):
+    """
+    Sessions kept in a MongoDB collection, one document per session keyed by
+    _id, so every worker and node can serve any session. A TTL index on
+    last_activity lets MongoDB delete idle sessions. Prompt keywords are
+    stored in a multikey prompt_keywords field for find_matching_session().
+    """
+
+    shared = True
+    blocking = True
+
+    def __init__(self, collection, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    def setup(self) -> None:
+        try:
+            self.collection.create_index("last_activity", expireAfterSeconds=int(self.ttl_seconds))
+            self.collection.create_index("status")
+            self.collection.create_index([("prompt_keywords", 1), ("status", 1), ("last_activity", -1)])
+        except PyMongoError as e:
+            print(f"Could not create session store indexes: {e}")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self.collection.find_one({"_id": session_id}, {"prompt_keywords": 0})
+        if session is not None:
+            session.pop("_id")
+        return session
+
+    def create(self, session_id: str, data: Dict[str, Any]) -> None:
+        session = dict(data)
+        session["last_activity"] = datetime.utcnow()
+        session["prompt_keywords"] = prompt_keywords(session.get("initial_prompt") or "")
+        self.collection.replace_one({"_id": session_id}, session, upsert=True)
+
+    def update(self, session_id: str, **fields) -> None:
+        fields["last_activity"] = datetime.utcnow()
+        if "initial_prompt" in fields:
+            fields["prompt_keywords"] = prompt_keywords(fields["initial_prompt"] or "")
+        self.collection.update_one({"_id": session_id}, {"$set": fields})
+
+    def delete(self, session_id: str) -> None:
+        self.collection.delete_one({"_id": session_id})
+
+    def find_matching_session(self, prompt: str) -> Optional[str]:
+        keywords = prompt_keywords(prompt)
+        if not keywords:
+            return None
+        session = self.collection.find_one(
+            {"prompt_keywords": {"$in": keywords}, "status": {"$in": list(MATCHABLE_STATUSES)}},
+            {"_id": 1},
+            sort=[("last_activity", -1)],
+        )
+        return session["_id"] if session else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "mongo", "sessions": self.collection.estimated_document_count()}
+
+
+def create_session_store(on_evict: Optional[Callable[[str], None]] = None) -> SessionStore:
+    """Builds the store selected by SESSION_STORE ("memory" or "mongo")."""
+    if SESSION_STORE == "mongo":
+        from database import db
+        return MongoSessionStore(db["sessions"])
+    if SESSION_STORE != "memory":
+        raise ValueError(f"Unknown SESSION_STORE {SESSION_STORE!r}; expected 'memory' or 'mongo'")
+    return InMemorySessionStore(on_evict=on_evict)
@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# The app modules live in backend/ and the benchmarks, whose corpora the tests reuse,
+# in backend/benchmarks/; every store is kept in memory so no MongoDB is needed
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "benchmarks")]
+for name in ("SESSION_STORE", "PLAN_CACHE_STORE", "SEARCH_CACHE_STORE"):
+    os.environ.setdefault(name, "memory")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+
+class FakeSetupCrew:
+    """
+    Stands in for the setup crew: asks how many people travel through the
+    session's real Human Input Tool and returns the answer.
+    """
+
+    def __init__(self, human_input, prefilled):
+        from travel_chatbot import create_human_input_tool
+
+        self.input_tool = create_human_input_tool(human_input)
+        self.prefilled = prefilled
+
+    def kickoff(self):
+        answer = self.input_tool.run(question="How many people are travelling?")
+        return FakeOutput(json.dumps({**self.prefilled, "num_people": answer}))
+
+
+class FakeOutput:
+    def __init__(self, raw):
+        self.raw = raw
+
+
+@pytest.fixture
+def chatbot(monkeypatch):
+    """
+    The app with fake crews and a fresh scheduler, coalescer and plan cache.
+    Plans read "plan for <location> x <num_people>".
+    """
+    import main
+    from plan_cache import PlanCache
+    from scheduler import JobCoalescer, JobScheduler
+
+    async def fake_invoke_agent_async(**trip_details):
+        return FakeOutput(f"plan for {trip_details['location']} x {trip_details['num_people']}")
+
+    monkeypatch.setattr(main, "job_scheduler", JobScheduler())
+    monkeypatch.setattr(main, "job_coalescer", JobCoalescer())
+    monkeypatch.setattr(main, "plan_cache", PlanCache())
+    monkeypatch.setattr(main, "setup_stats", {"rule_based": 0, "setup_crew": 0})
+    monkeypatch.setattr(main, "HUMAN_INPUT_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(main, "create_setup_crew", lambda prompt, history, human_input, prefilled: FakeSetupCrew(human_input, prefilled))
+    monkeypatch.setattr(main, "invoke_agent_async", fake_invoke_agent_async)
+    monkeypatch.setattr("plan_cache.budget_bucket", lambda budget: budget)
+    return main
+
+
+def wait_for(predicate, timeout: float = 30.0):
+    """Polls predicate() until it returns something truthy; fails the test on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.01)
+    pytest.fail("Timed out waiting for the sessions")
@@ -0,0 +1,77 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from database import CHAT_INDEXES, CHAT_SESSION_INDEXES
+
+# A throwaway database on this server is created and dropped. mongomock has no explain(),
+# so the query plans need a real server: with MONGO_TEST_URI or MONGO_URI set (as in CI) an
+# unreachable server fails the tests, otherwise they are skipped when none runs locally.
+CONFIGURED_URI = os.getenv("MONGO_TEST_URI") or os.getenv("MONGO_URI")
+MONGO_TEST_URI = CONFIGURED_URI or "mongodb://localhost:27017"
+
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=500 if CONFIGURED_URI is None else 5000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        if CONFIGURED_URI:
+            pytest.fail(f"MongoDB server configured for the index tests is unreachable: {e}")
+        pytest.skip(f"no MongoDB server at {MONGO_TEST_URI}")
+    db = client["travel_agent_index_test"]
+    for keys in CHAT_INDEXES:
+        db.chats.create_index(keys)
+    for keys in CHAT_SESSION_INDEXES:
+        db.chat_sessions.create_index(keys)
+    start = datetime(2025, 1, 1)
+    db.chats.insert_many([
+        {"session_id": f"s{n % 50}", "user_email": f"u{n % 10}@example.com", "sender": "user", "content": "hi", "timestamp": start + timedelta(minutes=n)}
+        for n in range(2000)
+    ])
+    db.chat_sessions.insert_many([
+        {"_id": f"s{n}", "user_email": f"u{n % 10}@example.com", "title": "trip", "timestamp": start + timedelta(hours=n)}
+        for n in range(50)
+    ])
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+def plan_stages(plan: dict) -> list:
+    stages = [plan["stage"]]
+    for child in [plan.get("inputStage"), *plan.get("inputStages", [])]:
+        if child:
+            stages += plan_stages(child)
+    return stages
+
+
+def winning_stages(cursor) -> list:
+    plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    # Servers using the slot-based engine nest the classic plan under queryPlan
+    return plan_stages(plan.get("queryPlan", plan))
+
+
+def test_session_messages_page_uses_the_index_for_filter_and_sort(db):
+    stages = winning_stages(db.chats.find({"session_id": "s7"}).sort([("timestamp", -1), ("_id", -1)]).limit(21))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages and "SORT" not in stages
+
+
+def test_older_page_keyset_query_uses_the_index(db):
+    before = datetime(2025, 1, 1, 12)
+    query = {"session_id": "s7", "$or": [{"timestamp": {"$lt": before}}, {"timestamp": before, "_id": {"$lt": "x"}}]}
+    stages = winning_stages(db.chats.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(21))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+
+
+def test_chat_history_uses_the_summary_index(db):
+    cursor = db.chat_sessions.find({"user_email": "u3@example.com", "title": {"$exists": True}}).sort("timestamp", -1).limit(20)
+    stages = winning_stages(cursor)
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages and "SORT" not in stages
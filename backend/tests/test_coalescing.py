@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import FakeOutput, wait_for
+from scheduler import JobScheduler
+
+# Complete prompts, so identical ones may share a job
+PROMPT = "Trip to Ella for 2 people, budget is 1000 USD, May 4 to 6"
+OTHER_PROMPT = "Trip to Galle for 3 people, budget is 900 USD, June 1 to 3"
+
+
+@pytest.fixture
+def planner(chatbot, monkeypatch):
+    """Plans of the chatbot fixture, held back until planner.finish is set; planner.calls counts them."""
+    planner = type("Planner", (), {"calls": [], "finish": threading.Event()})()
+
+    async def fake_invoke_agent_async(**trip_details):
+        planner.calls.append(trip_details["location"])
+        await asyncio.to_thread(planner.finish.wait, 30)
+        return FakeOutput(f"plan for {trip_details['location']} x {trip_details['num_people']}")
+
+    monkeypatch.setattr(chatbot, "invoke_agent_async", fake_invoke_agent_async)
+    return planner
+
+
+def status(client, session_id: str) -> dict:
+    return client.get(f"/chatbot/status/{session_id}").json()
+
+
+def completed(client, session_id: str) -> dict:
+    return wait_for(lambda: (lambda r: r if r["status"] == "completed" else None)(status(client, session_id)))
+
+
+def test_identical_prompts_run_one_crew_and_both_sessions_get_the_plan(chatbot, planner):
+    with TestClient(chatbot.app) as client:
+        client.post("/chatbot/start", json={"prompt": PROMPT, "session_id": "coalesce-first"})
+        wait_for(lambda: planner.calls)
+        # A double submit differing only in case and spacing follows the running job
+        second = client.post("/chatbot/start", json={"prompt": f"  {PROMPT.upper()} ", "session_id": "coalesce-second"}).json()
+        assert second["data"] == {"coalesced_into": "coalesce-first"}
+
+        planner.finish.set()
+        assert completed(client, "coalesce-first")["data"]["result"] == "plan for Ella, Sri Lanka x 2"
+        assert completed(client, "coalesce-second")["data"]["result"] == "plan for Ella, Sri Lanka x 2"
+
+    assert planner.calls == ["Ella, Sri Lanka"]
+    assert chatbot.job_coalescer.stats() == {"leaders": 1, "coalesced_prompts": 1, "in_flight": 0, "followers": 0}
+    assert chatbot.session_store.get("coalesce-second")["coalesced_into"] is None
+
+
+def test_bypass_cache_requests_run_their_own_crew(chatbot, planner):
+    with TestClient(chatbot.app) as client:
+        client.post("/chatbot/start", json={"prompt": PROMPT, "session_id": "coalesce-cached"})
+        wait_for(lambda: planner.calls)
+        fresh = client.post("/chatbot/start", json={"prompt": PROMPT, "session_id": "coalesce-fresh", "bypass_cache": True}).json()
+        assert fresh["status"] == "in_progress" and fresh.get("data") is None
+        wait_for(lambda: len(planner.calls) == 2)
+
+        planner.finish.set()
+        for session_id in ("coalesce-cached", "coalesce-fresh"):
+            assert completed(client, session_id)["data"]["result"] == "plan for Ella, Sri Lanka x 2"
+
+    assert "coalesced_prompts" not in chatbot.job_coalescer.stats()
+    assert "coalesced_plans" not in chatbot.job_coalescer.stats()
+
+
+def test_followers_of_a_rejected_request_are_failed_not_left_waiting(chatbot, planner, monkeypatch):
+    scheduler = JobScheduler(max_running=1, max_queued=0)
+    monkeypatch.setattr(chatbot, "job_scheduler", scheduler)
+    submit = scheduler.submit
+
+    def submit_after_a_follower_joined(job_id, job):
+        # What a session store that is awaited lets happen while a request is being admitted
+        if job_id == "coalesce-rejected":
+            chatbot.session_store.create("coalesce-follower", {"status": "initializing"})
+            assert chatbot.job_coalescer.join(("prompt", "ella"), "coalesce-rejected") is None
+            assert chatbot.job_coalescer.join(("prompt", "ella"), "coalesce-follower") == "coalesce-rejected"
+        return submit(job_id, job)
+
+    monkeypatch.setattr(scheduler, "submit", submit_after_a_follower_joined)
+
+    with TestClient(chatbot.app) as client:
+        client.post("/chatbot/start", json={"prompt": OTHER_PROMPT, "session_id": "coalesce-running"})
+        response = client.post("/chatbot/start", json={"prompt": PROMPT, "session_id": "coalesce-rejected"})
+        assert response.status_code == 429
+
+        assert client.get("/chatbot/status/rejected").status_code == 404
+        follower = chatbot.session_store.get("coalesce-follower")
+        assert (follower["status"], follower["coalesced_into"]) == ("error", None)
+        assert "at capacity" in follower["error"]
+        assert chatbot.job_coalescer.stats()["in_flight"] == 1
+
+        # Once there is room the same prompt starts a job of its own
+        planner.finish.set()
+        completed(client, "coalesce-running")
+        client.post("/chatbot/start", json={"prompt": PROMPT, "session_id": "coalesce-retry"})
+        assert completed(client, "coalesce-retry")["data"]["result"] == "plan for Ella, Sri Lanka x 2"
+
+    assert planner.calls == ["Galle, Sri Lanka", "Ella, Sri Lanka"]
@@ -0,0 +1,66 @@
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from conftest import wait_for
+from travel_chatbot import create_human_input_tool
+
+SESSIONS = 50
+
+
+def session_statuses(client, session_ids) -> dict:
+    return {session_id: client.get(f"/chatbot/status/{session_id}").json() for session_id in session_ids}
+
+
+def test_session_tools_hand_each_answer_to_their_own_session(chatbot):
+    with TestClient(chatbot.app) as client:
+        loop = client.portal.call(asyncio.get_running_loop)
+        session_ids = [f"tool-{i}" for i in range(SESSIONS)]
+        for session_id in session_ids:
+            chatbot.session_store.create(session_id, {"status": "in_progress", "conversation_history": []})
+        # One tool per session, as each setup crew builds its own
+        tools = {session_id: create_human_input_tool(chatbot.crew_input_callback(session_id, loop)) for session_id in session_ids}
+
+        with ThreadPoolExecutor(max_workers=SESSIONS) as pool:
+            answers = {session_id: pool.submit(tool.run, question=f"Question for {session_id}?") for session_id, tool in tools.items()}
+            questions = wait_for(lambda: (lambda s: s if all(r["status"] == "awaiting_input" for r in s.values()) else None)(
+                session_statuses(client, session_ids)))
+            assert all(r["input_question"] == f"Question for {session_id}?" for session_id, r in questions.items())
+
+            # Answer in a random order while the other tools are still blocked
+            for session_id in random.sample(session_ids, SESSIONS):
+                client.post("/chatbot/input", json={"session_id": session_id, "response": f"answer of {session_id}"})
+            for session_id, answer in answers.items():
+                assert answer.result(timeout=30) == f"answer of {session_id}"
+
+        for session_id in session_ids:
+            history = chatbot.session_store.get(session_id)["conversation_history"]
+            assert [(item["question"], item["response"]) for item in history] == [(f"Question for {session_id}?", f"answer of {session_id}")]
+
+
+def test_concurrent_setup_crews_never_see_each_others_answers(chatbot):
+    with TestClient(chatbot.app) as client:
+        # Identical prompts, so only the answers tell the sessions apart
+        session_ids = [
+            client.post("/chatbot/start", json={"prompt": "Trip to Ella, budget is 1000 USD, May 4 to 6", "session_id": f"concurrent-{i}"}).json()["session_id"]
+            for i in range(SESSIONS)
+        ]
+        assert len(set(session_ids)) == SESSIONS
+
+        # Answers the rules cannot read send every session to its setup crew, which asks through its own tool
+        wait_for(lambda: all(r["status"] == "awaiting_input" for r in session_statuses(client, session_ids).values()))
+        for session_id in session_ids:
+            client.post("/chatbot/input", json={"session_id": session_id, "response": "not sure yet"})
+        questions = wait_for(lambda: (lambda s: s if all(r.get("input_question") == "How many people are travelling?" for r in s.values()) else None)(
+            session_statuses(client, session_ids)))
+        assert len(questions) == SESSIONS
+
+        for session_id in random.sample(session_ids, SESSIONS):
+            client.post("/chatbot/input", json={"session_id": session_id, "response": f"people of {session_id}"})
+
+        finished = wait_for(lambda: (lambda s: s if all(r["status"] == "completed" for r in s.values()) else None)(
+            session_statuses(client, session_ids)))
+        for session_id, response in finished.items():
+            assert response["data"]["result"] == f"plan for Ella, Sri Lanka x people of {session_id}"
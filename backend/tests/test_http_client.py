@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_client import HttpClient
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the weather and currency APIs. Paths:
+    /ok, /slow (sleeps `delay` seconds), /fail/<status> (fails `failures`
+    times with that status, then succeeds).
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self.failures = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failing = self.path.startswith("/fail/") and server.failures > 0
+            if failing:
+                server.failures -= 1
+        try:
+            if self.path == "/slow":
+                time.sleep(server.delay)
+            status = int(self.path.rsplit("/", 1)[1]) if failing else 200
+            body = b'{"ok": true}'
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on a slow response
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_slow_responses_time_out_and_are_retried(server):
+    server.delay = 1.0
+    client = HttpClient(timeout=0.1, max_retries=1, backoff_factor=0)
+    start = time.perf_counter()
+    # With urllib3's retries exhausted, requests reports the read timeout as a ConnectionError
+    with pytest.raises(requests.RequestException, match="Read timed out"):
+        client.get(f"{server.base_url}/slow")
+    assert time.perf_counter() - start < 0.8
+    assert server.hits == 2
+
+
+@pytest.mark.parametrize("status", [500, 503, 429])
+def test_server_errors_and_rate_limits_are_retried(server, status):
+    server.failures = 2
+    client = HttpClient(max_retries=2, backoff_factor=0)
+    response = client.get(f"{server.base_url}/fail/{status}")
+    assert response.status_code == 200
+    assert server.hits == 3
+
+
+def test_retries_give_up_after_max_retries(server):
+    server.failures = 5
+    client = HttpClient(max_retries=2, backoff_factor=0)
+    assert client.get(f"{server.base_url}/fail/503").status_code == 503
+    assert server.hits == 3
+
+
+def test_concurrent_calls_per_host_are_capped(server):
+    server.delay = 0.1
+    client = HttpClient(max_per_host=3, pool_size=10)
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        responses = list(pool.map(lambda _: client.get(f"{server.base_url}/slow"), range(12)))
+    assert all(response.status_code == 200 for response in responses)
+    assert server.max_in_flight == 3
+
+
+def test_latency_and_errors_are_recorded_per_host(server):
+    server.delay = 0.05
+    client = HttpClient(max_retries=0)
+    for _ in range(4):
+        client.get(f"{server.base_url}/slow")
+    server.failures = 1
+    client.get(f"{server.base_url}/fail/502")
+
+    stats = client.stats()[f"127.0.0.1:{server.server_address[1]}"]
+    assert stats["requests"] == 5 and stats["errors"] == 1
+    assert stats["p50_ms"] >= 50 and stats["max_ms"] >= stats["p95_ms"] >= stats["p50_ms"]
@@ -0,0 +1,38 @@
+import json
+import time
+
+from cache import JsonFileCache
+
+
+def test_expired_entries_are_dropped_from_the_file(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = JsonFileCache(str(path))
+    cache.set("kept", [1, 2], ttl_seconds=60)
+    cache.set("not found", [], ttl_seconds=0.01)
+    time.sleep(0.02)
+    cache.set("other", [3, 4], ttl_seconds=60)
+
+    assert set(json.loads(path.read_text())) == {"kept", "other"}
+
+
+def test_processes_sharing_the_file_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "cache.json")
+    first, second = JsonFileCache(path), JsonFileCache(path)
+    first.set("ella", [6.87, 81.05], ttl_seconds=60)
+    # second read the file before first wrote, then writes its own entry
+    assert second.get("galle") is None
+    second.set("galle", [6.03, 80.22], ttl_seconds=60)
+    first.set("kandy", [7.29, 80.63], ttl_seconds=60)
+
+    assert set(json.loads(open(path).read())) == {"ella", "galle", "kandy"}
+    assert JsonFileCache(path).get("galle") == [6.03, 80.22]
+
+
+def test_items_report_the_remaining_lifetime(tmp_path):
+    cache = JsonFileCache(str(tmp_path / "cache.json"))
+    cache.set("ella", [6.87, 81.05], ttl_seconds=100)
+    cache.set("gone", [], ttl_seconds=-1)
+
+    [(key, value, ttl)] = cache.items()
+    assert (key, value) == ("ella", [6.87, 81.05])
+    assert 90 < ttl <= 100
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from conftest import wait_for
+from scheduler import JobScheduler
+
+SESSIONS = 300
+MAX_RUNNING = 4
+MAX_PARKED = 100
+
+
+def crew_threads() -> int:
+    return sum(thread.name.startswith("crew") for thread in threading.enumerate())
+
+
+def start_sessions(client, count: int, prefix: str) -> list:
+    return [
+        client.post("/chatbot/start", json={"prompt": f"Trip to Ella, budget is {1000 + i} USD, May 4 to 6", "session_id": f"{prefix}-{i}"}).json()["session_id"]
+        for i in range(count)
+    ]
+
+
+def session_statuses(client, session_ids) -> dict:
+    return {session_id: client.get(f"/chatbot/status/{session_id}").json() for session_id in session_ids}
+
+
+def test_hundreds_of_sessions_wait_for_input_at_once_without_threads(chatbot, monkeypatch):
+    scheduler = JobScheduler(max_running=MAX_RUNNING, max_queued=SESSIONS, max_parked=MAX_PARKED)
+    monkeypatch.setattr(chatbot, "job_scheduler", scheduler)
+    threads_before = crew_threads()
+
+    with TestClient(chatbot.app) as client:
+        session_ids = start_sessions(client, SESSIONS, "paused")
+
+        # The prompts leave out the party size, so every session is asked for it from the event loop
+        waiting = wait_for(lambda: (lambda s: s if all(r["status"] == "awaiting_input" for r in s.values()) else None)(
+            session_statuses(client, session_ids)))
+        assert len(waiting) == SESSIONS
+        assert {r["input_question"] for r in waiting.values()} == {chatbot.TRIP_DETAIL_QUESTIONS["num_people"]}
+        stats = scheduler.stats()
+        assert stats["parked_now"] == SESSIONS and stats["parked_with_thread"] == 0
+        assert stats["running"] == 0 and stats["queued"] == 0
+        assert crew_threads() == threads_before
+
+        # Short I/O on the default executor is not held up by the waiting sessions
+        assert client.portal.call(asyncio.wait_for, asyncio.to_thread(lambda: "free"), 1) == "free"
+
+        for i, session_id in enumerate(session_ids):
+            client.post("/chatbot/input", json={"session_id": session_id, "response": f"{i + 1} people"})
+
+        finished = wait_for(lambda: (lambda s: s if all(r["status"] == "completed" for r in s.values()) else None)(
+            session_statuses(client, session_ids)))
+        for i, session_id in enumerate(session_ids):
+            assert finished[session_id]["data"]["result"] == f"plan for Ella, Sri Lanka x {i + 1}"
+        assert chatbot.setup_stats["setup_crew"] == 0
+
+
+def test_setup_crews_waiting_for_input_stay_within_the_parked_limit(chatbot, monkeypatch):
+    max_parked = 3
+    scheduler = JobScheduler(max_running=MAX_RUNNING, max_queued=SESSIONS, max_parked=max_parked)
+    monkeypatch.setattr(chatbot, "job_scheduler", scheduler)
+
+    with TestClient(chatbot.app) as client:
+        session_ids = start_sessions(client, 12, "crew")
+        wait_for(lambda: all(r["status"] == "awaiting_input" for r in session_statuses(client, session_ids).values()))
+
+        # Answers the rules cannot read hand the session to the setup crew, which asks again from its thread
+        for session_id in session_ids:
+            client.post("/chatbot/input", json={"session_id": session_id, "response": "not sure yet"})
+
+        # Crews beyond the parked limit keep their slot, so the rest stay queued
+        asking = wait_for(lambda: (lambda s: s if len(s) == MAX_RUNNING + max_parked else None)(
+            [s for s, r in session_statuses(client, session_ids).items() if r.get("input_question") == "How many people are travelling?"]))
+        stats = scheduler.stats()
+        assert stats["parked_with_thread"] == max_parked and stats["running"] == MAX_RUNNING
+
+        answered = set()
+        def answer_crews():
+            for session_id, response in session_statuses(client, session_ids).items():
+                if response.get("input_question") == "How many people are travelling?" and session_id not in answered:
+                    client.post("/chatbot/input", json={"session_id": session_id, "response": "3 people"})
+                    answered.add(session_id)
+            assert scheduler.stats()["parked_with_thread"] <= max_parked
+            return len(answered) == len(session_ids)
+        wait_for(answer_crews)
+
+        finished = wait_for(lambda: (lambda s: s if all(r["status"] == "completed" for r in s.values()) else None)(
+            session_statuses(client, session_ids)))
+        assert {r["data"]["result"] for r in finished.values()} == {"plan for Ella, Sri Lanka x 3 people"}
+        assert len(asking) == MAX_RUNNING + max_parked
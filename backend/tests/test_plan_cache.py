@@ -0,0 +1,90 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import wait_for
+from plan_cache import PlanCache, budget_bucket, interests_fingerprint, plan_key
+
+# A complete prompt, so the plan is looked up without asking anything
+PROMPT = "Trip to Ella for 2 people, budget is 1000 USD, May 4 to 6"
+TRIP = {
+    "location": "Ella, Sri Lanka",
+    "budget": "1000 USD",
+    "num_people": "2",
+    "travel_dates": "2027-05-04 to 2027-05-06",
+    "preferred_currency": "LKR",
+    "interests": "hiking and tea plantations",
+}
+USD_RATES = {"USD": 1.0, "LKR": 0.0033}
+
+
+@pytest.fixture
+def rates(monkeypatch):
+    monkeypatch.setattr("travel_chatbot.get_conversion_rate", lambda currency, to_currency: USD_RATES.get(currency.upper()))
+
+
+def test_plan_key_ignores_case_spacing_and_the_order_of_interests(rates):
+    same_trip = {
+        **TRIP,
+        "location": "  ella,   SRI lanka ",
+        "travel_dates": "2027-05-04  to 2027-05-06",
+        "preferred_currency": "lkr",
+        "interests": "Tea plantations and HIKING",
+    }
+    assert plan_key(same_trip) == plan_key(TRIP)
+    assert plan_key({**TRIP, "num_people": "3"}) != plan_key(TRIP)
+    assert plan_key({**TRIP, "interests": "surfing"}) != plan_key(TRIP)
+
+
+def test_interests_fingerprint_leaves_out_numbers():
+    assert interests_fingerprint("hiking for 2 people, 1000 USD") == interests_fingerprint("hiking for 4 people, 900 USD")
+    assert interests_fingerprint(None) == interests_fingerprint("")
+
+
+def test_nearby_budgets_share_a_bucket_whatever_the_currency(rates):
+    bucket = budget_bucket("1000 USD")
+    assert budget_bucket("960 usd") == budget_bucket("1040 USD") == bucket
+    assert budget_bucket("303000 LKR") == bucket
+    assert budget_bucket("700 USD") != bucket and budget_bucket("1300 USD") != bucket
+    assert plan_key({**TRIP, "budget": "303000 LKR"}) == plan_key(TRIP)
+
+
+def test_budgets_that_cannot_be_converted_keep_their_own_bucket(rates):
+    assert budget_bucket("100 XYZ") == "100 XYZ"
+    assert budget_bucket("0 USD") == "0 USD"
+    assert budget_bucket("about a thousand") == "about a thousand"
+    assert budget_bucket(None) == "null"
+
+
+def test_stored_plans_are_served_from_memory():
+    cache = PlanCache(ttl_seconds=60)
+    assert cache.get("key") is None
+    cache.set("key", "plan")
+    assert cache.get("key") == "plan"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["hit_rate"], stats["memory_size"]) == (1, 1, 0.5, 1)
+
+
+def test_bypass_cache_plans_again_and_refreshes_the_cached_plan(chatbot, monkeypatch):
+    plans = iter(["first plan", "second plan"])
+    calls = []
+
+    async def fake_invoke_agent_async(**trip_details):
+        calls.append(trip_details["location"])
+        return type("Output", (), {"raw": next(plans)})()
+
+    monkeypatch.setattr(chatbot, "invoke_agent_async", fake_invoke_agent_async)
+
+    def plan(client, session_id, **options):
+        client.post("/chatbot/start", json={"prompt": PROMPT, "session_id": session_id, **options})
+        return wait_for(lambda: (lambda r: r if r["status"] == "completed" else None)(client.get(f"/chatbot/status/{session_id}").json()))
+
+    with TestClient(chatbot.app) as client:
+        assert plan(client, "first")["data"]["result"] == "first plan"
+        assert plan(client, "cached")["data"]["result"] == "first plan"
+        assert plan(client, "bypass", bypass_cache=True)["data"]["result"] == "second plan"
+        # The bypassing request stored its fresh plan for the next one
+        assert plan(client, "after")["data"]["result"] == "second plan"
+
+    assert calls == ["Ella, Sri Lanka"] * 2
+    stats = chatbot.plan_cache.stats()
+    assert (stats["bypassed"], stats["memory_hits"], stats["stores"]) == (1, 2, 2)
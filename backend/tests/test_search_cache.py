@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import wait_for
+from search_cache import SearchBudgets, SearchCache, create_search_tool, normalize_query
+
+
+class FakeSearch:
+    """Search backend that counts its calls; holds them until release is set if blocking."""
+
+    def __init__(self, blocking: bool = False):
+        self.queries = []
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        if not blocking:
+            self.release.set()
+
+    def __call__(self, query: str, search_type: str) -> dict:
+        with self.lock:
+            self.queries.append(query)
+        assert self.release.wait(10)
+        return {"organic": [{"title": f"{search_type} results for {query}"}]}
+
+
+@pytest.fixture
+def backend():
+    return FakeSearch()
+
+
+@pytest.fixture
+def cache():
+    return SearchCache()
+
+
+def make_tool(backend, cache, budgets=None, session_id="session", max_searches=10):
+    return create_search_tool(session_id, max_searches=max_searches, backend=backend, cache=cache, budgets=budgets or SearchBudgets())
+
+
+def test_queries_that_normalize_alike_share_cached_results(backend, cache):
+    assert normalize_query("Best villas with a pool in Mirissa!") == "best villas pool mirissa"
+    first = make_tool(backend, cache, session_id="a").run(search_query="Best villas with a pool in Mirissa!")
+    second = make_tool(backend, cache, session_id="b").run(search_query="best villas, pool, mirissa")
+
+    assert second == first
+    assert backend.queries == ["Best villas with a pool in Mirissa!"]
+    stats = cache.stats()
+    assert (stats["searches"], stats["memory_hits"], stats["memory_size"]) == (1, 1, 1)
+
+
+def test_concurrent_identical_searches_reach_the_backend_once(cache):
+    backend = FakeSearch(blocking=True)
+    tools = [make_tool(backend, cache, session_id=f"session-{i}") for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=len(tools)) as pool:
+        searches = [pool.submit(tool.run, search_query="hikes near Ella") for tool in tools]
+        # Every other thread waits for the one search that is in flight
+        wait_for(lambda: cache.stats()["coalesced"] == len(tools) - 1)
+        backend.release.set()
+        results = [search.result(timeout=10) for search in searches]
+
+    assert backend.queries == ["hikes near Ella"]
+    assert all(result == results[0] for result in results)
+    assert cache.stats()["searches"] == 1
+
+
+def test_the_budget_is_shared_by_every_tool_of_a_session(backend, cache):
+    budgets = SearchBudgets()
+    # Each crew of a session builds its own tool, e.g. for a follow-up question
+    first_crew, second_crew = (make_tool(backend, cache, budgets, max_searches=2) for _ in range(2))
+    first_crew.run(search_query="hikes near Ella")
+    second_crew.run(search_query="tea plantations Ella")
+
+    assert "search budget of 2 searches" in second_crew.run(search_query="waterfalls near Ella")
+    assert "search budget" in first_crew.run(search_query="cafes in Ella")
+    assert budgets.used_by("session") == 2
+    assert cache.stats()["over_budget"] == 2
+
+    # Cached results are still served, and other sessions have a budget of their own
+    assert second_crew.run(search_query="Hikes near Ella") == first_crew.run(search_query="hikes near Ella")
+    assert "search budget" not in make_tool(backend, cache, budgets, session_id="other", max_searches=2).run(search_query="cafes in Ella")
+    assert backend.queries == ["hikes near Ella", "tea plantations Ella", "cafes in Ella"]
+
+
+def test_tools_without_a_session_count_alone_and_zero_means_unlimited(backend, cache):
+    budgets = SearchBudgets()
+    tools = [create_search_tool(max_searches=1, backend=backend, cache=cache, budgets=budgets) for _ in range(2)]
+    for number, tool in enumerate(tools):
+        assert "search budget" not in tool.run(search_query=f"query {number}")
+
+    unlimited = make_tool(backend, cache, budgets, max_searches=0)
+    for number in range(20):
+        assert "search budget" not in unlimited.run(search_query=f"more {number}")
+    assert budgets.used_by("session") == 0
+    assert len(backend.queries) == 22
@@ -0,0 +1,106 @@
+from session_store import InMemorySessionStore
+
+TTL = 100
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_store(max_entries: int = 100):
+    clock, evicted = FakeClock(), []
+    store = InMemorySessionStore(ttl_seconds=TTL, max_entries=max_entries, on_evict=evicted.append, clock=clock)
+    return store, clock, evicted
+
+
+def test_idle_sessions_expire_after_the_ttl():
+    store, clock, evicted = make_store()
+    store.create("done", {"status": "completed", "initial_prompt": "trip to kandy"})
+    clock.now += TTL - 1
+    assert store.get("done") is not None
+
+    # get() refreshed nothing, so the session expires TTL after its last write
+    clock.now += 1
+    assert store.get("done") is None
+    assert evicted == ["done"]
+    assert store.stats()["expirations"] == 1
+
+
+def test_writes_keep_a_session_alive():
+    store, clock, _ = make_store()
+    store.create("s", {"status": "completed"})
+    clock.now += TTL - 1
+    store.update("s", result="plan")
+    clock.now += TTL - 1
+    assert store.get("s")["result"] == "plan"
+
+
+def test_sessions_with_a_job_never_expire():
+    store, clock, evicted = make_store()
+    for status in ("in_progress", "awaiting_input", "queued"):
+        store.create(status, {"status": status})
+    clock.now += 10 * TTL
+    store.create("new", {"status": "completed"})
+
+    assert all(store.get(status) is not None for status in ("in_progress", "awaiting_input", "queued"))
+    assert evicted == []
+
+
+def test_least_recently_used_sessions_are_evicted_beyond_max_entries():
+    store, clock, evicted = make_store(max_entries=3)
+    for name in ("a", "b", "c"):
+        store.create(name, {"status": "completed"})
+        clock.now += 1
+    store.update("a", result="plan")  # a is now the most recently used
+    store.create("d", {"status": "completed"})
+
+    assert evicted == ["b"]
+    assert [name for name in "abcd" if store.get(name)] == ["a", "c", "d"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_lru_eviction_skips_active_and_awaiting_input_sessions():
+    store, _, evicted = make_store(max_entries=2)
+    store.create("waiting", {"status": "awaiting_input"})
+    store.create("running", {"status": "in_progress"})
+    store.create("done", {"status": "completed"})
+    assert evicted == ["done"]
+
+    # With only active sessions left the store grows past max_entries rather than drop one
+    store.create("queued", {"status": "queued"})
+    assert evicted == ["done"]
+    assert store.stats()["sessions"] == 3
+
+
+def test_evicted_sessions_are_dropped_from_the_keyword_index():
+    store, clock, _ = make_store(max_entries=1)
+    store.create("kandy", {"status": "completed", "initial_prompt": "temples in kandy"})
+    assert store.find_matching_session("kandy please") == "kandy"
+
+    store.create("galle", {"status": "completed", "initial_prompt": "galle beaches"})
+    assert store.find_matching_session("kandy please") is None
+    assert store.find_matching_session("galle please") == "galle"
+    assert store.stats()["indexed_keywords"] == 2
+
+
+def test_expired_sessions_are_dropped_by_find_matching_session():
+    store, clock, evicted = make_store()
+    store.create("kandy", {"status": "completed", "initial_prompt": "temples in kandy"})
+    clock.now += TTL
+    assert store.find_matching_session("kandy please") is None
+    assert evicted == ["kandy"]
+    assert store.stats()["indexed_keywords"] == 0
+
+
+def test_only_matchable_sessions_are_indexed():
+    store, _, _ = make_store()
+    store.create("s", {"status": "in_progress", "initial_prompt": "temples in kandy"})
+    assert store.find_matching_session("kandy") is None
+    store.update("s", status="completed")
+    assert store.find_matching_session("kandy") == "s"
+    store.update("s", status="in_progress")
+    assert store.find_matching_session("kandy") is None
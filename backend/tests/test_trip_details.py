@@ -0,0 +1,14 @@
+from trip_details_accuracy import evaluate
+from travel_chatbot import extract_trip_details
+
+
+def test_labelled_corpus_has_no_wrong_fields():
+    correct, wrong, unknown, skipped = evaluate()
+    assert wrong == 0
+    assert unknown == 0
+
+
+def test_only_destinations_count_as_the_location():
+    assert extract_trip_details("I live in London and want to visit Kandy")["location"] == "Kandy, Sri Lanka"
+    assert extract_trip_details("I live in London and want to visit Barcelona")["location"] == "null"
+    assert extract_trip_details("Ella and I want a beach holiday")["location"] == "null"
@@ -2,14 +2,17 @@ import os
 from typing import Optional
 from dotenv import load_dotenv
 from functools import lru_cache
-from crewai import LLM, Agent, Task, Crew, Process
-from datetime import datetime
-import requests
+from datetime import datetime, timedelta
 import json
-from crewai.tools import tool          # decorator
-from crewai_tools import SerperDevTool # web-search tool
-from IPython.display import Markdown, display
 import re
+import threading
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache, JsonFileCache, DailyRecordCache
+from http_client import http_get
+from scheduler import llm_limits, MAX_RUNNING_JOBS, MAX_PARKED_JOBS
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,13 +26,70 @@ GEMINIPRO_API_KEY = os.getenv("GEMINIPRO_API_KEY")
 OPENROUTER_API_KEY2=os.getenv("OPENROUTER_API_KEY2")
 OPENAI_API_BASE=os.getenv("OPENAI_API_BASE")
 
-os.environ["SERPER_API_KEY"] = os.getenv("SERPER_API_KEY")
+# Upstream APIs (overridable, e.g. to point the tools at a local stub server)
+OPEN_METEO_GEOCODING_URL = os.getenv("OPEN_METEO_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+OPEN_METEO_FORECAST_URL = os.getenv("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+EXCHANGE_RATE_API_URL = os.getenv("EXCHANGE_RATE_API_URL", "https://open.er-api.com/v6/latest")
+
+# Exchange-rate tables are cached per base currency; rates change slowly
+EXCHANGE_RATE_TTL_SECONDS = float(os.getenv("EXCHANGE_RATE_TTL_SECONDS", "3600"))
+EXCHANGE_RATE_BASE_CURRENCY = os.getenv("EXCHANGE_RATE_BASE_CURRENCY", "USD")
+
+# Geocoding results are cached in memory and in a local JSON file; unknown
+# city names are cached too, for a shorter time
+GEOCODE_TTL_SECONDS = float(os.getenv("GEOCODE_TTL_SECONDS", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL_SECONDS = float(os.getenv("GEOCODE_NEGATIVE_TTL_SECONDS", str(24 * 3600)))
+GEOCODE_CACHE_FILE = os.getenv("GEOCODE_CACHE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.json"))
+GEOCODE_USE_GAZETTEER = os.getenv("GEOCODE_USE_GAZETTEER", "true").lower() in ("1", "true", "yes")
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.json")
+
+# Forecast days fetched within the same bucket (default 3 hours) are reused
+FORECAST_BUCKET_SECONDS = float(os.getenv("FORECAST_BUCKET_SECONDS", str(3 * 3600)))
+# JSON lines file every forecast request is appended to, for replay with
+# benchmarks/forecast_cache_replay.py; empty to disable
+FORECAST_REQUEST_LOG = os.getenv("FORECAST_REQUEST_LOG", "")
+
+# Fetch weather and exchange rates directly instead of through the Local Data agent
+PREFETCH_LOCAL_DATA = os.getenv("PREFETCH_LOCAL_DATA", "true").lower() in ("1", "true", "yes")
+
+# crewAI and crewai_tools take seconds to import, so they are only loaded when
+# the first crew is built; preload_crew_dependencies() does it ahead of time
+_crewai_import_lock = threading.Lock()
+
+def _import_crewai():
+    """
+    Imports crewAI and crewai_tools once, before any of their modules is used.
+    Their packages import each other circularly, so a first import from two
+    threads at a time (e.g. the startup preload and a request) can fail with
+    a partially initialized module.
+    """
+    with _crewai_import_lock:
+        import crewai
+        import crewai.tools
+        import crewai_tools
+
+@lru_cache(maxsize=1)
+def _rate_limited_llm_class():
+    _import_crewai()
+    from crewai import LLM
+
+    class RateLimitedLLM(LLM):
+        """LLM whose calls wait for a free per-provider and per-model concurrency slot."""
+
+        def call(self, *args, **kwargs):
+            with llm_limits.slot(self.model):
+                return super().call(*args, **kwargs)
+
+    return RateLimitedLLM
 
-print("API Keys loaded successfully.")
+def preload_crew_dependencies():
+    """Imports crewAI and builds the shared tools, e.g. from a background thread at startup."""
+    _rate_limited_llm_class()
+    _crew_tools()
 
 @lru_cache(maxsize=1)
 def initialize_llm():
-    return LLM(
+    return _rate_limited_llm_class()(
         model="openrouter/z-ai/glm-4.5-air:free",
         api_key=OPENROUTER_API_KEY2,
         base_url=os.getenv("OPENAI_API_BASE", "https://openrouter.ai/api/v1"),
@@ -39,7 +99,7 @@ def initialize_llm():
 @lru_cache(maxsize=1)
 def initialize_llm1():
     """Initialize and cache the LLM instance to avoid repeated initializations."""
-    return LLM(
+    return _rate_limited_llm_class()(
         model="gemini/gemini-2.0-flash",
         provider="google",
         api_key=GEMINI_API_KEY
@@ -48,21 +108,67 @@ def initialize_llm1():
 @lru_cache(maxsize=1)
 def initialize_llmPro():
     """Initialize and cache the LLM instance to avoid repeated initializations."""
-    return LLM(
+    return _rate_limited_llm_class()(
         model="gemini/gemini-2.5-flash",
         provider="google",
         api_key=GEMINIPRO_API_KEY
     )   
 
+def initialize_streaming_llm():
+    """
+    Creates a streaming copy of the initialize_llm1 model. A fresh instance is
+    returned on every call so its stream events can be told apart from other
+    crews running at the same time.
+    """
+    return _rate_limited_llm_class()(
+        model="gemini/gemini-2.0-flash",
+        provider="google",
+        api_key=GEMINI_API_KEY,
+        stream=True
+    )
+
+# Streaming listeners keyed by id() of the LLM instance they follow
+_stream_listeners = {}
+_stream_listeners_lock = threading.Lock()
+_stream_handlers_registered = False
 
+def _register_stream_handlers():
+    """Registers the crewAI event-bus handlers that route LLM stream chunks to their listener."""
+    global _stream_handlers_registered
+    with _stream_listeners_lock:
+        if _stream_handlers_registered:
+            return
+        _stream_handlers_registered = True
+
+    _import_crewai()
+    from crewai.utilities.events import crewai_event_bus, LLMCallStartedEvent, LLMStreamChunkEvent
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def _on_llm_call_started(source, event):
+        listener = _stream_listeners.get(id(source))
+        if listener is not None:
+            listener.start_call()
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _on_llm_stream_chunk(source, event):
+        listener = _stream_listeners.get(id(source))
+        if listener is not None:
+            listener.feed(event.chunk)
+
+def follow_llm_stream(llm, listener):
+    """Routes the stream events of one LLM instance to listener until unfollow_llm_stream is called."""
+    _register_stream_handlers()
+    with _stream_listeners_lock:
+        _stream_listeners[id(llm)] = listener
+
+def unfollow_llm_stream(llm):
+    with _stream_listeners_lock:
+        _stream_listeners.pop(id(llm), None)
 
-# Initialize the web search tool
-search_tool = SerperDevTool()
 
 # Tool 1: Human Input Tool
 # This tool pauses the execution and asks for human input.
-@tool("Human Input Tool")
-def human_input_tool(question: str) -> str:
+def ask_console_human(question: str) -> str:
     """Asks a human for input. Returns only the user's response without additional context."""
     # Clear any pending output and ensure the prompt is visible
     print("\n" + "="*50)
@@ -81,54 +187,169 @@ def human_input_tool(question: str) -> str:
     # Clean and return just the user's input
     return user_response.strip()
 
+def create_human_input_tool(ask_human):
+    """
+    Builds a Human Input Tool bound to one session's input callback.
+    Each setup crew gets its own instance so concurrent sessions never
+    receive each other's questions or answers.
+    """
+    _import_crewai()
+    from crewai.tools import tool
+
+    @tool("Human Input Tool")
+    def session_human_input_tool(question: str) -> str:
+        """Asks a human for input. Returns only the user's response without additional context."""
+        return ask_human(question).strip()
+
+    return session_human_input_tool
+
+# Month names and abbreviations as they appear in prompts
+_MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7, 'august': 8, 'aug': 8, 'september': 9, 'sept': 9, 'sep': 9,
+    'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
+}
+_MONTH_NAMES = '|'.join(sorted(_MONTHS, key=len, reverse=True))
+_DAY = r'(\d{1,2})(?:st|nd|rd|th)?'
+# "2025-08-05 to 2025-08-10"
+_ISO_RANGE_PATTERN = re.compile(r'\b(\d{4}-\d{2}-\d{2})\s*(?:to|until|-)\s*(\d{4}-\d{2}-\d{2})\b')
+# "august 5th to 6th", "aug 5-6"
+_DAY_RANGE_PATTERN = re.compile(rf'\b({_MONTH_NAMES})\s+{_DAY}\s*(?:to|until|-)\s*{_DAY}\b(?!\s*(?:{_MONTH_NAMES})\b)')
+# A single date, "september 6th" or "7th of september"
+_DATE_PATTERN = re.compile(rf'\b(?:({_MONTH_NAMES})\s+{_DAY}|{_DAY}(?:\s+of)?\s+({_MONTH_NAMES}))\b')
+_FLEXIBLE_DATES_PATTERN = re.compile(r'\b(?:flexible|any ?time|no preferred dates?)\b')
+
+def _date_range_text(start: tuple[int, int], end: tuple[int, int]) -> str | None:
+    """
+    Formats (month, day) pairs as the next such date range: one that would
+    start before today is next year's, and one that crosses new year ends in
+    the year after it starts.
+    """
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        year = today.year if datetime(today.year, *start) >= today else today.year + 1
+        start_date = datetime(year, *start)
+        end_date = datetime(year, *end)
+        if end_date < start_date:
+            end_date = datetime(year + 1, *end)
+    except ValueError:
+        return None
+    return f"{start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}"
+
 # Enhanced date parsing function
 def parse_flexible_dates(date_input: str) -> str:
     """Convert flexible date formats to YYYY-MM-DD format"""
     if not date_input or date_input.lower() in ['flexible', 'no preferred date', 'any time']:
         return 'flexible'
-    
-    # Try to parse common date formats
-    import re
-    from datetime import datetime
-    
+
+    text = date_input.lower()
+
+    match = _ISO_RANGE_PATTERN.search(text)
+    if match:
+        return f"{match.group(1)} to {match.group(2)}"
+
     # Handle formats like "august 5th to 6th", "aug 5 to 6", etc.
-    current_year = datetime.now().year
-    
-    # Pattern for "month day to day" format
-    pattern1 = r'(\w+)\s+(\d+)(?:st|nd|rd|th)?\s+to\s+(\d+)(?:st|nd|rd|th)?'
-    match1 = re.search(pattern1, date_input.lower())
-    
-    if match1:
-        month_name, start_day, end_day = match1.groups()
-        try:
-            # Convert month name to number
-            month_map = {
-                'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
-                'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6,
-                'july': 7, 'jul': 7, 'august': 8, 'aug': 8, 'september': 9, 'sep': 9,
-                'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
-            }
-            
-            month_num = month_map.get(month_name)
-            if month_num:
-                start_date = f"{current_year}-{month_num:02d}-{int(start_day):02d}"
-                end_date = f"{current_year}-{month_num:02d}-{int(end_day):02d}"
-                return f"{start_date} to {end_date}"
-        except:
-            pass
-    
+    for match in _DAY_RANGE_PATTERN.finditer(text):
+        month_num = _MONTHS[match.group(1)]
+        dates = _date_range_text((month_num, int(match.group(2))), (month_num, int(match.group(3))))
+        if dates:
+            return dates
+
+    # Otherwise take the first two dates, e.g. "september 6th and come back on 7th september"
+    mentioned = []
+    for match in _DATE_PATTERN.finditer(text):
+        month_name, day = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        mentioned.append((_MONTHS[month_name], int(day)))
+    if len(mentioned) >= 2:
+        dates = _date_range_text(mentioned[0], mentioned[1])
+        if dates:
+            return dates
+
     # If parsing fails, return the original input
     return date_input
 
-def geocode_city(city: str) -> tuple[float, float] | None:
-    url = "https://geocoding-api.open-meteo.com/v1/search"
-    resp = requests.get(url, params={"name": city, "count": 1, "language": "en"})
+# Geocoding: offline gazetteer -> in-process LRU -> local file -> Open-Meteo API
+geocode_cache = TTLCache(ttl_seconds=GEOCODE_TTL_SECONDS, max_entries=4096)
+geocode_file_cache = JsonFileCache(GEOCODE_CACHE_FILE) if GEOCODE_CACHE_FILE else None
+_NOT_FOUND = ()  # cached marker for city names the API does not know
+
+@lru_cache(maxsize=1)
+def load_gazetteer() -> dict:
+    """Bundled offline gazetteer of frequently requested destinations, keyed by lowercase name."""
+    try:
+        with open(GAZETTEER_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _normalize_place_name(city: str) -> str:
+    return " ".join(city.lower().split())
+
+def _lookup_gazetteer(key: str) -> tuple[float, float] | None:
+    if not GEOCODE_USE_GAZETTEER:
+        return None
+    gazetteer = load_gazetteer()
+    # "Mirissa, Sri Lanka" is also found under "mirissa"
+    place = gazetteer.get(key) or gazetteer.get(key.split(',')[0].strip())
+    if place:
+        return place["latitude"], place["longitude"]
+    return None
+
+def _fetch_geocode(city: str) -> tuple[float, float] | None:
+    resp = http_get(OPEN_METEO_GEOCODING_URL, params={"name": city, "count": 1, "language": "en"})
     resp.raise_for_status()
     results = resp.json().get("results")
     if results:
         return results[0]["latitude"], results[0]["longitude"]
     return None
 
+def _load_geocode(city: str, key: str) -> tuple:
+    coords = _lookup_gazetteer(key)
+    if coords:
+        return coords
+    if geocode_file_cache:
+        stored = geocode_file_cache.get(key)
+        if stored is not None:
+            return tuple(stored)
+    coords = _fetch_geocode(city) or _NOT_FOUND
+    if geocode_file_cache:
+        ttl = GEOCODE_TTL_SECONDS if coords else GEOCODE_NEGATIVE_TTL_SECONDS
+        geocode_file_cache.set(key, list(coords), ttl)
+    return coords
+
+def geocode_city(city: str) -> tuple[float, float] | None:
+    key = _normalize_place_name(city)
+    coords = geocode_cache.get_or_load(
+        key,
+        lambda: _load_geocode(city, key),
+        ttl=lambda value: GEOCODE_TTL_SECONDS if value else GEOCODE_NEGATIVE_TTL_SECONDS,
+    )
+    return tuple(coords) if coords else None
+
+def prewarm_geocode_cache(cities: Optional[list[str]] = None) -> int:
+    """
+    Fills the in-process geocode cache from the local file, keeping each
+    entry's remaining lifetime, and the gazetteer, then geocodes any extra
+    cities given. Returns the number of cached names.
+    """
+    if geocode_file_cache:
+        for key, coords, ttl in geocode_file_cache.items():
+            geocode_cache.set(key, tuple(coords), ttl)
+    if GEOCODE_USE_GAZETTEER:
+        for key, place in load_gazetteer().items():
+            geocode_cache.set(key, (place["latitude"], place["longitude"]))
+    for city in cities or []:
+        try:
+            geocode_city(city)
+        except Exception as e:
+            print(f"Could not pre-warm geocode for {city}: {e}")
+    return len(geocode_cache)
+
+def get_geocode_cache_stats() -> dict:
+    """Hit/miss counters of the in-process geocode cache."""
+    return geocode_cache.stats()
+
 # Tool 2: Weather Tool (Updated for Forecast)
 bad_weather_codes = [51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 71, 73, 75, 77, 80, 81, 82, 85, 86, 95, 96, 99]
 desc_map = {
@@ -162,14 +383,16 @@ desc_map = {
     99: "Thunderstorm with heavy hail"
 }
 
-@tool("Weather Tool")
-def open_meteo_weather_tool(city: str, start_date: str, end_date: str) -> str:
-    """Returns weather forecast for a city between start_date and end_date using Open-Meteo."""
-    coords = geocode_city(city)
-    if not coords:
-        return f"Sorry, I couldn’t find coordinates for {city}."
-    lat, lon = coords
-    url = "https://api.open-meteo.com/v1/forecast"
+# Per-day forecast records keyed by rounded coordinates
+forecast_cache = DailyRecordCache(bucket_seconds=FORECAST_BUCKET_SECONDS)
+
+def _date_range(start_date: str, end_date: str) -> list[str]:
+    start = datetime.strptime(start_date.strip(), '%Y-%m-%d')
+    end = datetime.strptime(end_date.strip(), '%Y-%m-%d')
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+
+def _fetch_daily_forecast(lat: float, lon: float, start_date: str, end_date: str) -> dict:
+    """Fetches the forecast from Open-Meteo and returns {date: (min_temp, max_temp, weathercode)}."""
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -178,18 +401,61 @@ def open_meteo_weather_tool(city: str, start_date: str, end_date: str) -> str:
         "end_date": end_date,
         "timezone": "auto"
     }
+    r = http_get(OPEN_METEO_FORECAST_URL, params=params)
+    r.raise_for_status()
+    daily = r.json()["daily"]
+    return {
+        daily["time"][i]: (daily["temperature_2m_min"][i], daily["temperature_2m_max"][i], daily["weathercode"][i])
+        for i in range(len(daily["time"]))
+    }
+
+def get_daily_forecast(lat: float, lon: float, start_date: str, end_date: str) -> dict:
+    """
+    Returns the per-day forecast for a location, fetching only the days that
+    are not already cached (as one request spanning the first to last missing day).
+    """
+    location = (round(lat, 2), round(lon, 2))
     try:
-        r = requests.get(url, params=params, timeout=8)
-        r.raise_for_status()
-        data = r.json()
-        daily = data["daily"]
+        days = _date_range(start_date, end_date)
+    except ValueError:
+        # Let Open-Meteo report malformed dates as it always has
+        return _fetch_daily_forecast(lat, lon, start_date, end_date)
+
+    records, missing = forecast_cache.get_range(location, days)
+    if missing:
+        fetched = _fetch_daily_forecast(lat, lon, missing[0], missing[-1])
+        forecast_cache.put(location, fetched)
+        records.update({day: fetched[day] for day in missing if day in fetched})
+    return {day: records[day] for day in days if day in records}
+
+def get_forecast_cache_stats() -> dict:
+    """Hit/miss counters of the forecast cache, counted per day."""
+    return forecast_cache.stats()
+
+_forecast_log_lock = threading.Lock()
+
+def _log_forecast_request(city: str, start_date: str, end_date: str) -> None:
+    if not FORECAST_REQUEST_LOG:
+        return
+    line = json.dumps({"timestamp": datetime.now().timestamp(), "city": city, "start_date": start_date, "end_date": end_date})
+    try:
+        with _forecast_log_lock, open(FORECAST_REQUEST_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not log forecast request: {e}")
+
+def get_weather_forecast(city: str, start_date: str, end_date: str) -> str:
+    """Returns weather forecast for a city between start_date and end_date using Open-Meteo."""
+    try:
+        _log_forecast_request(city, start_date, end_date)
+        coords = geocode_city(city)
+        if not coords:
+            return f"Sorry, I couldn’t find coordinates for {city}."
+        lat, lon = coords
+        daily = get_daily_forecast(lat, lon, start_date, end_date)
         forecast_lines = [f"Weather forecast for {city.title()} from {start_date} to {end_date}:"]
         bad_weather_dates = []
-        for i in range(len(daily["time"])):
-            date = daily["time"][i]
-            max_temp = daily["temperature_2m_max"][i]
-            min_temp = daily["temperature_2m_min"][i]
-            code = daily["weathercode"][i]
+        for date, (min_temp, max_temp, code) in daily.items():
             desc = desc_map.get(code, "unknown")
             forecast_lines.append(f"- {date}: {min_temp}°C to {max_temp}°C, {desc}")
             if code in bad_weather_codes:
@@ -200,21 +466,49 @@ def open_meteo_weather_tool(city: str, start_date: str, end_date: str) -> str:
     except Exception as e:
         return f"Error fetching Open-Meteo data: {e}"
 
+def open_meteo_weather(city: str, start_date: str, end_date: str) -> str:
+    """Returns weather forecast for a city between start_date and end_date using Open-Meteo."""
+    return get_weather_forecast(city, start_date, end_date)
+
 # Tool 3: Currency Conversion Tool
-def get_conversion_rate(from_currency: str, to_currency: str) -> float | None:
-    """Helper function to get a numerical conversion rate."""
+rate_table_cache = TTLCache(ttl_seconds=EXCHANGE_RATE_TTL_SECONDS, max_entries=16)
+
+def _fetch_rate_table(base_currency: str) -> dict | None:
     try:
-        url = f"https://open.er-api.com/v6/latest/{from_currency}"
-        response = requests.get(url)
+        response = http_get(f"{EXCHANGE_RATE_API_URL}/{base_currency}")
         response.raise_for_status()
-        data = response.json()
-        return data['rates'][to_currency]
+        return response.json()['rates']
+    except Exception:
+        return None
+
+def get_rate_table(base_currency: str = EXCHANGE_RATE_BASE_CURRENCY) -> dict | None:
+    """
+    Returns the full rate table for base_currency from the process-wide cache.
+    Concurrent misses for the same base share a single HTTP request.
+    """
+    return rate_table_cache.get_or_load(base_currency, lambda: _fetch_rate_table(base_currency))
+
+def get_conversion_rate(from_currency: str, to_currency: str) -> float | None:
+    """
+    Helper function to get a numerical conversion rate.
+    Every pair is derived from the one cached EXCHANGE_RATE_BASE_CURRENCY table.
+    """
+    try:
+        from_currency = from_currency.strip().upper()
+        to_currency = to_currency.strip().upper()
+        if from_currency == to_currency:
+            return 1.0
+        rates = get_rate_table()
+        return rates[to_currency] / rates[from_currency]
     except Exception:
         return None
 
+def get_exchange_rate_cache_stats() -> dict:
+    """Hit/miss counters of the exchange-rate cache."""
+    return rate_table_cache.stats()
+
 # Your existing tool can now be simplified
-@tool("Currency Conversion Tool")
-def currency_conversion_tool(from_currency: str, to_currency: str, amount: str = "1") -> str:
+def currency_conversion(from_currency: str, to_currency: str, amount: str = "1") -> str:
     """
     Returns the conversion rate from one currency to another, or converts a specific amount.
     
@@ -257,7 +551,28 @@ def format_currency(amount: float, currency_code: str) -> str:
     
     return f"{formatted} {currency_code}"
 
-print("Tools created successfully.")
+# --- crewAI tools, built on first use ---
+@lru_cache(maxsize=1)
+def _crew_tools() -> dict:
+    _import_crewai()
+    from crewai.tools import tool
+    from search_cache import create_search_tool
+
+    return {
+        # Cached, without a search budget; crews get their own budgeted instance
+        "search_tool": create_search_tool(max_searches=0),
+        "human_input_tool": tool("Human Input Tool")(ask_console_human),
+        "open_meteo_weather_tool": tool("Weather Tool")(open_meteo_weather),
+        "currency_conversion_tool": tool("Currency Conversion Tool")(currency_conversion),
+    }
+
+def __getattr__(name):
+    """Keeps travel_chatbot.search_tool etc. and RateLimitedLLM importable without loading crewAI up front."""
+    if name in ("search_tool", "human_input_tool", "open_meteo_weather_tool", "currency_conversion_tool"):
+        return _crew_tools()[name]
+    if name == "RateLimitedLLM":
+        return _rate_limited_llm_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Define country to currency mapping
 country_to_currency = {
@@ -283,119 +598,258 @@ country_to_currency = {
     # Add more as needed
 }
 
+# Currency names as written in prompts, mapped to ISO 4217 codes
+currency_names = {
+    'sri lankan rupees': 'LKR',
+    'sri lankan rupee': 'LKR',
+    'lankan rupees': 'LKR',
+    'rupees': 'LKR',  # Default rupees to LKR unless context suggests otherwise
+    'rupee': 'LKR',
+    'indian rupees': 'INR',
+    'indian rupee': 'INR',
+    'us dollars': 'USD',
+    'us dollar': 'USD',
+    'american dollars': 'USD',
+    'dollars': 'USD',
+    'dollar': 'USD',
+    'bucks': 'USD',
+    'british pounds': 'GBP',
+    'pounds sterling': 'GBP',
+    'pounds': 'GBP',
+    'euros': 'EUR',
+    'euro': 'EUR',
+    'japanese yen': 'JPY',
+    'yen': 'JPY',
+    'thai baht': 'THB',
+    'baht': 'THB',
+    'australian dollars': 'AUD',
+    'canadian dollars': 'CAD',
+    'singapore dollars': 'SGD',
+    'new zealand dollars': 'NZD',
+    'hong kong dollars': 'HKD',
+    'swiss francs': 'CHF',
+    'south african rand': 'ZAR',
+    'rand': 'ZAR',
+    'dirhams': 'AED',
+    'dirham': 'AED',
+    'ringgit': 'MYR',
+    'rupiah': 'IDR',
+    'yuan': 'CNY',
+    'renminbi': 'CNY',
+}
+
+# ISO 4217 codes; these are matched in any case ("50000 lkr")
+ISO_CURRENCY_CODES = set("""
+    AED AFN AMD AOA ARS AUD AWG AZN BBD BDT BGN BHD BIF BMD BND BRL BSD BTN
+    BWP BYN BZD CAD CDF CHF CLP CNY COP CRC CVE CZK DJF DKK DOP DZD EGP ERN
+    ETB EUR FJD FKP GBP GHS GIP GMD GNF GTQ GYD HKD HNL HTG HUF IDR ILS INR
+    IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT LAK LBP LKR
+    LRD LSL LYD MDL MGA MKD MMK MNT MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO
+    NOK NPR NZD OMR PAB PGK PHP PKR PLN PYG QAR RSD RUB RWF SAR SBD SCR SDG
+    SEK SGD SHP SLE SRD SSP STN SVC SYP SZL THB TJS TMT TND TTD TWD TZS UAH
+    UGX USD UYU UZS VES VND VUV WST XAF XCD XOF XPF YER ZAR ZMW ZWL
+""".split())
+# Codes that are also English words only count when written in capitals ("5 TOP", not "5 top beaches")
+ISO_CURRENCY_WORD_CODES = {"ALL", "BAM", "BOB", "CUP", "GEL", "MAD", "MOP", "PEN", "RON", "SOS", "TOP", "TRY", "ANG"}
+
+# Currency symbols written before the amount
+currency_symbols = {'$': 'USD', 'us$': 'USD', '₹': 'INR', '£': 'GBP', '€': 'EUR', '¥': 'JPY', '฿': 'THB', 'rs.': 'LKR', 'rs': 'LKR'}
+
+def _trie_pattern(words) -> str:
+    """
+    Regex alternation of words built as a character trie, so a match costs
+    the length of the word rather than a test per word. Longer words are
+    tried first, which gives longest-match semantics.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        ends_here = '' in node
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if ends_here else '')
+
+    return build(trie)
+
+# "1,500", "50000", "49.99"; not the tail of a longer number
+_AMOUNT = r'(?<![\d.,])(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)'
+_BUDGET_WORD = r'(?i:(budget)\s*(?:is|of|:)?\s*)?'
+# "budget is 50000 sri lankan rupees", "1,000 usd", "200 TRY"
+_CURRENCY_AMOUNT_PATTERN = re.compile(
+    _BUDGET_WORD + _AMOUNT + r'\s*(?:(?i:(' + _trie_pattern(list(currency_names) + [code.lower() for code in ISO_CURRENCY_CODES])
+    + r'))|(' + _trie_pattern(ISO_CURRENCY_WORD_CODES) + r'))\b'
+)
+# "$500", "Rs. 50,000", "LKR 50000"
+_PREFIXED_AMOUNT_PATTERN = re.compile(
+    _BUDGET_WORD + r'(?<![a-zA-Z])(?i:(' + _trie_pattern(list(currency_symbols) + [code.lower() for code in ISO_CURRENCY_CODES])
+    + r'))\s*' + _AMOUNT
+)
+
 def parse_budget_from_text(text: str) -> str:
     """
     Enhanced budget parser that handles various natural language formats.
     Returns budget in "AMOUNT CURRENCY_CODE" format or "null" if not found.
+    An amount introduced by "budget" wins over one mentioned earlier, and
+    "50000 LKR" forms win over "$500" and "LKR 50000".
     """
-    
-    # Currency mappings - both full names and codes
-    currency_mappings = {
-        # Full currency names to codes
-        'sri lankan rupees': 'LKR',
-        'sri lankan rupee': 'LKR',
-        'lankan rupees': 'LKR',
-        'rupees': 'LKR',  # Default rupees to LKR unless context suggests otherwise
-        'indian rupees': 'INR', 
-        'indian rupee': 'INR',
-        'us dollars': 'USD',
-        'us dollar': 'USD',
-        'american dollars': 'USD',
-        'dollars': 'USD',
-        'british pounds': 'GBP',
-        'pounds sterling': 'GBP',
-        'pounds': 'GBP',
-        'euros': 'EUR',
-        'euro': 'EUR',
-        'japanese yen': 'JPY',
-        'yen': 'JPY',
-        'thai baht': 'THB',
-        'baht': 'THB',
-        'australian dollars': 'AUD',
-        'canadian dollars': 'CAD',
-        'singapore dollars': 'SGD',
-        'swiss francs': 'CHF',
-        'south african rand': 'ZAR',
-        'rand': 'ZAR',
-        
-        # Currency codes (already in correct format)
-        'lkr': 'LKR',
-        'inr': 'INR', 
-        'usd': 'USD',
-        'gbp': 'GBP',
-        'eur': 'EUR',
-        'jpy': 'JPY',
-        'thb': 'THB',
-        'aud': 'AUD',
-        'cad': 'CAD',
-        'sgd': 'SGD',
-        'chf': 'CHF',
-        'zar': 'ZAR',
+    matches = list(_CURRENCY_AMOUNT_PATTERN.finditer(text))
+    if matches:
+        match = next((m for m in matches if m.group(1)), matches[0])
+        currency = match.group(3) or match.group(4)
+        code = currency_names.get(currency.lower()) or currency.upper()
+        return f"{match.group(2).replace(',', '')} {code}"
+
+    matches = list(_PREFIXED_AMOUNT_PATTERN.finditer(text))
+    if matches:
+        match = next((m for m in matches if m.group(1)), matches[0])
+        prefix = match.group(2).lower()
+        return f"{match.group(3).replace(',', '')} {currency_symbols.get(prefix) or prefix.upper()}"
+
+    return "null"
+
+# --- Rule-based trip details extraction ---
+# The JSON the setup crew produces; "null" marks a field that is still unknown
+TRIP_DETAIL_FIELDS = ["location", "interests", "budget", "num_people", "travel_dates", "preferred_currency"]
+# Fields that have to come from the user; interests and currency have defaults
+REQUIRED_TRIP_DETAILS = ["location", "budget", "num_people", "travel_dates"]
+
+_NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+}
+_PARTY_SIZE_PATTERNS = [
+    # "5 people", "two adults", "3 of us"
+    re.compile(r'\b(\d{1,3}|' + '|'.join(_NUMBER_WORDS) + r')\s+(?:people|persons?|adults|travell?ers|guests|pax|friends|of us)\b'),
+    # "family of 4", "group of six"
+    re.compile(r'\b(?:family|group|party)\s+of\s+(\d{1,3}|' + '|'.join(_NUMBER_WORDS) + r')\b'),
+]
+_SOLO_PATTERN = re.compile(r'\b(?:solo|just me|by myself|alone)\b')
+# Words before a place that make it the trip's destination, and ones that make it the user's home
+_DESTINATION_WORDS = r'(?:to|visit|visiting|explore|exploring|see|seeing|tour|touring|around|in|at)'
+_ORIGIN_WORDS = r'(?:from|(?:live|lives|living|based|reside|resides|residing)\s+in)'
+
+@lru_cache(maxsize=1)
+def _gazetteer_pattern() -> re.Pattern | None:
+    """Matches any gazetteer place name as whole words, preferring the longest."""
+    names = load_gazetteer()
+    if not names:
+        return None
+    return re.compile(r'\b(' + _trie_pattern(names) + r')\b')
+
+@lru_cache(maxsize=1)
+def _destination_pattern() -> re.Pattern | None:
+    """
+    Matches a list of gazetteer places ("kandy, ella and galle") after a
+    destination or origin word; group 1 is set for origins.
+    """
+    names = load_gazetteer()
+    if not names:
+        return None
+    place = r'(?:the\s+)?(?:' + _trie_pattern(names) + r')\b'
+    return re.compile(rf'\b(?:({_ORIGIN_WORDS})|{_DESTINATION_WORDS})\s+({place}(?:(?:\s*,\s*|\s+and\s+|\s*&\s*){place})*)')
+
+def _extract_location(text: str) -> str:
+    pattern = _destination_pattern()
+    if pattern is None:
+        return "null"
+    # Only places introduced as where the trip goes count; "Ella" alone may well be a person
+    places = {
+        place.group(1)
+        for match in pattern.finditer(text) if not match.group(1)
+        for place in _gazetteer_pattern().finditer(match.group(2))
     }
-    
-    # Clean and normalize the text
-    text_lower = text.lower().strip()
-    
-    # Remove commas and extra spaces from numbers
-    text_normalized = re.sub(r'(\d+)\s*,?\s*(\d+)', r'\1\2', text_lower)
-    
-    # Pattern 1: "budget is X currency" or "X currency budget"
-    patterns = [
-        # "budget is 50000 sri lankan rupees"
-        r'budget\s+is\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
-        # "50000 sri lankan rupees budget" or "50000 sri lankan rupees"
-        r'(\d+(?:\s*,?\s*\d+)*)\s+(.+?)\s*(?:budget|$)',
-        # "budget of 50000 indian rupees"
-        r'budget\s+of\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
-        # "my budget is 50000 rupees"
-        r'my\s+budget\s+is\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
-        # "the budget is 50000 LKR"
-        r'the\s+budget\s+is\s+(\d+(?:\s*,?\s*\d+)*)\s+(.+?)(?:\s|$)',
-        # Just "50000 LKR" format
-        r'(\d+(?:\s*,?\s*\d+)*)\s+([a-z]{3})(?:\s|$)',
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, text_normalized)
-        for match in matches:
-            amount_str = match.group(1)
-            currency_str = match.group(2).strip()
-            
-            # Clean the amount (remove spaces and commas)
-            amount_clean = re.sub(r'[,\s]', '', amount_str)
-            
-            # Try to match the currency
-            currency_code = None
-            
-            # Direct lookup
-            if currency_str in currency_mappings:
-                currency_code = currency_mappings[currency_str]
-            else:
-                # Fuzzy matching for partial matches
-                for currency_name, code in currency_mappings.items():
-                    if currency_name in currency_str or currency_str in currency_name:
-                        currency_code = code
-                        break
-            
-            if currency_code and amount_clean.isdigit():
-                return f"{amount_clean} {currency_code}"
-    
-    # Pattern 2: Look for currency symbols
-    symbol_patterns = [
-        (r'\$(\d+(?:,\d+)*)', 'USD'),  # $50000
-        (r'₹(\d+(?:,\d+)*)', 'INR'),   # ₹50000
-        (r'£(\d+(?:,\d+)*)', 'GBP'),   # £50000
-        (r'€(\d+(?:,\d+)*)', 'EUR'),   # €50000
-    ]
-    
-    for pattern, currency in symbol_patterns:
-        match = re.search(pattern, text)
+    if len(places) != 1:
+        return "null"
+    place = load_gazetteer()[places.pop()]
+    return f"{place['name']}, {place['country']}"
+
+def _extract_num_people(text: str) -> str:
+    for pattern in _PARTY_SIZE_PATTERNS:
+        match = pattern.search(text)
         if match:
-            amount = re.sub(r'[,\s]', '', match.group(1))
-            return f"{amount} {currency}"
-    
+            count = match.group(1)
+            return str(_NUMBER_WORDS.get(count) or int(count))
+    if _SOLO_PATTERN.search(text):
+        return "1"
     return "null"
 
+def _extract_travel_dates(text: str) -> str:
+    dates = parse_flexible_dates(text)
+    if dates != text:
+        return dates
+    if _FLEXIBLE_DATES_PATTERN.search(text):
+        return "flexible"
+    return "null"
+
+def extract_trip_details(prompt: str) -> dict:
+    """
+    Fills the setup crew's trip details JSON from the prompt with rules only:
+    the gazetteer for the location, parse_budget_from_text, parse_flexible_dates
+    and country_to_currency. Fields that cannot be read reliably are "null".
+    """
+    text = " ".join(prompt.lower().split())
+    location = _extract_location(text)
+    return {
+        "location": location,
+        "interests": prompt.strip() or "null",
+        "budget": parse_budget_from_text(prompt),
+        "num_people": _extract_num_people(text),
+        "travel_dates": _extract_travel_dates(text),
+        "preferred_currency": trip_currencies(location, "")[0] if location != "null" else "null",
+    }
+
+def missing_trip_details(details: dict) -> list[str]:
+    """Required fields that are still unknown; empty when the planning crew can start."""
+    return [field for field in REQUIRED_TRIP_DETAILS if str(details.get(field) or "null").lower() == "null"]
+
+# What the user is asked for each required field the prompt left out
+TRIP_DETAIL_QUESTIONS = {
+    "location": "Where would you like to travel?",
+    "budget": "What is your budget for the trip? (e.g. 50000 LKR or 800 USD)",
+    "num_people": "How many people will be traveling?",
+    "travel_dates": "What are your preferred travel dates? (You can say 'flexible' if you don't have specific dates)",
+}
+_COUNT_ANSWER_PATTERN = re.compile(r'^(?:we are |we\'re )?(\d{1,3}|' + '|'.join(_NUMBER_WORDS) + r')\.?$')
+
+def fill_trip_detail(details: dict, field: str, answer: str) -> dict:
+    """
+    details with field read from the user's answer to TRIP_DETAIL_QUESTIONS[field].
+    The field stays "null" when the rules cannot read the answer reliably.
+    """
+    text = " ".join(answer.lower().split())
+    if field == "location":
+        # The question already says where to, so the answer needs no destination word
+        value = _extract_location(f"to {text}")
+    elif field == "num_people":
+        value = _extract_num_people(text)
+        match = _COUNT_ANSWER_PATTERN.match(text)
+        if value == "null" and match:
+            value = str(_NUMBER_WORDS.get(match.group(1)) or int(match.group(1)))
+    elif field == "budget":
+        value = parse_budget_from_text(answer)
+    else:
+        value = _extract_travel_dates(text)
+
+    filled = dict(details)
+    filled[field] = value
+    if field == "location" and value != "null" and str(filled.get("preferred_currency") or "null") == "null":
+        filled["preferred_currency"] = trip_currencies(value, "")[0]
+    return filled
+
+def merge_trip_details(details: dict, prefilled: dict) -> dict:
+    """details (e.g. the setup agent's answer) with its unknown fields taken from prefilled."""
+    merged = dict(prefilled)
+    merged.update({key: value for key, value in details.items() if str(value or "null").lower() != "null"})
+    return merged
+
 def calculate_nights(dates: str) -> int:
     """Calculates the number of nights for a given date range."""
     try:
@@ -451,8 +905,160 @@ def extract_json_from_response(response_text: str) -> dict:
         print(f"Attempted to parse: {cleaned_text}")
         raise        
 
-def create_setup_crew(initial_prompt: str, conversation_history=None):
-    """Creates the crew responsible for gathering user requirements."""
+def _local_data_jobs(location: str, travel_dates: str, currencies: list[str]) -> dict:
+    """The HTTP lookups behind the Local Data agent, as {name: (function, args)}."""
+    jobs = {f"rate:{code}": (get_conversion_rate, ('USD', code)) for code in dict.fromkeys(currencies)}
+    if travel_dates.lower() != 'flexible':
+        try:
+            start_date, end_date = [part.strip() for part in travel_dates.split(' to ')]
+            city = location.split(',')[0].strip()
+            jobs["weather"] = (get_weather_forecast, (city, start_date, end_date))
+        except ValueError:
+            pass
+    return jobs
+
+def format_local_data(results: dict) -> str:
+    """
+    Formats the results of the local data lookups for the agents' task descriptions.
+    A lookup that raised is reported as unavailable instead of failing the rest.
+    """
+    lines = []
+    for name, value in results.items():
+        if not name.startswith("rate:"):
+            continue
+        code = name.split(":", 1)[1]
+        if code == 'USD':
+            continue
+        if value and not isinstance(value, Exception):
+            lines.append(f"Currency conversion rate: 1 USD = {value} {code}")
+        else:
+            lines.append(f"Currency conversion rate from USD to {code} is currently unavailable.")
+    if isinstance(results.get("weather"), Exception):
+        lines.append(f"The weather forecast is currently unavailable ({results['weather']}). Use general seasonal knowledge instead.")
+    elif "weather" in results:
+        lines.append(results["weather"])
+    else:
+        lines.append("No specific travel dates were given, so no weather forecast was fetched. Use general seasonal knowledge instead.")
+    return "\n".join(lines)
+
+def fetch_local_data(location: str, travel_dates: str, currencies: list[str]) -> str:
+    """Fetches the weather forecast and the USD exchange rates in parallel, without an LLM hop."""
+    jobs = _local_data_jobs(location, travel_dates, currencies)
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {name: pool.submit(func, *args) for name, (func, args) in jobs.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+        return format_local_data(results)
+
+async def fetch_local_data_async(location: str, travel_dates: str, currencies: list[str]) -> str:
+    """Awaitable version of fetch_local_data."""
+    jobs = _local_data_jobs(location, travel_dates, currencies)
+    values = await asyncio.gather(*(asyncio.to_thread(func, *args) for func, args in jobs.values()), return_exceptions=True)
+    return format_local_data(dict(zip(jobs, values)))
+
+def clean_markdown_output(raw_result: str) -> str:
+    """Removes the ```markdown code fence the concierge tends to wrap its report in."""
+    cleaned_result = re.sub(r'^```markdown\n', '', raw_result)
+    cleaned_result = re.sub(r'```$', '', cleaned_result)
+    return cleaned_result.strip()
+
+class MarkdownFenceStripper:
+    """
+    Incremental version of clean_markdown_output for text that arrives in chunks.
+    The head is held back until it is clear whether it opens a ```markdown fence,
+    and trailing whitespace/backticks are held back until more text or finish().
+    """
+    OPENING_FENCE = "```markdown\n"
+
+    def __init__(self):
+        self._head = ""
+        self._head_done = False
+        self._tail = ""
+
+    def feed(self, chunk: str) -> str:
+        if not self._head_done:
+            self._head += chunk
+            head = self._head.lstrip()
+            if not head or (len(head) < len(self.OPENING_FENCE) and self.OPENING_FENCE.startswith(head)):
+                return ""
+            self._head_done = True
+            if head.startswith(self.OPENING_FENCE):
+                head = head[len(self.OPENING_FENCE):].lstrip()
+            chunk = head
+
+        text = self._tail + chunk
+        match = re.search(r'[\s`]*$', text)
+        self._tail = text[match.start():]
+        return text[:match.start()]
+
+    def finish(self) -> str:
+        if not self._head_done:
+            return clean_markdown_output(self._head.lstrip())
+        return re.sub(r'```$', '', self._tail).rstrip()
+
+class FinalAnswerStream:
+    """
+    Follows the streamed output of a ReAct-style agent and forwards only the text
+    of its Final Answer, cleaned with MarkdownFenceStripper, to on_chunk.
+    Tool-using turns never reach the "Final Answer:" marker and are dropped.
+    If a new LLM call starts after text has already been forwarded (a retry),
+    on_reset is called so the consumer can discard what it has shown.
+    """
+    MARKER = "Final Answer:"
+
+    def __init__(self, on_chunk, on_reset=None):
+        self._on_chunk = on_chunk
+        self._on_reset = on_reset
+        self._lock = threading.Lock()
+        self._emitted = False
+        self.start_call()
+
+    def start_call(self):
+        with self._lock:
+            if self._emitted and self._on_reset:
+                self._on_reset()
+            self._emitted = False
+            self._buffer = ""
+            self._in_answer = False
+            self._stripper = MarkdownFenceStripper()
+
+    def feed(self, chunk: str):
+        with self._lock:
+            if not self._in_answer:
+                self._buffer += chunk
+                marker_index = self._buffer.find(self.MARKER)
+                if marker_index == -1:
+                    return
+                self._in_answer = True
+                chunk = self._buffer[marker_index + len(self.MARKER):]
+                self._buffer = ""
+            self._emit(self._stripper.feed(chunk))
+
+    def finish(self):
+        with self._lock:
+            if self._in_answer:
+                self._emit(self._stripper.finish())
+
+    def _emit(self, text: str):
+        if text:
+            self._emitted = True
+            self._on_chunk(text)
+
+def create_setup_crew(initial_prompt: str, conversation_history=None, human_input=None, prefilled: Optional[dict] = None):
+    """
+    Creates the crew responsible for gathering user requirements.
+    If human_input is given, the agent asks its questions through that callback
+    instead of the console-based human_input_tool. prefilled holds the details
+    already extracted by extract_trip_details(), so the agent only asks for the rest.
+    """
+    _import_crewai()
+    from crewai import Agent, Task, Crew
+
+    input_tool = create_human_input_tool(human_input) if human_input else _crew_tools()["human_input_tool"]
     llmpro = initialize_llmPro() # Use a fast and reliable LLM for conversation
 
     current_date = datetime.now().strftime('%Y-%m-%d')
@@ -476,13 +1082,15 @@ def create_setup_crew(initial_prompt: str, conversation_history=None):
                   "until you have all the information needed to create a travel plan. "
                   "You carefully track all information provided by the user and never ask "
                   "for information that has already been provided.",
-        tools=[human_input_tool],
+        tools=[input_tool],
         llm=llmpro,
         verbose=False
     )
 
-    # Pre-parse the budget using our enhanced function
-    parsed_budget = parse_budget_from_text(initial_prompt)
+    # Start from what the rule-based extractor could already read from the prompt
+    if prefilled is None:
+        prefilled = extract_trip_details(initial_prompt)
+    prefilled_json = json.dumps({field: prefilled.get(field, "null") for field in TRIP_DETAIL_FIELDS}, indent=2)
 
     # Enhanced task with better date handling
     setup_task = Task(
@@ -495,15 +1103,9 @@ def create_setup_crew(initial_prompt: str, conversation_history=None):
         {history_text}
 
         **STEP 1 - ANALYZE AND EXTRACT (DO THIS FIRST):**
-        Carefully read the initial prompt above and extract information to pre-fill this JSON:
-        {{
-          "location": "null",
-          "interests": "null", 
-          "budget": "null",
-          "num_people": "null",
-          "travel_dates": "null",
-          "preferred_currency": "null"
-        }}
+        Carefully read the initial prompt above and extract information to pre-fill this JSON.
+        Fields that are not "null" were already read from the prompt by a parser; keep them unless the user says otherwise:
+        {prefilled_json}
 
         From the prompt "{initial_prompt}", you should be able to extract:
         - Location: Look for place names (e.g., "mirissa" → "Mirissa, Sri Lanka")
@@ -591,8 +1193,115 @@ def create_setup_crew(initial_prompt: str, conversation_history=None):
         verbose=False
     )
 
-def invoke_agent(location, interests, budget, num_people, travel_dates, preferred_currency, chat_history: Optional[str] = None):
-    """Invokes the travel agent with the given inputs."""
+def trip_currencies(location: str, preferred_currency: str) -> tuple[str, str]:
+    """Returns (local currency of the destination, currency the report should use)."""
+    country = location.split(',')[-1].strip()
+    local_currency = country_to_currency.get(country, 'USD')
+    target_currency = preferred_currency if preferred_currency else local_currency
+    return local_currency, target_currency
+
+@contextmanager
+def _report_streaming(concierge_llm, report_stream):
+    """Routes the concierge LLM's stream to report_stream while the crew runs."""
+    if report_stream is None:
+        yield
+        return
+    follow_llm_stream(concierge_llm, report_stream)
+    try:
+        yield
+    finally:
+        unfollow_llm_stream(concierge_llm)
+    report_stream.finish()
+
+def _check_crew_result(result):
+    if hasattr(result, 'raw') and isinstance(result.raw, str):
+        return result
+    else:
+        # If the result is not in the expected format, return an error string
+        print(f"Error: Unexpected result format. Type: {type(result)}, Value: {result}")
+        return "Error: The travel agent returned an unexpected result format."
+
+def invoke_agent(location, interests, budget, num_people, travel_dates, preferred_currency, chat_history: Optional[str] = None, task_callback=None, on_report_chunk=None, on_report_reset=None, prefetch: bool = PREFETCH_LOCAL_DATA, session_id: Optional[str] = None):
+    """
+    Invokes the travel agent with the given inputs.
+    With prefetch, the weather forecast and exchange rates are fetched directly and in
+    parallel instead of by the Local Data agent, saving one LLM round-trip per plan.
+    If task_callback is given, it is called with each task's TaskOutput as soon as that task finishes.
+    If on_report_chunk is given, the concierge's final report is streamed to it
+    token by token (already stripped of its markdown fence) while it is generated.
+    """
+    local_data = None
+    if prefetch:
+        local_data = fetch_local_data(location, travel_dates, list(trip_currencies(location, preferred_currency)))
+
+    planned = build_travel_crew(
+        location, interests, budget, num_people, travel_dates, preferred_currency,
+        chat_history=chat_history, task_callback=task_callback,
+        on_report_chunk=on_report_chunk, on_report_reset=on_report_reset, local_data=local_data,
+        session_id=session_id,
+    )
+    if planned is None:
+        return
+    travel_crew, report_scope = planned
+
+    # Kick off the crew's work!
+    with report_scope:
+        result = travel_crew.kickoff()
+    return _check_crew_result(result)
+
+# crewAI crews are synchronous, and so are the tool calls they make, so each crew
+# holds a thread for as long as it runs, including while a setup crew waits for the
+# user. They get their own pool so they can never use up the loop's default executor
+# that short I/O calls go through. At most MAX_RUNNING_JOBS crews run and
+# MAX_PARKED_JOBS setup crews wait at a time, which is the real limit on concurrent
+# crews; sessions waiting for the trip detail questions asked from the event loop
+# hold no thread.
+CREW_WORKER_THREADS = int(os.getenv("CREW_WORKER_THREADS", str(MAX_RUNNING_JOBS + MAX_PARKED_JOBS)))
+crew_executor = ThreadPoolExecutor(max_workers=CREW_WORKER_THREADS, thread_name_prefix="crew")
+
+async def kickoff_in_crew_pool(crew):
+    """Like crew.kickoff_async(), but runs the crew on crew_executor."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(crew_executor, context.run, crew.kickoff)
+
+async def invoke_agent_async(location, interests, budget, num_people, travel_dates, preferred_currency, chat_history: Optional[str] = None, task_callback=None, on_report_chunk=None, on_report_reset=None, prefetch: bool = PREFETCH_LOCAL_DATA, session_id: Optional[str] = None):
+    """
+    Awaitable version of invoke_agent: the local data is fetched concurrently and
+    the crew runs on crew_executor, so the event loop is never blocked.
+    """
+    local_data = None
+    if prefetch:
+        local_data = await fetch_local_data_async(location, travel_dates, list(trip_currencies(location, preferred_currency)))
+
+    planned = await asyncio.to_thread(
+        build_travel_crew,
+        location, interests, budget, num_people, travel_dates, preferred_currency,
+        chat_history=chat_history, task_callback=task_callback,
+        on_report_chunk=on_report_chunk, on_report_reset=on_report_reset, local_data=local_data,
+        session_id=session_id,
+    )
+    if planned is None:
+        return
+    travel_crew, report_scope = planned
+
+    with report_scope:
+        result = await kickoff_in_crew_pool(travel_crew)
+    return _check_crew_result(result)
+
+def build_travel_crew(location, interests, budget, num_people, travel_dates, preferred_currency, chat_history: Optional[str] = None, task_callback=None, on_report_chunk=None, on_report_reset=None, local_data: Optional[str] = None, session_id: Optional[str] = None):
+    """
+    Builds the planning crew for a trip. Returns (crew, report_scope), where
+    report_scope is a context manager to run the kickoff in, or None if the
+    budget is malformed. local_data is the prefetched weather/currency summary;
+    without it the Local Data agent fetches that information itself. The crew's
+    web searches count against session_id's search budget.
+    """
+    _import_crewai()
+    from crewai import Agent, Task, Crew, Process
+    from search_cache import create_search_tool
+
+    tools = _crew_tools()
+    local_currency, target_currency = trip_currencies(location, preferred_currency)
 
     budget_in_usd = float('inf') # Default to infinite budget if flexible
     budget_instruction = "The user has not specified a budget. Suggest a range of options from budget-friendly to luxury."
@@ -614,11 +1323,6 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
         
         budget_instruction = f"The total available budget is {budget_in_usd:.2f} USD. All suggested activities and accommodation must fit within this budget and should be **CLOSE** and MUST BE LESS THAN OR EQUAL to the budget."
 
-    # Determine local currency
-    country = location.split(',')[-1].strip()
-    local_currency = country_to_currency.get(country, 'USD')
-    target_currency = preferred_currency if preferred_currency else local_currency
-
     # Determine if accommodation is needed
     # Calculate the number of nights
     num_nights = 0
@@ -651,22 +1355,32 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
         Use this history to understand the user's new request. For example, if they ask to "change the hotel," you know to find a new hotel while keeping other details the same. If they ask for "more options," provide alternatives to what was previously suggested.
         """
 
-    # Agent 1: Local Data Agent
-    local_data_agent = Agent(
-        role="Local Data Specialist",
-        goal="Fetch weather and currency data for the travel destination.",
-        backstory="An analyst providing real-time travel insights.",
-        tools=[open_meteo_weather_tool, currency_conversion_tool],
-        llm=llm1_model,
-        verbose=False
-    )
+    # --- Local data already fetched in prefetch mode ---
+    local_data_context = ""
+    if local_data:
+        local_data_context = f"""
+        **LOCAL DATA (real-time weather forecast and currency conversion rates):**
+        {local_data}
+        """
+
+    # Agent 1: Local Data Agent (not needed when the data was prefetched)
+    local_data_agent = None
+    if not local_data:
+        local_data_agent = Agent(
+            role="Local Data Specialist",
+            goal="Fetch weather and currency data for the travel destination.",
+            backstory="An analyst providing real-time travel insights.",
+            tools=[tools["open_meteo_weather_tool"], tools["currency_conversion_tool"]],
+            llm=llm1_model,
+            verbose=False
+        )
 
     # Agent 2: Web Search Agent (City Expert)
     city_expert_agent = Agent(
         role='Expert City Researcher',
         goal='Efficiently find a specific number of activities and accommodation within a budget.',
         backstory='A travel enthusiast who finds the best spots tailored to your needs, focusing on speed and accuracy.',
-        tools=[search_tool],
+        tools=[create_search_tool(session_id)],  # cached across sessions, limited searches per session
         llm=llm_model,
         verbose=False,
         max_iter=15,  # Hard limit on the number of execution loops (thinking -> tool -> observation)
@@ -684,13 +1398,20 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
         verbose=False
     )
 
+    # The concierge gets its own streaming LLM when the caller wants the report live
+    concierge_llm = llm1_model
+    report_stream = None
+    if on_report_chunk:
+        concierge_llm = initialize_streaming_llm()
+        report_stream = FinalAnswerStream(on_report_chunk, on_report_reset)
+
     # Agent 4: Travel Concierge Agent
     travel_concierge_agent = Agent(
         role='Head Travel Concierge',
         goal='Synthesize all gathered information into a cohesive, beautifully formatted travel itinerary with weather insights and converted costs.',
         backstory='A world-class concierge from a five-star hotel, known for creating personalized and delightful travel experiences. You are meticulous about financial accuracy and ensure all currency conversions are precise and consistent',
-        tools=[currency_conversion_tool],  # Added for cost conversion
-        llm=llm1_model,
+        tools=[tools["currency_conversion_tool"]],  # Added for cost conversion
+        llm=concierge_llm,
         allow_delegation=False,
         verbose=False
     )
@@ -698,17 +1419,22 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
     print("Agents defined successfully.")
 
     # Task 1: Get local data (weather forecast and currency conversion)
-    task_get_local_data = Task(
-        description=f"""Fetch the currency conversion rate from USD to the local currency for {location}.
-        {weather_tool_usage_instruction}
-        {history_context}
-        """,
-        expected_output="A summary of the weather forecast for the specified dates and the USD to local currency conversion rate.",
-        agent=local_data_agent
-    )
+    task_get_local_data = None
+    if local_data_agent:
+        task_get_local_data = Task(
+            name="get_local_data",
+            description=f"""Fetch the currency conversion rate from USD to the local currency for {location}.
+            {weather_tool_usage_instruction}
+            {history_context}
+            """,
+            expected_output="A summary of the weather forecast for the specified dates and the USD to local currency conversion rate.",
+            agent=local_data_agent
+        )
+    local_data_tasks = [task_get_local_data] if task_get_local_data else []
 
     # Task 2: Find city information
     task_find_city_info = Task(
+        name="find_city_info",
         description=f"""
         For a group of {num_people} people traveling to {location} with interests in '{interests}'.
 
@@ -718,6 +1444,7 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
         {accommodation_instruction}
 
         {history_context}
+        {local_data_context}
 
         **IMPORTANT CONTEXT USAGE:** You will receive context from a data specialist that includes a real-time currency conversion rate. If you find prices online in a local currency (e.g., INR, LKR), you **must use the precise conversion rate provided in your context** to convert them to USD for your analysis and final JSON output. This is more accurate than using your general knowledge.
 
@@ -749,11 +1476,12 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
         '{"items": [{"type": "accommodation", "name": "Mirissa Beach Villa", "description": "A beautiful villa with a pool for 4 guests.", "cost_usd": 150, "link": "https://example.com/villa"}, {"type": "activity", "name": "Whale Watching Tour", "description": "A 4-hour whale watching excursion.", "cost_usd": 80, "link": "https://example.com/whale-watching"}], "total_estimated_cost_usd": 230}'
         """,
         agent=city_expert_agent,
-        context=[task_get_local_data]
+        context=local_data_tasks
     )
 
     # Task 3: Verify the budget
     task_verify_budget = Task(
+        name="verify_budget",
         description=f"""Analyze the research from the city expert.
         {budget_instruction}
         Calculate what 80% of the budget would be (0.8 * {budget_in_usd} = {0.8 * budget_in_usd} USD).
@@ -773,6 +1501,7 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
 
     # Task 4: Compile the final report
     task_compile_report = Task(
+        name="compile_report",
         description=f"""
         Create a final, human-readable travel itinerary for {num_people} people for a trip to {location}.
 
@@ -804,11 +1533,12 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
         11.  Format the entire output as a beautiful and exciting markdown report. Display all final costs ONLY in {target_currency}.
 
         **VERY IMPORTANT: DO NOT PROVIDE THE CONVERSION RATE IN THE REPORT.**
+        {local_data_context}
         """,
 
         expected_output=f"A complete, beautifully formatted markdown report with a travel plan, budget analysis, and weather/seasonal insights. All costs must be in {target_currency} and must not show any calculations.",
         agent=travel_concierge_agent,
-        context=[task_verify_budget, task_get_local_data, task_find_city_info]
+        context=[task_verify_budget, *local_data_tasks, task_find_city_info]
     )
 
     print("Tasks created successfully.")
@@ -817,22 +1547,14 @@ def invoke_agent(location, interests, budget, num_people, travel_dates, preferre
 
     # Create the Crew
     travel_crew = Crew(
-        agents=[local_data_agent, city_expert_agent, budget_verifier_agent, travel_concierge_agent],
-        tasks=[task_get_local_data, task_find_city_info, task_verify_budget, task_compile_report],
+        agents=[agent for agent in [local_data_agent, city_expert_agent, budget_verifier_agent, travel_concierge_agent] if agent],
+        tasks=[*local_data_tasks, task_find_city_info, task_verify_budget, task_compile_report],
         process=Process.sequential,
+        task_callback=task_callback,
         verbose=False
     )
 
-    # Kick off the crew's work!
-    result = travel_crew.kickoff()
-
-
-    if hasattr(result, 'raw') and isinstance(result.raw, str):
-        return result
-    else:
-        # If the result is not in the expected format, return an error string
-        print(f"Error: Unexpected result format. Type: {type(result)}, Value: {result}")
-        return "Error: The travel agent returned an unexpected result format."
+    return travel_crew, _report_streaming(concierge_llm, report_stream)
 
 # invoke_agent("Mirissa, Sri Lanka", "entertainment, beach and affordable villa with pool. we need lunch dinner breakfast to eat in an affordable way", "32000 LKR", 4, "2025-08-05 to 2025-08-06", "")
 
@@ -845,20 +1567,23 @@ def run_travel_chatbot(initial_prompt=None):
         print("Please describe your travel plans (destination, dates, interests, budget, etc.):")
         initial_prompt = input("> ")
     
-    # 2. Run the Setup Crew to gather all details - PASS THE PROMPT DIRECTLY
-    setup_crew = create_setup_crew(initial_prompt)
-    
-    # The kickoff method returns a CrewOutput object, not a string
-    trip_details_output = setup_crew.kickoff()
-    
-    print("\n--- Trip Details Gathered ---")
-    # Access the raw string from the CrewOutput object using the .raw attribute
-    trip_details_json_str = trip_details_output.raw 
-    print(trip_details_json_str)
-    print("---------------------------\n")
+    # 2. Read what we can from the prompt and run the Setup Crew only for missing details
+    prefilled = extract_trip_details(initial_prompt)
     try:
-        # 3. Parse the details and run the main planning crew
-        details = extract_json_from_response(trip_details_json_str)
+        if missing_trip_details(prefilled):
+            setup_crew = create_setup_crew(initial_prompt, prefilled=prefilled)
+            
+            # The kickoff method returns a CrewOutput object, not a string
+            trip_details_output = setup_crew.kickoff()
+            
+            # 3. Parse the details and run the main planning crew
+            details = merge_trip_details(extract_json_from_response(trip_details_output.raw), prefilled)
+        else:
+            details = prefilled
+        
+        print("\n--- Trip Details Gathered ---")
+        print(json.dumps(details))
+        print("---------------------------\n")
         
         invoke_agent(
             location=details['location'],
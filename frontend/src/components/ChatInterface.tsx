@@ -20,6 +20,9 @@ interface ChatInterfaceProps {
   newMessage: string;
   setNewMessage: (value: string) => void;
   handleSendMessage: () => void;
+  hasEarlierMessages?: boolean;
+  isLoadingEarlier?: boolean;
+  onLoadEarlier?: () => void;
 }
 
 export const ChatInterface = ({
@@ -28,10 +31,18 @@ export const ChatInterface = ({
   newMessage,
   setNewMessage,
   handleSendMessage,
+  hasEarlierMessages = false,
+  isLoadingEarlier = false,
+  onLoadEarlier,
 }: ChatInterfaceProps) => {
   const scrollAreaRef = useRef<HTMLDivElement>(null);
+  const lastMessageIdRef = useRef<string | undefined>(undefined);
   
   useEffect(() => {
+    // Only follow new messages at the bottom; prepending earlier ones keeps the position
+    const lastMessageId = messages[messages.length - 1]?.id;
+    if (lastMessageId === lastMessageIdRef.current && !isLoading) return;
+    lastMessageIdRef.current = lastMessageId;
     if (scrollAreaRef.current) {
       // @ts-ignore
       const scrollableView = scrollAreaRef.current.querySelector('div[data-radix-scroll-area-viewport]');
@@ -63,6 +74,13 @@ export const ChatInterface = ({
       {/* @ts-ignore */}
       <ScrollArea className="flex-1 p-4" ref={scrollAreaRef}>
         <div className="space-y-4">
+          {hasEarlierMessages && onLoadEarlier && (
+            <div className="flex justify-center">
+              <Button variant="ghost" size="sm" onClick={onLoadEarlier} disabled={isLoadingEarlier}>
+                {isLoadingEarlier ? "Loading..." : "Load earlier messages"}
+              </Button>
+            </div>
+          )}
           {messages.map((message) => (
             <div
               key={message.id}
@@ -3,6 +3,10 @@ import { ChatSidebar } from "@/components/ChatSidebar";
 import { ChatInterface } from "@/components/ChatInterface";
 
 const API_BASE_URL = "http://localhost:8000";
+// Messages loaded per page when opening a past conversation
+const MESSAGE_PAGE_SIZE = 30;
+// Interval of the /chatbot/status fallback, polled only while the event stream is unavailable
+const STATUS_POLL_INTERVAL_MS = 3000;
 
 // Helper to generate a simple UUID on the frontend
 function uuidv4() {
@@ -47,7 +51,18 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
   const [sessionId, setSessionId] = useState<string | null>(null);
   const [chatHistory, setChatHistory] = useState<ChatHistoryItem[]>([]);
   const [isLoadingHistory, setIsLoadingHistory] = useState(true);
+  const [earlierCursor, setEarlierCursor] = useState<string | null>(null);
+  const [isLoadingEarlier, setIsLoadingEarlier] = useState(false);
+  // Progress of the running session arrives on an EventSource; /chatbot/status is polled
+  // instead when the stream can't be opened or drops
+  const eventSourceRef = useRef<EventSource | null>(null);
   const pollingIntervalRef = useRef<number | null>(null);
+  const streamUnavailableRef = useRef(false);
+  // Id of the last stream event handled; a reopened stream replays the run from its start
+  const lastEventIdRef = useRef(0);
+  // The report while it is being written, shown as one assistant message that grows as it streams
+  const draftIdRef = useRef<string | null>(null);
+  const draftTextRef = useRef("");
 
   // --- Functions ---
   const saveMessage = async (message: Message, sid: string) => {
@@ -67,6 +82,63 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
     }
   };
   
+  const stopFollowing = () => {
+    eventSourceRef.current?.close();
+    eventSourceRef.current = null;
+    if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
+    pollingIntervalRef.current = null;
+  };
+
+  const showDraft = (text: string) => {
+    draftTextRef.current = text;
+    const draftId = draftIdRef.current;
+    if (draftId) {
+      setMessages(prev => prev.map(msg => msg.id === draftId ? { ...msg, content: text } : msg));
+      return;
+    }
+    const draft: Message = { id: uuidv4(), content: text, sender: 'assistant', timestamp: new Date() };
+    draftIdRef.current = draft.id;
+    setMessages(prev => [...prev, draft]);
+  };
+
+  const dropDraft = () => {
+    const draftId = draftIdRef.current;
+    draftIdRef.current = null;
+    draftTextRef.current = "";
+    if (draftId) setMessages(prev => prev.filter(msg => msg.id !== draftId));
+  };
+
+  const showQuestion = async (sid: string, question: string) => {
+    stopFollowing();
+    dropDraft();
+    const assistantMessage: Message = {
+      id: uuidv4(),
+      content: question,
+      sender: 'assistant',
+      timestamp: new Date()
+    };
+    setMessages(prev => [...prev, assistantMessage]);
+    await saveMessage(assistantMessage, sid);
+    setIsLoading(false);
+  };
+
+  const showOutcome = async (sid: string, content: string) => {
+    stopFollowing();
+    // The finished report replaces its streamed draft
+    dropDraft();
+    const assistantMessage: Message = {
+      id: uuidv4(),
+      content: content,
+      sender: 'assistant',
+      timestamp: new Date()
+    };
+    setMessages(prev => [...prev, assistantMessage]);
+    await saveMessage(assistantMessage, sid);
+    setIsLoading(false);
+    setSessionId(null); // Reset for the next conversation
+    fetchHistory(); // Refresh history
+  };
+
   const pollStatus = async (sid: string) => {
     try {
       const response = await fetch(`${API_BASE_URL}/chatbot/status/${sid}`);
@@ -75,38 +147,14 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
       const data = await response.json();
 
       if (data.status === "completed" || data.status === "error") {
-        if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
-        
-        const finalContent = data.data?.result || data.data?.error || "Processing finished.";
-        const assistantMessage: Message = {
-          id: uuidv4(),
-          content: finalContent,
-          sender: 'assistant',
-          timestamp: new Date()
-        };
-        
-        setMessages(prev => [...prev, assistantMessage]);
-        await saveMessage(assistantMessage, sid);
-        
-        setIsLoading(false);
-        setSessionId(null); // Reset for the next conversation
-        fetchHistory(); // Refresh history
+        await showOutcome(sid, data.data?.result || data.data?.error || "Processing finished.");
       } else if (data.status === 'awaiting_input') {
-        if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
-        
-        const assistantMessage: Message = {
-          id: uuidv4(),
-          content: data.input_question,
-          sender: 'assistant',
-          timestamp: new Date()
-        };
-
-        setMessages(prev => [...prev, assistantMessage]);
-        await saveMessage(assistantMessage, sid);
-        setIsLoading(false);
+        await showQuestion(sid, data.input_question);
+      } else if (data.data?.partial_result) {
+        showDraft(data.data.partial_result);
       }
     } catch (error) {
-      if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
+      stopFollowing();
       const errorMessage: Message = {
         id: uuidv4(),
         content: "Sorry, couldn't get the status. Please try again.",
@@ -119,8 +167,50 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
   };
 
   const startPolling = (sid: string) => {
-    if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
-    pollingIntervalRef.current = window.setInterval(() => pollStatus(sid), 3000);
+    stopFollowing();
+    pollingIntervalRef.current = window.setInterval(() => pollStatus(sid), STATUS_POLL_INTERVAL_MS);
+    // Catch up right away on whatever happened while the stream was down
+    pollStatus(sid);
+  };
+
+  // Follows the session's progress until it asks a question or finishes
+  const followSession = (sid: string) => {
+    stopFollowing();
+    if (streamUnavailableRef.current || typeof EventSource === 'undefined') {
+      startPolling(sid);
+      return;
+    }
+
+    const source = new EventSource(`${API_BASE_URL}/chatbot/stream/${sid}`);
+    eventSourceRef.current = source;
+    const onEvent = (handle: (data: any) => void) => (event: Event) => {
+      const message = event as MessageEvent;
+      const eventId = Number(message.lastEventId);
+      // Events replayed from before the last answer were already handled
+      if (eventId <= lastEventIdRef.current) return;
+      lastEventIdRef.current = eventId;
+      handle(JSON.parse(message.data));
+    };
+
+    // Text chunks are not filtered by id: consecutive chunks are merged in the replay,
+    // which then carries the whole report so far, so the draft restarts with the stream
+    draftTextRef.current = "";
+    source.addEventListener('result_chunk', (event) => {
+      showDraft(draftTextRef.current + JSON.parse((event as MessageEvent).data).text);
+    });
+    source.addEventListener('result_reset', () => dropDraft());
+    source.addEventListener('awaiting_input', onEvent(data => showQuestion(sid, data.question)));
+    source.addEventListener('completed', onEvent(data => showOutcome(sid, data.result || "Processing finished.")));
+    source.addEventListener('error', (event) => {
+      // The job's own error event carries data; a bare event means the connection failed
+      if (event instanceof MessageEvent) {
+        onEvent(data => showOutcome(sid, data.error || "Processing finished."))(event);
+      } else if (eventSourceRef.current === source) {
+        // Stay on polling for the rest of this conversation so nothing is shown twice
+        streamUnavailableRef.current = true;
+        startPolling(sid);
+      }
+    });
   };
 
   const handleSendMessage = async () => {
@@ -144,6 +234,8 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
       
       if (isNewChat) {
         setSessionId(currentSessionId);
+        lastEventIdRef.current = 0;
+        streamUnavailableRef.current = false;
       }
 
       await saveMessage(userMessage, currentSessionId);
@@ -163,8 +255,8 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
 
       const data = await response.json();
       
-      if (data.status === 'in_progress' || data.status === 'setup_complete') {
-        startPolling(currentSessionId);
+      if (data.status === 'in_progress' || data.status === 'setup_complete' || data.status === 'queued') {
+        followSession(currentSessionId);
       } else if (data.status === 'awaiting_input') {
          const assistantMessage: Message = {
             id: uuidv4(),
@@ -206,28 +298,36 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
 
   useEffect(() => {
     fetchHistory();
-    return () => {
-      if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
-    };
+    return stopFollowing;
   }, [userEmail]);
 
+  const fetchMessagePage = async (sid: string, before: string | null) => {
+    const params = new URLSearchParams({ limit: String(MESSAGE_PAGE_SIZE) });
+    if (before) params.set('before', before);
+    const response = await fetch(`${API_BASE_URL}/chats/session/${sid}?${params}`);
+    if (!response.ok) throw new Error("Failed to fetch session");
+    const page = await response.json();
+
+    const formattedMessages: Message[] = page.messages.map((msg: any) => ({
+        ...msg,
+        id: msg._id,
+        timestamp: new Date(msg.timestamp)
+    }));
+    return { messages: formattedMessages, nextCursor: page.next_cursor as string | null };
+  };
+
   const handleSelectChat = async (sid: string) => {
-    if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
+    stopFollowing();
+    draftIdRef.current = null;
     setIsLoading(true);
     setMessages([]);
+    setEarlierCursor(null);
     setSessionId(sid);
     try {
-      const response = await fetch(`${API_BASE_URL}/chats/session/${sid}`);
-      if (!response.ok) throw new Error("Failed to fetch session");
-      const sessionMessages = await response.json();
-      
-      const formattedMessages: Message[] = sessionMessages.map((msg: any) => ({
-          ...msg,
-          id: msg._id,
-          timestamp: new Date(msg.timestamp)
-      }));
-
-      setMessages(formattedMessages);
+      // Load the latest page; older messages are fetched on demand
+      const page = await fetchMessagePage(sid, null);
+      setMessages(page.messages);
+      setEarlierCursor(page.nextCursor);
     } catch (error) {
       console.error("Error loading chat session:", error);
       setMessages([initialMessage, { id: 'error-load', content: "Sorry, I couldn't load that conversation.", sender: 'assistant', timestamp: new Date() }]);
@@ -236,8 +336,24 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
     }
   };
   
+  const handleLoadEarlier = async () => {
+    if (!sessionId || !earlierCursor || isLoadingEarlier) return;
+    setIsLoadingEarlier(true);
+    try {
+      const page = await fetchMessagePage(sessionId, earlierCursor);
+      setMessages(prev => [...page.messages, ...prev]);
+      setEarlierCursor(page.nextCursor);
+    } catch (error) {
+      console.error("Error loading earlier messages:", error);
+    } finally {
+      setIsLoadingEarlier(false);
+    }
+  };
+  
   const handleNewChat = () => {
-    if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
+    stopFollowing();
+    draftIdRef.current = null;
+    setEarlierCursor(null);
     setSessionId(null);
     setMessages([initialMessage]);
     setIsLoading(false);
@@ -261,6 +377,9 @@ export const ChatPage = ({ userEmail, onLogout }: ChatPageProps) => {
           newMessage={newMessage}
           setNewMessage={setNewMessage}
           handleSendMessage={handleSendMessage}
+          hasEarlierMessages={earlierCursor !== null}
+          isLoadingEarlier={isLoadingEarlier}
+          onLoadEarlier={handleLoadEarlier}
         />
       </div>
     </div>